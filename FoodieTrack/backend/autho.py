@@ -2,15 +2,30 @@
 JWT validation for protected FastAPI routes.
 Validates JWTs via Auth0 JWKS, extracts user_id from the token,
 and exposes FastAPI dependencies for protecting routes.
+
+Signing keys are kept in memory and refreshed by a background task (and
+immediately when a token names an unknown `kid`); successfully verified
+payloads are cached by token hash until the token expires, so repeat tokens
+skip signature verification entirely.
 """
 
+import asyncio
+import hashlib
+import logging
 import os
+import time
 from typing import Annotated
 
+import httpx
 import jwt  # Make sure you have 'pyjwt' installed: pip install pyjwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from utils.instrumentation import track
+from utils.single_flight import SingleFlight
+from utils.tracing import span
+from utils.ttl_cache import TTLCache
+
 # If you get error with 'from jwt import PyJWKClient', it might be because your 'jwt' is not from 'pyjwt'.
 # Try explicitly installing pyjwt with keys: pip install "pyjwt[crypto]"
 
@@ -23,6 +38,8 @@ except ImportError:
         "Make sure you have installed pyjwt (not just 'jwt') with: pip install 'pyjwt[crypto]'"
     )
 
+logger = logging.getLogger(__name__)
+
 # Auth0 config – set AUTH0_DOMAIN and AUTH0_AUDIENCE in env
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN", "").rstrip("/")
 AUTH0_AUDIENCE = os.getenv("AUTH0_AUDIENCE", "")
@@ -30,11 +47,97 @@ AUTH0_AUDIENCE = os.getenv("AUTH0_AUDIENCE", "")
 # Bearer token scheme – expects: Authorization: Bearer <token>
 security = HTTPBearer(auto_error=False)
 
-JWKS_URL = f"https://{AUTH0_DOMAIN}/.well-known/jwks.json" if AUTH0_DOMAIN else ""
+# AUTH0_JWKS_URL overrides the derived URL (e.g. to point at a local stand-in)
+JWKS_URL = os.getenv("AUTH0_JWKS_URL") or (f"https://{AUTH0_DOMAIN}/.well-known/jwks.json" if AUTH0_DOMAIN else "")
+JWKS_REFRESH_INTERVAL = float(os.getenv("JWKS_REFRESH_INTERVAL", "3600"))  # background refresh, seconds
+JWKS_MIN_REFETCH_INTERVAL = float(os.getenv("JWKS_MIN_REFETCH_INTERVAL", "30"))  # unknown-kid refetch floor
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "3600"))  # never trust a cached payload longer
 
 _jwks_client: PyJWKClient | None = None
 
 
+class JWKSStore:
+    """Auth0 signing keys by `kid`, fetched asynchronously and shared by all requests."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._flight = SingleFlight()
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+
+    def get(self, kid: str) -> jwt.PyJWK | None:
+        return self._keys.get(kid)
+
+    async def refresh(self) -> None:
+        async def _fetch():
+            if self._client is None:
+                self._client = httpx.AsyncClient(timeout=10.0)
+            async with track("auth0", "jwks_fetch"):
+                resp = await self._client.get(self.url)
+                resp.raise_for_status()
+            keys = {}
+            for jwk in jwt.PyJWKSet.from_dict(resp.json()).keys:
+                if jwk.key_id:
+                    keys[jwk.key_id] = jwk
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+
+        await self._flight.do("jwks", _fetch)
+
+    async def key_for(self, kid: str) -> jwt.PyJWK | None:
+        """Key for `kid`, refetching the key set right away if it's unknown (rate-limited)."""
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._fetched_at >= JWKS_MIN_REFETCH_INTERVAL:
+            await self.refresh()
+            key = self._keys.get(kid)
+        return key
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                await asyncio.sleep(JWKS_REFRESH_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("JWKS refresh failed; retrying")
+                await asyncio.sleep(JWKS_MIN_REFETCH_INTERVAL)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+jwks_store = JWKSStore(JWKS_URL)
+
+# sha256(token) -> verified payload; entries expire with the token
+_verified_tokens = TTLCache(max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_MAX_TTL)
+
+
+async def start_jwks_refresh() -> None:
+    if JWKS_URL:
+        jwks_store.start()
+
+
+async def stop_jwks_refresh() -> None:
+    await jwks_store.stop()
+
+
 def _get_jwks_client() -> PyJWKClient:
     global _jwks_client
     if _jwks_client is None:
@@ -47,28 +150,34 @@ def _get_jwks_client() -> PyJWKClient:
     return _jwks_client
 
 
-def verify_token(token: str) -> dict:
-    """
-    Verify JWT: signature (via JWKS), expiry, issuer, audience.
-    Returns the decoded payload on success.
-    """
+def _require_config() -> None:
     if not AUTH0_DOMAIN or not AUTH0_AUDIENCE:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Auth0 is not configured (AUTH0_DOMAIN / AUTH0_AUDIENCE)",
         )
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _cached_payload(token: str) -> tuple[str, dict | None]:
+    key = _token_key(token)
+    return key, _verified_tokens.get(key)
+
+
+def _decode(token: str, cache_key: str, signing_key) -> dict:
+    """Full RS256 verification; caches the payload until the token's `exp`."""
     try:
-        client = _get_jwks_client()
-        signing_key = client.get_signing_key_from_jwt(token)
         payload = jwt.decode(
             token,
-            signing_key.key,
+            signing_key,
             algorithms=["RS256"],
             audience=AUTH0_AUDIENCE,
             issuer=f"https://{AUTH0_DOMAIN}/",
             options={"verify_exp": True},
         )
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -79,6 +188,68 @@ def verify_token(token: str) -> dict:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid token",
         )
+    ttl = TOKEN_CACHE_MAX_TTL
+    if "exp" in payload:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        _verified_tokens.set(cache_key, payload, ttl=ttl)
+    return payload
+
+
+def _kid(token: str) -> str:
+    try:
+        return jwt.get_unverified_header(token).get("kid") or ""
+    except jwt.InvalidTokenError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+        )
+
+
+def verify_token(token: str) -> dict:
+    """
+    Verify JWT: signature (via JWKS), expiry, issuer, audience.
+    Returns the decoded payload on success.
+    """
+    _require_config()
+    cache_key, payload = _cached_payload(token)
+    if payload is not None:
+        return payload
+    jwk = jwks_store.get(_kid(token))
+    if jwk is not None:
+        signing_key = jwk.key
+    else:
+        try:
+            signing_key = _get_jwks_client().get_signing_key_from_jwt(token).key
+        except jwt.PyJWTError:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid token",
+            )
+    return _decode(token, cache_key, signing_key)
+
+
+@span("auth")
+async def verify_token_async(token: str) -> dict:
+    """`verify_token` without blocking the event loop on JWKS fetches."""
+    _require_config()
+    cache_key, payload = _cached_payload(token)
+    if payload is not None:
+        return payload
+    try:
+        jwk = await jwks_store.key_for(_kid(token))
+    except httpx.HTTPError:
+        logger.exception("JWKS fetch failed")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Unable to fetch signing keys",
+        )
+    if jwk is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+        )
+    return _decode(token, cache_key, jwk.key)
 
 
 def get_user_id_from_payload(payload: dict) -> str:
@@ -95,7 +266,7 @@ def get_user_id_from_payload(payload: dict) -> str:
     return sub
 
 
-def get_current_user_id(
+async def get_current_user_id(
     credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)],
 ) -> str:
     """
@@ -114,11 +285,11 @@ def get_current_user_id(
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    payload = verify_token(credentials.credentials)
+    payload = await verify_token_async(credentials.credentials)
     return get_user_id_from_payload(payload)
 
 
-def get_current_user_payload(
+async def get_current_user_payload(
     credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(security)],
 ) -> dict:
     """
@@ -131,4 +302,4 @@ def get_current_user_payload(
             detail="Not authenticated",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return verify_token(credentials.credentials)
+    return await verify_token_async(credentials.credentials)
@@ -1,10 +1,266 @@
+"""
+Backboard memory API.
+
+`AsyncBackboardClient` keeps one pooled keep-alive connection set for the
+process, retries transient failures with full-jitter exponential backoff
+and can write many documents per upstream call when BACKBOARD_BATCH_PATH
+names a batch endpoint. Searches are retried on any transport error, 429 or
+5xx; document writes are not idempotent, so they carry an Idempotency-Key
+and are retried only when the request cannot have been processed
+(connection never established, 429, 503). `BackboardBatcher` coalesces
+concurrent single-document writes into those batch calls. The original blocking helpers are kept at the bottom for
+scripts.
+"""
+
+import asyncio
+import logging
 import os
+import random
+import uuid
+
+import httpx
 import requests
 
-BACKBOARD_URL = "https://api.backboard.io/v1"
+from utils.instrumentation import track
+
+logger = logging.getLogger(__name__)
+
+BACKBOARD_URL = os.getenv("BACKBOARD_URL", "https://api.backboard.io/v1").rstrip("/")
 BACKBOARD_API_KEY = os.getenv("BACKBOARD_API_KEY")
 headers = { "Authorization": f"Bearer {BACKBOARD_API_KEY}", "Content-Type": "application/json" }
 
+BACKBOARD_MAX_CONNECTIONS = int(os.getenv("BACKBOARD_MAX_CONNECTIONS", "20"))
+BACKBOARD_TIMEOUT = float(os.getenv("BACKBOARD_TIMEOUT", "15"))
+BACKBOARD_MAX_RETRIES = int(os.getenv("BACKBOARD_MAX_RETRIES", "3"))
+BACKBOARD_BACKOFF_BASE = float(os.getenv("BACKBOARD_BACKOFF_BASE", "0.2"))  # seconds
+BACKBOARD_BACKOFF_MAX = float(os.getenv("BACKBOARD_BACKOFF_MAX", "5"))
+# Multi-document endpoint, opt-in (e.g. "/documents/batch") since the public API only documents
+# POST /documents. Unset writes one POST per document; a 4xx on the first batch call means the
+# endpoint isn't supported and the client falls back to that.
+BACKBOARD_BATCH_PATH = os.getenv("BACKBOARD_BATCH_PATH", "")
+BACKBOARD_BATCH_SIZE = int(os.getenv("BACKBOARD_BATCH_SIZE", "50"))
+BACKBOARD_BATCH_WINDOW = float(os.getenv("BACKBOARD_BATCH_WINDOW", "0.05"))  # coalescing window, seconds
+
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# For writes: statuses and errors that mean the request was rejected before being processed
+_REJECTED_STATUS = {429, 503}
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class BackboardError(RuntimeError):
+    """Backboard request failed after retries or returned an error status."""
+
+    pass
+
+
+def _document(user_id: str, text: str, metadata: dict | None) -> dict:
+    return {"text": text, "metadata": {"user_id": user_id, **(metadata or {})}}
+
+
+class AsyncBackboardClient:
+    """Pooled async Backboard client with retries and batched document writes."""
+
+    def __init__(
+        self,
+        base_url: str = BACKBOARD_URL,
+        api_key: str | None = BACKBOARD_API_KEY,
+        max_retries: int = BACKBOARD_MAX_RETRIES,
+        batch_size: int = BACKBOARD_BATCH_SIZE,
+        batch_path: str = BACKBOARD_BATCH_PATH,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.max_retries = max_retries
+        self.batch_size = batch_size
+        self.batch_path = batch_path
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            limits=httpx.Limits(
+                max_connections=BACKBOARD_MAX_CONNECTIONS,
+                max_keepalive_connections=BACKBOARD_MAX_CONNECTIONS,
+            ),
+            timeout=BACKBOARD_TIMEOUT,
+            transport=transport,
+        )
+        # Learned from the first batch call; no batch path means individual writes
+        self._batch_supported: bool | None = None if batch_path else False
+
+    @property
+    def is_closed(self) -> bool:
+        return self._client.is_closed
+
+    async def _post(self, path: str, payload, idempotent: bool = True) -> httpx.Response:
+        """
+        POST with retries; returns the first non-retryable response. Non-idempotent
+        calls send one Idempotency-Key for all attempts and are only retried
+        when the previous attempt was certainly not processed.
+        """
+        retry_status = _RETRYABLE_STATUS if idempotent else _REJECTED_STATUS
+        retry_errors = httpx.TransportError if idempotent else _NOT_SENT_ERRORS
+        request_headers = None if idempotent else {"Idempotency-Key": uuid.uuid4().hex}
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with track("backboard", path) as call:
+                    resp = await self._client.post(path, json=payload, headers=request_headers)
+                    if resp.is_error:
+                        call.outcome = "error"
+                if resp.status_code not in retry_status:
+                    return resp
+                error: Exception = BackboardError(f"Backboard {path} returned {resp.status_code}")
+            except retry_errors as e:
+                error = e
+            except httpx.TransportError as e:
+                # Sent but the outcome is unknown: a retry could store the document twice
+                raise BackboardError(f"Backboard {path} failed after the request was sent: {e}") from e
+            if attempt == self.max_retries:
+                raise BackboardError(f"Backboard {path} failed after {attempt + 1} attempts: {error}") from error
+            # full jitter: uniform over [0, capped exponential]
+            await asyncio.sleep(random.uniform(0, min(BACKBOARD_BACKOFF_MAX, BACKBOARD_BACKOFF_BASE * 2 ** attempt)))
+
+    @staticmethod
+    def _json(resp: httpx.Response):
+        if resp.is_error:
+            raise BackboardError(f"Backboard {resp.request.url.path} returned {resp.status_code}: {resp.text[:200]}")
+        return resp.json()
+
+    async def store_message(self, user_id: str, text: str, metadata: dict | None = None) -> dict:
+        return self._json(await self._post("/documents", _document(user_id, text, metadata), idempotent=False))
+
+    async def store_documents(self, documents: list[dict]) -> list[dict]:
+        """
+        Write prepared documents using as few upstream calls as the API allows;
+        returns one result per document, in order.
+        """
+        results: list[dict] = []
+        for i in range(0, len(documents), self.batch_size):
+            chunk = documents[i:i + self.batch_size]
+            if self._batch_supported is not False:
+                resp = await self._post(self.batch_path, {"documents": chunk}, idempotent=False)
+                if self._batch_supported or not 400 <= resp.status_code < 500:
+                    results.extend(self._batch_results(resp, len(chunk)))
+                    self._batch_supported = True
+                    continue
+                logger.info(
+                    "Backboard batch endpoint %s answered %d; writing documents individually",
+                    self.batch_path, resp.status_code,
+                )
+                self._batch_supported = False
+            responses = await asyncio.gather(*(self._post("/documents", doc, idempotent=False) for doc in chunk))
+            results.extend(self._json(r) for r in responses)
+        return results
+
+    def _batch_results(self, resp: httpx.Response, count: int) -> list[dict]:
+        """Per-document results of a batch call; never hands one caller another document's result."""
+        body = self._json(resp)
+        items = body.get("results") if isinstance(body, dict) else body
+        if not isinstance(items, list) or len(items) != count:
+            raise BackboardError(
+                f"Backboard {self.batch_path} returned results that don't match the {count} documents sent"
+            )
+        return items
+
+    async def store_messages(self, messages: list[tuple[str, str, dict | None]]) -> list[dict]:
+        """Batched `store_message` for (user_id, text, metadata) tuples."""
+        return await self.store_documents([_document(*m) for m in messages])
+
+    async def retrieve_messages(self, query: str, user_id: str, top_k: int = 10) -> list[dict]:
+        payload = {"query": query, "filter": {"user_id": user_id}, "top_k": top_k}
+        return self._json(await self._post("/search", payload)).get("results", [])
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class BackboardBatcher:
+    """
+    Coalesce concurrent `store_message` calls: writes arriving within
+    `window` seconds (or until `max_batch` accumulate) go upstream as one
+    batch, and each caller gets its own document's result.
+    """
+
+    def __init__(
+        self,
+        client: AsyncBackboardClient,
+        max_batch: int = BACKBOARD_BATCH_SIZE,
+        window: float = BACKBOARD_BATCH_WINDOW,
+    ):
+        self._client = client
+        self.max_batch = max_batch
+        self.window = window
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._sends: set[asyncio.Task] = set()
+
+    async def store_message(self, user_id: str, text: str, metadata: dict | None = None) -> dict:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((_document(user_id, text, metadata), fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._send(batch))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, batch: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            results = await self._client.store_documents([doc for doc, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), result in zip(batch, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    async def drain(self) -> None:
+        """Send anything still pending and wait for in-flight batches."""
+        self._flush()
+        if self._sends:
+            await asyncio.gather(*self._sends, return_exceptions=True)
+
+
+_client: AsyncBackboardClient | None = None
+_batcher: BackboardBatcher | None = None
+
+
+def get_backboard_client() -> AsyncBackboardClient:
+    """Process-wide pooled client, created on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = AsyncBackboardClient()
+    return _client
+
+
+def get_backboard_batcher() -> BackboardBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = BackboardBatcher(get_backboard_client())
+    return _batcher
+
+
+async def close_backboard_client() -> None:
+    global _client, _batcher
+    if _batcher is not None:
+        await _batcher.drain()
+        _batcher = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# --- Blocking helpers (scripts / sync callers) ---
+
 def store_message(user_id, text, metadata):
     payload = {
         "text": text,
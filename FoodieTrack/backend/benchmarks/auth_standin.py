@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Local stand-in for Auth0: an RSA signing key, a JWKS endpoint and a token
+minter, so `autho` verifies real RS256 signatures without network access.
+
+Point the backend at it with AUTH0_DOMAIN / AUTH0_AUDIENCE matching the
+stand-in and AUTH0_JWKS_URL at its /.well-known/jwks.json.
+
+Usage:
+  cd backend
+  python benchmarks/auth_standin.py --port 8789 --print-token user-1
+  AUTH0_DOMAIN=auth.standin AUTH0_AUDIENCE=foodietrack-api \\
+    AUTH0_JWKS_URL=http://127.0.0.1:8789/.well-known/jwks.json uvicorn main:app
+
+or in-process: httpx.ASGITransport(app=AuthStandin().create_app()).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI
+
+
+class AuthStandin:
+    """Signs tokens the way Auth0 would for `domain` / `audience`."""
+
+    def __init__(self, domain: str = "auth.standin", audience: str = "foodietrack-api", kid: str = "standin-1"):
+        self.domain = domain
+        self.audience = audience
+        self.kid = kid
+        self._key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(self._key.public_key()))
+        self.jwks = {"keys": [{**public, "kid": kid, "use": "sig", "alg": "RS256"}]}
+
+    def token(self, sub: str, ttl: int = 3600) -> str:
+        now = int(time.time())
+        claims = {"sub": sub, "aud": self.audience, "iss": f"https://{self.domain}/", "iat": now, "exp": now + ttl}
+        return jwt.encode(claims, self._key, algorithm="RS256", headers={"kid": self.kid})
+
+    def create_app(self, latency_ms: float = 0.0, jitter: float = 0.0, seed: int | None = None) -> FastAPI:
+        app = FastAPI(title="Auth0 stand-in")
+        rng = random.Random(seed)
+        app.state.calls = {"jwks": 0}
+
+        @app.get("/.well-known/jwks.json")
+        async def jwks():
+            app.state.calls["jwks"] += 1
+            if latency_ms:
+                await asyncio.sleep(latency_ms * (rng.lognormvariate(0, jitter) if jitter else 1) / 1000)
+            return self.jwks
+
+        return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Auth0 JWKS stand-in server")
+    parser.add_argument("--port", type=int, default=8789)
+    parser.add_argument("--domain", default="auth.standin")
+    parser.add_argument("--audience", default="foodietrack-api")
+    parser.add_argument("--print-token", metavar="SUB", help="print a token for this subject before serving")
+    args = parser.parse_args()
+    standin = AuthStandin(args.domain, args.audience)
+    if args.print_token:
+        print(standin.token(args.print_token, ttl=24 * 3600))
+    uvicorn.run(standin.create_app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
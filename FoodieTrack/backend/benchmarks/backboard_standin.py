@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the Backboard API (in-memory documents).
+
+Implements POST /documents, POST /documents/batch and POST /search with
+optional injected latency (median, with lognormal `jitter`) and failure
+rate, so the async client can be exercised without network access. Writes
+repeated with the same Idempotency-Key get the first response back.
+
+Usage:
+  cd backend
+  python benchmarks/backboard_standin.py --port 8787 --latency-ms 40 --fail-rate 0.05
+  BACKBOARD_URL=http://127.0.0.1:8787 uvicorn main:app
+
+or in-process: httpx.ASGITransport(app=create_app(...)).
+"""
+
+import argparse
+import asyncio
+import itertools
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_app(
+    latency_ms: float = 0.0,
+    fail_rate: float = 0.0,
+    batch: bool = True,
+    seed: int | None = None,
+    jitter: float = 0.0,
+) -> FastAPI:
+    app = FastAPI(title="Backboard stand-in")
+    rng = random.Random(seed)
+    ids = itertools.count(1)
+    app.state.documents = []
+    app.state.replies = {}  # Idempotency-Key -> response body
+    app.state.calls = {"documents": 0, "batch": 0, "search": 0, "failed": 0}
+
+    async def upstream(kind: str):
+        app.state.calls[kind] += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms * (rng.lognormvariate(0, jitter) if jitter else 1) / 1000)
+        if fail_rate and rng.random() < fail_rate:
+            app.state.calls["failed"] += 1
+            return JSONResponse({"error": "injected failure"}, status_code=503)
+        return None
+
+    def save(doc: dict) -> dict:
+        stored = {"id": f"doc_{next(ids)}", **doc}
+        app.state.documents.append(stored)
+        return {"id": stored["id"]}
+
+    def replay(request: Request, build) -> dict:
+        key = request.headers.get("idempotency-key")
+        if key is None:
+            return build()
+        if key not in app.state.replies:
+            app.state.replies[key] = build()
+        return app.state.replies[key]
+
+    @app.post("/documents")
+    async def store(request: Request):
+        failure = await upstream("documents")
+        if failure:
+            return failure
+        doc = await request.json()
+        return replay(request, lambda: save(doc))
+
+    if batch:
+        @app.post("/documents/batch")
+        async def store_batch(request: Request):
+            failure = await upstream("batch")
+            if failure:
+                return failure
+            body = await request.json()
+            return replay(request, lambda: {"results": [save(doc) for doc in body.get("documents", [])]})
+
+    @app.post("/search")
+    async def search(request: Request):
+        failure = await upstream("search")
+        if failure:
+            return failure
+        body = await request.json()
+        user_id = body.get("filter", {}).get("user_id")
+        words = set(body.get("query", "").lower().split())
+        hits = [
+            d for d in app.state.documents
+            if d.get("metadata", {}).get("user_id") == user_id and words & set(d.get("text", "").lower().split())
+        ]
+        return {"results": hits[: body.get("top_k", 10)]}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Backboard stand-in server")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--no-batch", action="store_true", help="serve without /documents/batch")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.fail_rate, batch=not args.no_batch), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Benchmark transcript writes through the async Backboard client against the
+in-process stand-in (see backboard_standin.py).
+
+Compares one upstream call per transcript with the coalescing batcher, with
+and without a batch endpoint, under injected latency and failures.
+
+Usage:
+  cd backend
+  python benchmarks/bench_backboard.py
+  python benchmarks/bench_backboard.py -n 2000 --latency-ms 40 --fail-rate 0.05
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import backboard  # noqa: E402
+from backboard import AsyncBackboardClient, BackboardBatcher  # noqa: E402
+from backboard_standin import create_app  # noqa: E402
+
+
+async def run(mode: str, n: int, latency_ms: float, fail_rate: float, batch_endpoint: bool) -> None:
+    app = create_app(latency_ms, fail_rate, batch=batch_endpoint, seed=1)
+    client = AsyncBackboardClient(
+        base_url="http://backboard.local",
+        api_key="test",
+        batch_path="/documents/batch",  # without the endpoint, the client falls back after the first call
+        transport=httpx.ASGITransport(app=app),
+    )
+    batcher = BackboardBatcher(client)
+    store = batcher.store_message if mode == "batched" else client.store_message
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(store(f"user{i % 50}", f"transcript {i} about tofu and rice", {"source": "voice"}) for i in range(n)),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - start
+    await client.aclose()
+
+    errors = sum(isinstance(r, Exception) for r in results)
+    calls = app.state.calls
+    print(
+        f"  {mode:8} {'batch-api' if batch_endpoint else 'no-batch':9} {elapsed * 1000:8.1f} ms  "
+        f"stored={len(app.state.documents):5}  errors={errors:3}  "
+        f"upstream calls: /documents={calls['documents']} /documents/batch={calls['batch']} (injected 503s={calls['failed']})"
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Backboard client benchmark")
+    parser.add_argument("-n", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--fail-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    backboard.BACKBOARD_BACKOFF_BASE = 0.01  # keep retries quick in the benchmark
+    print(f"{args.n} transcripts, {args.latency_ms:g} ms upstream latency, {args.fail_rate:.0%} injected failures")
+    for mode, batch_endpoint in (("single", True), ("batched", True), ("batched", False)):
+        asyncio.run(run(mode, args.n, args.latency_ms, args.fail_rate, batch_endpoint))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
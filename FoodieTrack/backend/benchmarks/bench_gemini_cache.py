@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Benchmark Gemini context caching against the in-process stand-in
+(see gemini_standin.py).
+
+Sends recommendation prompts for many users over the day's seed menu, once
+with the whole prompt inline and once with instructions + menu served from
+cached content, then walks the handle lifecycle: menu change, expiry and
+shutdown cleanup.
+
+Usage:
+  cd backend
+  python benchmarks/bench_gemini_cache.py
+  python benchmarks/bench_gemini_cache.py -n 500 --per-token-ms 0.1
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from gemini_standin import StandinClient  # noqa: E402
+from services.gemini_client import GeminiGateway  # noqa: E402
+from services.gemini_context_cache import ContextCache  # noqa: E402
+from services.menu_snapshot import MENU_SEED_SQL, parse_seed_sql  # noqa: E402
+from utils.prompt_builder import build_menu_context, build_request_prompt  # noqa: E402
+
+
+def request_prompt(i: int) -> str:
+    return build_request_prompt(
+        transcript=f"user {i}: long day, I want something warm and filling",
+        user_preferences={"allergies": ["soy"], "favourite_foods": ["chicken"], "residence": "CMH"},
+        user_history=[{"text": f"felt great after the goulash on visit {j}"} for j in range(5)],
+        is_logged_in=True,
+    )
+
+
+async def run(enabled: bool, n: int, args, menu: list, day: str) -> None:
+    client = StandinClient(overhead_ms=args.overhead_ms, per_token_ms=args.per_token_ms)
+    gateway = GeminiGateway(api_key="", client=client)
+    cache = ContextCache(gateway_factory=lambda: gateway, enabled=enabled)
+    static = build_menu_context(menu, day)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(cache.generate("recommendation", static, request_prompt(i)) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"  {'cached' if enabled else 'inline':6}  {elapsed * 1000:8.1f} ms  "
+        f"input tokens sent={client.tokens['sent']:8,} (~{client.tokens['sent'] // n:,}/request)  "
+        f"served from cache={client.tokens['cached']:8,}  cache creates={client.calls['cache_create']}"
+    )
+
+
+async def lifecycle(menu: list, day: str) -> None:
+    client = StandinClient(overhead_ms=0, per_token_ms=0)
+    gateway = GeminiGateway(api_key="", client=client)
+    cache = ContextCache(gateway_factory=lambda: gateway, ttl=60, refresh_margin=10)
+    static = build_menu_context(menu, day)
+
+    first = await cache.handle("recommendation", static)
+    assert await cache.handle("recommendation", static) == first
+    changed = build_menu_context(menu[:-1], day)  # an item sold out / menu refresh
+    second = await cache.handle("recommendation", changed)
+    assert second != first and first not in client.cached and second in client.cached
+    print(f"  menu change: {first} -> {second} (old handle deleted)")
+
+    client.caches.expire(second)
+    await cache.generate("recommendation", changed, request_prompt(0))
+    third = await cache.handle("recommendation", changed)
+    assert third not in (first, second)
+    print(f"  expired server-side: request retried inline, next call recreated {third}")
+
+    fp, name, _ = cache._handles["recommendation"]
+    cache._handles["recommendation"] = (fp, name, time.monotonic() + 5)  # inside the refresh margin
+    assert await cache.handle("recommendation", changed) == name and client.calls["cache_update"] == 1
+    print(f"  near expiry: {name} extended in place")
+
+    await cache.close()
+    assert not client.cached
+    print("  shutdown: all cached contents deleted")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Gemini context cache benchmark")
+    parser.add_argument("-n", type=int, default=200, help="requests")
+    parser.add_argument("--overhead-ms", type=float, default=50.0)
+    parser.add_argument("--per-token-ms", type=float, default=0.05, help="simulated prefill cost per uncached input token")
+    args = parser.parse_args()
+
+    menu = parse_seed_sql(Path(MENU_SEED_SQL).read_text(encoding="utf-8"))
+    day = menu[0]["day"]
+    print(f"{args.n} requests, {args.overhead_ms:g} ms overhead + {args.per_token_ms:g} ms/uncached input token")
+    for enabled in (False, True):
+        asyncio.run(run(enabled, args.n, args, menu, day))
+    print("handle lifecycle:")
+    asyncio.run(lifecycle(menu, day))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Benchmark the local transcript memory index (services.memory_index).
+
+Indexes synthetic transcripts for a handful of users, then times cosine top-k
+retrieval and checks that topical queries surface matching transcripts.
+
+Usage:
+  cd backend
+  python benchmarks/bench_memory_index.py
+  python benchmarks/bench_memory_index.py -n 2000 --persist /tmp/memidx
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.memory_index import MemoryIndex  # noqa: E402
+
+FOODS = ["tofu stir fry", "beef goulash", "pad thai", "caesar salad", "mushroom risotto", "chicken karaage",
+         "lentil soup", "salmon bowl", "veggie burger", "pancakes", "shrimp tacos", "falafel wrap"]
+MOODS = ["stressed about exams", "really tired", "happy today", "feeling sick", "homesick", "super hungry"]
+TEMPLATES = [
+    "I'm {mood} and the {food} really helped",
+    "Honestly the {food} was bad, I felt worse after",
+    "Can I get something like the {food} again? I'm {mood}",
+    "I don't want {food} anymore, I'm {mood}",
+]
+
+
+async def run_queries(index: MemoryIndex, rng: random.Random, users: int, queries: int) -> tuple[list[float], int]:
+    for u in range(users):
+        await index.search(f"user{u}", "warm up")  # load each user before timing
+    timings, hits = [], 0
+    for _ in range(queries):
+        food = rng.choice(FOODS)
+        t = time.perf_counter()
+        results = await index.search(f"user{rng.randrange(users)}", f"how did I feel after {food}", top_k=10)
+        timings.append((time.perf_counter() - t) * 1000)
+        hits += sum(food in r["text"] for r in results)
+    return timings, hits
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Memory index benchmark")
+    parser.add_argument("-n", type=int, default=1000, help="transcripts per user")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--persist", default="", help="directory for memory-mapped persistence")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    directory = args.persist or ""
+    index = MemoryIndex(max_per_user=args.n, directory=directory)
+
+    start = time.perf_counter()
+    for u in range(args.users):
+        for _ in range(args.n):
+            text = rng.choice(TEMPLATES).format(food=rng.choice(FOODS), mood=rng.choice(MOODS))
+            index.add(f"user{u}", text, {"source": "bench"})
+    add_us = (time.perf_counter() - start) / (args.users * args.n) * 1e6
+    print(f"indexed {args.users} x {args.n} transcripts: {add_us:.1f} µs/add")
+
+    if directory:
+        index = MemoryIndex(max_per_user=args.n, directory=directory)  # reload through the memory map
+
+    timings, hits = asyncio.run(run_queries(index, rng, args.users, args.queries))
+    print(f"search top-10: median {statistics.median(timings):.3f} ms, p99 {sorted(timings)[int(len(timings) * 0.99) - 1]:.3f} ms")
+    print(f"topical precision@10: {hits / (10 * args.queries):.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Golden checks and micro-benchmark for services.preference_extractor.
+
+Verifies the extractor against benchmarks/golden_preferences.json and the
+original per-request implementation, then times both on long transcripts.
+
+Usage:
+  cd backend
+  python benchmarks/bench_preference_extractor.py
+  python benchmarks/bench_preference_extractor.py --regen   # rewrite the golden file
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.preference_extractor import (  # noqa: E402
+    DIETARY_TAGS,
+    NEG_TRIGGERS,
+    PreferenceExtractor,
+    extract_preferences,
+)
+
+GOLDEN_PATH = Path(__file__).resolve().parent / "golden_preferences.json"
+
+
+LEGACY_DIETARY_TAGS = ["vegan", "vegetarian", "kosher", "halal", "gluten-free", "gluten free", "lactose intolerant"]
+LEGACY_NEG_TRIGGERS = ["no ", "don't ", "dont ", "do not ", "avoid ", "allerg", "can't ", "cannot "]
+
+
+def legacy_extract_preferences(
+    transcript: str,
+    intent: str,
+    keywords: list[str],
+    dietary_tags: list[str] = LEGACY_DIETARY_TAGS,
+    neg_triggers: list[str] = LEGACY_NEG_TRIGGERS,
+) -> list[dict]:
+    """The closure formerly defined inside routes/voice.analyze_voice (reference implementation)."""
+    prefs: list[dict] = []
+    t = (transcript or "").lower()
+
+    for tag in dietary_tags:
+        if tag in t:
+            val = tag.replace(" ", "-")
+            # the original used a "metadata" key here, which PreferenceCreate ignored
+            prefs.append({"preference_type": "restriction", "value": val, "category": "food", "meta": {"source": "voice"}})
+
+    for kw in keywords:
+        kw_l = kw.lower()
+        negative = any(trig + kw_l in t for trig in neg_triggers)
+        if ("allerg" in t or "allergy" in t or "allergic" in t) and kw_l in t:
+            prefs.append({"preference_type": "allergy", "value": kw, "category": "food", "meta": {"source": "voice"}})
+            continue
+        if negative:
+            prefs.append({"preference_type": "dislike", "value": kw, "category": "food", "meta": {"source": "voice"}})
+
+    patterns = [r"i (?:don't|do not|dont) like ([a-zA-Z \-']+)", r"i hate ([a-zA-Z \-']+)", r"i'm allergic to ([a-zA-Z \-']+)", r"i am allergic to ([a-zA-Z \-']+)"]
+    for pat in patterns:
+        for m in re.finditer(pat, t):
+            item = m.group(1).strip()
+            if item:
+                ptype = "allergy" if "allerg" in pat or "allergic" in pat else "dislike"
+                prefs.append({"preference_type": ptype, "value": item, "category": "food", "meta": {"source": "voice"}})
+
+    seen = set()
+    deduped = []
+    for p in prefs:
+        key = (p["preference_type"], p["value"].lower())
+        if key in seen:
+            continue
+        seen.add(key)
+        deduped.append(p)
+    return deduped
+
+
+FOODS = ["mushrooms", "tofu", "peanuts", "shrimp", "cilantro", "pork", "beef", "eggplant", "olives", "dairy",
+         "sesame", "gluten", "onions", "spinach", "lentils", "salmon", "coconut", "chickpeas", "rice", "kale"]
+SENTENCES = [
+    "I don't like {f}.",
+    "I do not like {f}, honestly.",
+    "i hate {f} and {g}",
+    "I'm allergic to {f}.",
+    "I am allergic to {f}; please avoid {g}.",
+    "No {f} please, and I can't eat {g}.",
+    "Do not give me {f}. Cannot stand {g}.",
+    "I'm vegan most days, sometimes vegetarian.",
+    "Is there anything gluten free or halal today?",
+    "I'm lactose intolerant so avoid {f}.",
+    "The {f} curry yesterday was amazing, more {g} please!",
+    "Feeling stressed about exams, something warm with {f} would be nice.",
+    "I dont like {f} or {g}",
+]
+
+
+def make_cases(count: int, sentences_per_case: int, seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        parts = [rng.choice(SENTENCES).format(f=rng.choice(FOODS), g=rng.choice(FOODS)) for _ in range(sentences_per_case)]
+        transcript = " ".join(parts)
+        keywords = rng.sample(FOODS, 6) + [rng.choice(["Vegan", "warm food", "Kale"])]
+        cases.append({"transcript": transcript, "intent": "dietary request", "keywords": keywords})
+    return cases
+
+
+def check_golden() -> bool:
+    cases = json.loads(GOLDEN_PATH.read_text())
+    ok = True
+    for i, case in enumerate(cases):
+        got = extract_preferences(case["transcript"], case["intent"], case["keywords"])
+        legacy = legacy_extract_preferences(case["transcript"], case["intent"], case["keywords"])
+        if got != case["expected"] or got != legacy:
+            ok = False
+            print(f"❌ case {i} differs")
+            print("   expected:", case["expected"])
+            print("   got:     ", got)
+    print(f"{'✅' if ok else '❌'} {len(cases)} golden cases")
+    return ok
+
+
+def bench(sentences_per_case: int, repeat: int) -> None:
+    cases = make_cases(50, sentences_per_case, seed=7)
+    chars = sum(len(c["transcript"]) for c in cases) // len(cases)
+    for name, fn in (("legacy", legacy_extract_preferences), ("extractor", extract_preferences)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for c in cases:
+                fn(c["transcript"], c["intent"], c["keywords"])
+        per_call = (time.perf_counter() - start) / (repeat * len(cases)) * 1e6
+        print(f"  {name:10} {per_call:9.1f} µs/transcript  (~{chars} chars)")
+
+
+def bench_vocabulary(sizes: tuple[int, ...], repeat: int) -> None:
+    """Per-transcript cost as synthetic dietary tags and negation triggers are added."""
+    cases = make_cases(50, 5, seed=11)
+    for extra in sizes:
+        tags = DIETARY_TAGS + [f"diet{i}" for i in range(extra)]
+        triggers = NEG_TRIGGERS + [f"skip{i} " for i in range(extra)]
+        extractor = PreferenceExtractor(dietary_tags=tags, neg_triggers=triggers)
+        runs = (
+            ("legacy", lambda c: legacy_extract_preferences(c["transcript"], c["intent"], c["keywords"], tags, triggers)),
+            ("extractor", lambda c: extractor.extract(c["transcript"], c["intent"], c["keywords"])),
+        )
+        print(f"+{extra} tags/+{extra} triggers:")
+        for name, fn in runs:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for c in cases:
+                    fn(c)
+            per_call = (time.perf_counter() - start) / (repeat * len(cases)) * 1e6
+            print(f"  {name:10} {per_call:9.1f} µs/transcript")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Preference extractor golden checks + benchmark")
+    parser.add_argument("--regen", action="store_true", help="regenerate the golden file from the legacy implementation")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.regen:
+        cases = make_cases(40, 3) + make_cases(10, 60, seed=99)
+        for c in cases:
+            c["expected"] = legacy_extract_preferences(c["transcript"], c["intent"], c["keywords"])
+        GOLDEN_PATH.write_text(json.dumps(cases, indent=1) + "\n")
+        print(f"Wrote {len(cases)} cases to {GOLDEN_PATH}")
+
+    ok = check_golden()
+    for n in (5, 50, 500):
+        print(f"{n} sentences:")
+        bench(n, args.repeat if n < 500 else max(1, args.repeat // 10))
+    bench_vocabulary((0, 50, 200, 800), args.repeat)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Compare recommendation prompt sizes: the old pretty-printed JSON payload
+(whole menu, indent=2) against the pruned, tabular, token-budgeted prompt
+from utils.prompt_builder.
+
+Uses the seed menu (menu_db_setup.sql) and synthetic history.
+
+Usage:
+  cd backend
+  python benchmarks/bench_prompt_builder.py
+  python benchmarks/bench_prompt_builder.py --budget 3000 --history 200
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.menu_snapshot import MENU_SEED_SQL, parse_seed_sql  # noqa: E402
+from utils.prompt_builder import _INSTRUCTIONS, build_prompt, estimate_tokens  # noqa: E402
+
+PREFERENCES = {
+    "dietary_restrictions": ["halal"],
+    "allergies": ["soy"],
+    "favourite_foods": ["chicken", "rice"],
+    "avoided_foods": ["mushroom"],
+    "residence": "CMH",
+}
+
+
+def legacy_payload(transcript: str, preferences: dict, history: dict, menu: list) -> str:
+    """Size-equivalent of the old prompt: instructions plus indent=2 JSON of everything."""
+    return "\n".join([
+        _INSTRUCTIONS,
+        transcript,
+        json.dumps(preferences, indent=2),
+        json.dumps(history, indent=2),
+        json.dumps(menu, indent=2),
+    ])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Prompt size benchmark")
+    parser.add_argument("--budget", type=int, default=6000, help="token budget")
+    parser.add_argument("--history", type=int, default=50, help="history entries")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    menu = parse_seed_sql(Path(MENU_SEED_SQL).read_text(encoding="utf-8"))
+    day = menu[0]["day"]
+    history = {"messages": [
+        {"text": f"Day {i}: had the chicken karaage and felt {'better' if i % 3 else 'bloated'} after", "score": 1 - i / 1000}
+        for i in range(args.history)
+    ]}
+    transcript = "ugh I'm so stressed about midterms, I just want something warm"
+
+    legacy = legacy_payload(transcript, PREFERENCES, history, menu)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        prompt = build_prompt(
+            transcript=transcript, user_preferences=PREFERENCES, user_history=history,
+            menu_data=menu, is_logged_in=True, day=day, token_budget=args.budget,
+        )
+    build_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+    print(f"seed menu: {len(menu)} items across {len({r['day'] for r in menu})} days")
+    print(f"legacy (indent=2, full menu): {len(legacy):8,} chars  ~{estimate_tokens(legacy):7,} tokens")
+    print(f"compact (day={day}, CMH):  {len(prompt):8,} chars  ~{estimate_tokens(prompt):7,} tokens  "
+          f"(budget {args.budget}, built in {build_ms:.2f} ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Benchmark the local ranking engine on synthetic candidates.
+
+Usage:
+  cd backend
+  python benchmarks/bench_ranking.py            # 10k candidates
+  python benchmarks/bench_ranking.py -n 50000 --repeat 20
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.ranking_engine import rank_candidates  # noqa: E402
+
+PROTEINS = ["chicken", "beef", "pork", "tofu", "tempeh", "salmon", "lentil", "chickpea", "egg", "shrimp"]
+STYLES = ["curry", "stir fry", "pasta", "bowl", "wrap", "soup", "salad", "tacos", "burger", "dumplings"]
+EXTRAS = ["spicy", "garlic", "lemon", "mushroom", "sesame", "peanut", "cheese", "coconut", "ginger", "basil"]
+TAGS = ["vegan", "vegetarian", "halal", "no-dairy", "no-gluten"]
+
+
+def make_menu(n: int, seed: int = 7) -> tuple[list[str], dict[str, dict]]:
+    rng = random.Random(seed)
+    names, rows = [], {}
+    for i in range(n):
+        name = f"{rng.choice(EXTRAS).title()} {rng.choice(PROTEINS)} {rng.choice(STYLES)} #{i}"
+        names.append(name)
+        rows[name.lower()] = {
+            "item_name": name,
+            "tags": rng.sample(TAGS, rng.randint(0, 2)),
+            "ingredients": rng.sample(EXTRAS + PROTEINS, 5),
+        }
+    return names, rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", type=int, default=10_000, help="number of candidates")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    candidates, menu_rows = make_menu(args.n)
+    prefs = [
+        SimpleNamespace(preference_type="restriction", value="vegan"),
+        SimpleNamespace(preference_type="like", value="spicy"),
+        SimpleNamespace(preference_type="like", value="coconut curry"),
+        SimpleNamespace(preference_type="dislike", value="mushrooms"),
+        SimpleNamespace(preference_type="allergy", value="peanut"),
+    ]
+    keywords = ["ginger", "soup", "warm"]
+
+    rank_candidates(candidates, prefs, args.top_k, keywords, menu_rows)  # warm-up
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        top = rank_candidates(candidates, prefs, args.top_k, keywords, menu_rows)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print(f"candidates={args.n} prefs={len(prefs)} keywords={len(keywords)} top_k={args.top_k}")
+    print(f"median {statistics.median(timings):.2f} ms  min {min(timings):.2f} ms  max {max(timings):.2f} ms")
+    for item in top:
+        print(f"  {item.score:.3f}  {item.item}  — {item.reason}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
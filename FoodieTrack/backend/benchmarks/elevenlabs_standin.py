@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the ElevenLabs speech-to-text API.
+
+POST /v1/speech-to-text accepts the multipart upload the backend sends and
+returns {"text", "language_code"} after an injected latency (median, with
+lognormal `jitter`), failing a `fail_rate` fraction of calls with 503.
+Transcripts are drawn from a fixed pool of food-related utterances.
+
+Usage:
+  cd backend
+  python benchmarks/elevenlabs_standin.py --port 8788 --latency-ms 400 --jitter 0.3
+
+or in-process: httpx.ASGITransport(app=create_app(...)).
+"""
+
+import argparse
+import asyncio
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+TRANSCRIPTS = [
+    "I'm vegetarian and I love tofu, can you find me something warm for dinner",
+    "ugh I'm so stressed about midterms, I just want some comfort food",
+    "I'm allergic to peanuts and I don't like mushrooms",
+    "that chicken karaage yesterday was amazing, anything like that today?",
+    "I'm trying to eat more protein, what's good at CMH tonight",
+    "honestly I feel kind of sick, something light please",
+    "I'm halal and I really want something spicy",
+    "no dairy for me, I'm lactose intolerant, but I love pasta",
+]
+
+
+def create_app(latency_ms: float = 0.0, fail_rate: float = 0.0, jitter: float = 0.0, seed: int | None = None) -> FastAPI:
+    app = FastAPI(title="ElevenLabs stand-in")
+    rng = random.Random(seed)
+    app.state.calls = {"stt": 0, "failed": 0, "bytes": 0}
+
+    @app.post("/v1/speech-to-text")
+    async def speech_to_text(request: Request):
+        app.state.calls["stt"] += 1
+        body = await request.body()
+        app.state.calls["bytes"] += len(body)
+        if latency_ms:
+            await asyncio.sleep(latency_ms * (rng.lognormvariate(0, jitter) if jitter else 1) / 1000)
+        if fail_rate and rng.random() < fail_rate:
+            app.state.calls["failed"] += 1
+            return JSONResponse({"detail": "injected failure"}, status_code=503)
+        return {"text": rng.choice(TRANSCRIPTS), "language_code": "en"}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="ElevenLabs stand-in server")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0, help="lognormal sigma around the median latency")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency_ms, args.fail_rate, args.jitter), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+In-process stand-in for the parts of `google.genai.Client` the backend uses:
+`aio.models.generate_content` and `aio.caches.create/update/delete`.
+
+Latency is modelled as a fixed overhead (with optional lognormal `jitter`)
+plus a per-token cost for input that is not served from cached content. The
+reply is a fixed JSON value or a callable `(prompt_text, config) -> value`. Cached contents expire by wall clock, and
+referencing a missing or expired one raises the same `errors.ClientError`
+(404) as the real API. Plug it in with `GeminiGateway(api_key="", client=StandinClient())`.
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import time
+from types import SimpleNamespace
+
+from google.genai import errors, types
+
+from utils.prompt_builder import estimate_tokens
+
+
+def _text_of(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return "\n".join(_text_of(v) for v in value)
+    parts = getattr(value, "parts", None)
+    if parts is not None:
+        return "\n".join(p.text or "" for p in parts)
+    return str(value)
+
+
+def _ttl_seconds(ttl: str | None, default: float) -> float:
+    return float(ttl.rstrip("s")) if ttl else default
+
+
+class _Caches:
+    def __init__(self, owner: "StandinClient"):
+        self._owner = owner
+        self._ids = itertools.count(1)
+
+    def _get(self, name: str) -> dict:
+        entry = self._owner.cached.get(name)
+        if entry is None or entry["expires_at"] <= time.time():
+            self._owner.cached.pop(name, None)
+            raise errors.ClientError(404, {"error": {"code": 404, "message": f"{name} not found", "status": "NOT_FOUND"}})
+        return entry
+
+    async def create(self, *, model: str, config: types.CreateCachedContentConfig) -> types.CachedContent:
+        self._owner.calls["cache_create"] += 1
+        text = _text_of(config.system_instruction) + _text_of(config.contents)
+        tokens = estimate_tokens(text)
+        if tokens < self._owner.min_cache_tokens:
+            raise errors.ClientError(400, {"error": {"code": 400, "message": "Cached content is too small", "status": "INVALID_ARGUMENT"}})
+        await asyncio.sleep(self._owner.per_token_ms * tokens / 1000)
+        name = f"cachedContents/standin-{next(self._ids)}"
+        self._owner.cached[name] = {
+            "model": model,
+            "text": text,
+            "tokens": tokens,
+            "expires_at": time.time() + _ttl_seconds(config.ttl, 3600),
+        }
+        return types.CachedContent(name=name, model=model, display_name=config.display_name)
+
+    async def update(self, *, name: str, config: types.UpdateCachedContentConfig) -> types.CachedContent:
+        self._owner.calls["cache_update"] += 1
+        entry = self._get(name)
+        entry["expires_at"] = time.time() + _ttl_seconds(config.ttl, 3600)
+        return types.CachedContent(name=name, model=entry["model"])
+
+    async def delete(self, *, name: str) -> None:
+        self._owner.calls["cache_delete"] += 1
+        self._get(name)
+        del self._owner.cached[name]
+
+    def expire(self, name: str) -> None:
+        """Test hook: make a cached content expire now."""
+        self._owner.cached[name]["expires_at"] = 0
+
+
+class _Models:
+    def __init__(self, owner: "StandinClient"):
+        self._owner = owner
+
+    async def generate_content(self, *, model: str, contents, config: types.GenerateContentConfig | None = None):
+        owner = self._owner
+        owner.calls["generate"] += 1
+        config = config or types.GenerateContentConfig()
+        if owner.fail_rate and owner.rng.random() < owner.fail_rate:
+            raise errors.ServerError(503, {"error": {"code": 503, "message": "injected failure", "status": "UNAVAILABLE"}})
+        cached_tokens = 0
+        if config.cached_content:
+            cached_tokens = owner.caches._get(config.cached_content)["tokens"]
+        prompt_text = _text_of(config.system_instruction) + _text_of(contents)
+        sent_tokens = estimate_tokens(prompt_text)
+        owner.tokens["sent"] += sent_tokens
+        owner.tokens["cached"] += cached_tokens
+        overhead = owner.overhead_ms * (owner.rng.lognormvariate(0, owner.jitter) if owner.jitter else 1)
+        await asyncio.sleep((overhead + owner.per_token_ms * sent_tokens) / 1000)
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=sent_tokens + cached_tokens, cached_content_token_count=cached_tokens
+        )
+        reply = owner.reply(prompt_text, config) if callable(owner.reply) else owner.reply
+        return SimpleNamespace(text=json.dumps(reply), usage_metadata=usage)
+
+
+class StandinClient:
+    """Fake `genai.Client` with `.aio.models` and `.aio.caches`."""
+
+    def __init__(
+        self,
+        overhead_ms: float = 50.0,
+        per_token_ms: float = 0.05,
+        min_cache_tokens: int = 1024,
+        reply=None,
+        jitter: float = 0.0,
+        fail_rate: float = 0.0,
+        seed: int | None = None,
+    ):
+        self.overhead_ms = overhead_ms
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+        self.per_token_ms = per_token_ms
+        self.min_cache_tokens = min_cache_tokens
+        self.reply = reply if reply is not None else {"ok": True}
+        self.cached: dict[str, dict] = {}
+        self.calls = {"generate": 0, "cache_create": 0, "cache_update": 0, "cache_delete": 0}
+        self.tokens = {"sent": 0, "cached": 0}
+        self.caches = _Caches(self)
+        self.models = _Models(self)
+        self.aio = SimpleNamespace(models=self.models, caches=self.caches, aclose=self._aclose)
+
+    async def _aclose(self) -> None:
+        return None
@@ -0,0 +1,403 @@
+#!/usr/bin/env python
+"""
+Offline load test for the FastAPI app with every upstream replaced by a
+local stand-in:
+
+  ElevenLabs  elevenlabs_standin.py   (ASGI app behind the shared httpx client)
+  Gemini      gemini_standin.py       (fake genai client behind the gateway)
+  Snowflake   snowflake_standin.py    (drop-in for db.query_day)
+  Auth0       auth_standin.py         (RS256 tokens + JWKS endpoint)
+  Backboard   backboard_standin.py    (ASGI app behind the async client)
+
+Each upstream gets a median latency, a lognormal jitter (sigma) and an error
+rate. The app runs in-process (startup/shutdown hooks included, SQLite in a
+temp dir) and `--concurrency` workers drive /voice/analyze, /recommendations/
+and /preferences/ in a weighted mix. Throughput and p50/p95/p99 latency
+(over successful requests) per endpoint are compared against a stored
+baseline. The exit status is 1 when p95 or throughput regress beyond
+`--tolerance`, or when requests or background preference writes (the
+write-behind behind /voice/analyze) fail more often than `--max-error-rate`
+(default 0: any failure fails the run). Runs that inject upstream errors
+with --fail-rate need a matching --max-error-rate. A baseline recorded with
+a different configuration is shown for reference but not gated on.
+
+Baselines are machine-specific: record one with --save-baseline on the
+machine (or CI runner class) that runs the comparison.
+
+Usage:
+  cd backend
+  python benchmarks/loadtest.py
+  python benchmarks/loadtest.py --concurrency 64 --duration 30
+  python benchmarks/loadtest.py --latency gemini=800:0.4
+  python benchmarks/loadtest.py --fail-rate elevenlabs=0.02 --max-error-rate 0.05
+  python benchmarks/loadtest.py --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+DEFAULT_BASELINE = BENCH_DIR / "loadtest_baseline.json"
+
+# upstream -> (median latency ms, lognormal jitter sigma)
+DEFAULT_LATENCY = {
+    "elevenlabs": (300.0, 0.3),
+    "gemini": (400.0, 0.3),
+    "snowflake": (150.0, 0.2),
+    "auth0": (30.0, 0.2),
+    "backboard": (40.0, 0.3),
+}
+DEFAULT_MIX = {"voice": 2, "recommendations": 3, "preferences_list": 4, "preferences_add": 1}
+
+DOMAIN, AUDIENCE = "auth.standin", "foodietrack-api"
+PREFERENCE_VALUES = {
+    "like": ["tofu", "rice", "pasta", "curry", "chicken", "spicy food", "noodles"],
+    "dislike": ["mushrooms", "olives", "cilantro", "eggplant"],
+    "allergy": ["peanuts", "shellfish", "soy", "sesame"],
+    "restriction": ["vegetarian", "halal", "no-dairy", "no-gluten"],
+}
+
+
+def _parse_pairs(values: list[str], cast) -> dict:
+    out = {}
+    for item in values or []:
+        name, _, value = item.partition("=")
+        if name not in DEFAULT_LATENCY and name not in DEFAULT_MIX:
+            raise SystemExit(f"unknown name in {item!r}")
+        out[name] = cast(value)
+    return out
+
+
+def _latency(value: str) -> tuple[float, float]:
+    median, _, jitter = value.partition(":")
+    return float(median), float(jitter or 0)
+
+
+def configure_env(workdir: Path) -> None:
+    """Point every setting at the stand-ins; must run before `main` is imported."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir / 'loadtest.db'}",
+        "MENU_SNAPSHOT_PATH": str(workdir / "menu_snapshot.db"),
+        "SNOWFLAKE_ACCOUNT": "standin",  # read_menu_day syncs missing days through db.query_day
+        "AUTH0_DOMAIN": DOMAIN,
+        "AUTH0_AUDIENCE": AUDIENCE,
+        "AUTH0_JWKS_URL": f"http://{DOMAIN}/.well-known/jwks.json",
+        "ELEVENLABS_API_KEY": "standin",
+        "GEMINI_API_KEY": "standin",
+        "BACKBOARD_API_KEY": "standin",
+        "BACKBOARD_URL": "http://backboard.standin",
+        "BACKBOARD_BATCH_PATH": "/documents/batch",
+        "TRANSCRIPT_ARCHIVE_JOURNAL": str(workdir / "transcript_journal.jsonl"),
+        "PREFERENCE_CACHE_BUS_DIR": "",
+        "TRACE_LOG_LEVEL": "DEBUG",
+    })
+
+
+def gemini_reply(prompt: str, config) -> object:
+    """Voice insights for schema'd calls, otherwise a ranking of the prompt's candidates."""
+    if config.response_schema:
+        return {"transcript": "", "sentiment": "neutral", "emotion": "neutral", "intent": "food order", "keywords": ["tofu"]}
+    candidates = re.findall(r"^- (.+)$", prompt.split("Candidates:")[-1], re.M)
+    return [{"item": c, "score": round(1 - i * 0.1, 2), "reason": "stand-in"} for i, c in enumerate(candidates[:3])]
+
+
+async def install_standins(latency: dict, fail: dict, seed: int) -> dict:
+    """Wire the stand-ins into the imported app modules; returns their call counters."""
+    import autho
+    import backboard
+    import db
+    import main
+    from auth_standin import AuthStandin
+    from backboard_standin import create_app as backboard_app
+    from elevenlabs_standin import create_app as elevenlabs_app
+    from gemini_standin import StandinClient
+    from services import gemini_client, voice_service
+    from snowflake_standin import make_query_day
+
+    auth = AuthStandin(DOMAIN, AUDIENCE)
+    jwks_app = auth.create_app(*latency["auth0"], seed=seed)
+    autho.jwks_store._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=jwks_app))
+
+    stt_app = elevenlabs_app(*latency["elevenlabs"][:1], fail.get("elevenlabs", 0.0), latency["elevenlabs"][1], seed=seed)
+    voice_service._http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stt_app))
+
+    median, jitter = latency["gemini"]
+    gemini = StandinClient(overhead_ms=median, per_token_ms=0.02, reply=gemini_reply, jitter=jitter,
+                           fail_rate=fail.get("gemini", 0.0), seed=seed)
+    gemini_client._gateway = gemini_client.GeminiGateway(api_key="", client=gemini)
+
+    bb_app = backboard_app(latency["backboard"][0], fail.get("backboard", 0.0), seed=seed, jitter=latency["backboard"][1])
+    backboard._client = backboard.AsyncBackboardClient(transport=httpx.ASGITransport(app=bb_app))
+
+    query_day = make_query_day(*latency["snowflake"], fail_rate=fail.get("snowflake", 0.0), seed=seed)
+    db.query_day = query_day
+    main.warm_up_pool = lambda: None  # nothing to log in to
+
+    # Voice-extracted preferences are saved after the response: count those writes separately
+    from services import preference_writer
+    background = {"preference_writes": 0, "preference_write_failures": 0}
+    bulk_upsert_many = preference_writer.bulk_upsert_many
+
+    async def counted_upsert(session, items):
+        items = list(items)
+        background["preference_writes"] += len(items)
+        try:
+            return await bulk_upsert_many(session, items)
+        except Exception:
+            background["preference_write_failures"] += len(items)
+            raise
+
+    preference_writer.bulk_upsert_many = counted_upsert
+
+    return {
+        "auth": auth,
+        "background": background,
+        "calls": {
+            "elevenlabs": stt_app.state.calls,
+            "gemini": gemini.calls,
+            "backboard": bb_app.state.calls,
+            "auth0": jwks_app.state.calls,
+            "snowflake": query_day,
+        },
+    }
+
+
+def _wav(rng: random.Random, size: int) -> bytes:
+    # Unique bytes per request so the content-addressed transcription cache doesn't short-circuit STT
+    payload = rng.randbytes(size)
+    return b"RIFF" + (size + 4).to_bytes(4, "little") + b"WAVE" + payload
+
+
+class Scenarios:
+    def __init__(self, client: httpx.AsyncClient, tokens: list[str], menu_items: list[str], audio_kb: int, seed: int):
+        self.client = client
+        self.tokens = tokens
+        self.menu_items = menu_items
+        self.audio_bytes = audio_kb * 1024
+        self.rng = random.Random(seed)
+
+    def _auth(self) -> dict:
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+    async def voice(self) -> httpx.Response:
+        files = {"audio": ("audio.wav", _wav(self.rng, self.audio_bytes), "audio/wav")}
+        return await self.client.post("/voice/analyze", files=files, data={"use_gemini": "true"}, headers=self._auth())
+
+    async def recommendations(self) -> httpx.Response:
+        body = {
+            "candidates": self.rng.sample(self.menu_items, min(8, len(self.menu_items))),
+            "top_k": 3,
+            "mode": "gemini" if self.rng.random() < 0.7 else "fast",
+        }
+        return await self.client.post("/recommendations/", json=body, headers=self._auth())
+
+    async def preferences_list(self) -> httpx.Response:
+        return await self.client.get("/preferences/", params={"limit": 50}, headers=self._auth())
+
+    async def preferences_add(self) -> httpx.Response:
+        ptype = self.rng.choice(list(PREFERENCE_VALUES))
+        body = {"preference_type": ptype, "value": self.rng.choice(PREFERENCE_VALUES[ptype])}
+        return await self.client.post("/preferences/", json=body, headers=self._auth())
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def summarize(samples: dict[str, list[tuple[float, bool]]], elapsed: float) -> dict:
+    def stats(rows: list[tuple[float, bool]]) -> dict:
+        # Failures are often fast rejections; keep them out of the latency figures
+        latencies = sorted(ms for ms, ok in rows if ok)
+        errors = sum(1 for _, ok in rows if not ok)
+        return {
+            "count": len(rows),
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "rps": round(len(rows) / elapsed, 2),
+            "p50_ms": round(_percentile(latencies, 0.50), 1),
+            "p95_ms": round(_percentile(latencies, 0.95), 1),
+            "p99_ms": round(_percentile(latencies, 0.99), 1),
+        }
+
+    endpoints = {name: stats(rows) for name, rows in sorted(samples.items())}
+    endpoints["total"] = stats([r for rows in samples.values() for r in rows])
+    return endpoints
+
+
+async def run(args, latency: dict, fail: dict, mix: dict) -> dict:
+    with tempfile.TemporaryDirectory(prefix="foodietrack-loadtest-") as tmp:
+        configure_env(Path(tmp))
+        import main
+        from services.menu_snapshot import MENU_SEED_SQL, parse_seed_sql
+
+        standins = await install_standins(latency, fail, args.seed)
+        await main.on_startup()
+        menu_items = sorted({r["item_name"] for r in parse_seed_sql(Path(MENU_SEED_SQL).read_text(encoding="utf-8"))})
+        tokens = [standins["auth"].token(f"loadtest|user-{i}") for i in range(args.users)]
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://foodietrack", timeout=60) as client:
+            names = list(mix)
+            weights = [mix[n] for n in names]
+            samples: dict[str, list[tuple[float, bool]]] = {n: [] for n in names}
+            start = time.perf_counter()
+            measure_from = start + args.warmup
+            deadline = measure_from + args.duration
+
+            async def worker(i: int) -> None:
+                scenarios = Scenarios(client, tokens, menu_items, args.audio_kb, seed=args.seed * 1000 + i)
+                rng = random.Random(args.seed + i)
+                while (now := time.perf_counter()) < deadline:
+                    name = rng.choices(names, weights)[0]
+                    t0 = time.perf_counter()
+                    try:
+                        ok = (await getattr(scenarios, name)()).status_code < 400
+                    except Exception:
+                        ok = False
+                    if now >= measure_from:
+                        samples[name].append(((time.perf_counter() - t0) * 1000, ok))
+
+            await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+            elapsed = time.perf_counter() - measure_from
+
+        await main.on_shutdown()
+        calls = standins["calls"]
+        upstream = {
+            "elevenlabs": calls["elevenlabs"]["stt"],
+            "gemini": calls["gemini"]["generate"],
+            "backboard": calls["backboard"]["documents"] + calls["backboard"]["batch"],
+            "auth0_jwks": calls["auth0"]["jwks"],
+            "snowflake": calls["snowflake"].calls,
+        }
+    return {
+        "config": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "users": args.users,
+            "audio_kb": args.audio_kb,
+            "mix": mix,
+            "latency": {k: list(v) for k, v in latency.items()},
+            "fail_rate": fail,
+        },
+        "endpoints": summarize(samples, elapsed),
+        "upstream_calls": upstream,
+        "background": dict(standins["background"]),
+    }
+
+
+def print_report(result: dict) -> None:
+    print(f"{'endpoint':18} {'count':>7} {'err%':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, s in result["endpoints"].items():
+        print(f"{name:18} {s['count']:7} {s['error_rate'] * 100:6.1f} {s['rps']:8.1f} "
+              f"{s['p50_ms']:9.1f} {s['p95_ms']:9.1f} {s['p99_ms']:9.1f}")
+    print("upstream calls: " + ", ".join(f"{k}={v}" for k, v in result["upstream_calls"].items()))
+    print("background: " + ", ".join(f"{k}={v}" for k, v in result["background"].items()))
+
+
+def failures(result: dict, max_error_rate: float) -> list[str]:
+    """Endpoints, and background preference writes, whose error rate exceeds `max_error_rate`."""
+    found = [
+        f"{name}: {s['errors']}/{s['count']} requests failed ({s['error_rate']:.2%})"
+        for name, s in result["endpoints"].items()
+        if name != "total" and s["error_rate"] > max_error_rate
+    ]
+    writes, failed = result["background"]["preference_writes"], result["background"]["preference_write_failures"]
+    if writes and failed / writes > max_error_rate:
+        found.append(f"background preference writes: {failed}/{writes} failed ({failed / writes:.2%})")
+    return found
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions of `result` against `baseline` (empty list when within tolerance)."""
+    regressions = []
+    print(f"\n{'vs baseline':18} {'rps':>16} {'p95 ms':>20} {'err%':>14}")
+    for name, cur in result["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base or not base["count"]:
+            continue
+        rps_delta = cur["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        p95_delta = cur["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        err_delta = cur["error_rate"] - base["error_rate"]
+        print(f"{name:18} {base['rps']:7.1f} {rps_delta:+7.1%} {base['p95_ms']:9.1f} {p95_delta:+9.1%} "
+              f"{err_delta * 100:+13.2f}")
+        if p95_delta > tolerance:
+            regressions.append(f"{name}: p95 {base['p95_ms']} -> {cur['p95_ms']} ms ({p95_delta:+.0%})")
+        if rps_delta < -tolerance:
+            regressions.append(f"{name}: throughput {base['rps']} -> {cur['rps']} rps ({rps_delta:+.0%})")
+        if err_delta > 0.01:
+            regressions.append(f"{name}: error rate {base['error_rate']:.2%} -> {cur['error_rate']:.2%}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline FoodieTrack load test")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before the run")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--audio-kb", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mix", action="append", metavar="SCENARIO=WEIGHT", help=f"default {DEFAULT_MIX}")
+    parser.add_argument("--latency", action="append", metavar="UPSTREAM=MEDIAN_MS[:JITTER]")
+    parser.add_argument("--fail-rate", action="append", metavar="UPSTREAM=RATE")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 / throughput regression")
+    parser.add_argument("--max-error-rate", type=float, default=0.0,
+                        help="allowed error rate per endpoint (raise it when injecting --fail-rate)")
+    parser.add_argument("--json", metavar="PATH", help="also write the result here")
+    args = parser.parse_args()
+
+    latency = {**DEFAULT_LATENCY, **_parse_pairs(args.latency, _latency)}
+    fail = _parse_pairs(args.fail_rate, float)
+    mix = _parse_pairs(args.mix, float) or dict(DEFAULT_MIX)
+
+    result = asyncio.run(run(args, latency, fail, mix))
+    print_report(result)
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2) + "\n")
+
+    failed = failures(result, args.max_error_rate)
+    if failed:
+        print("\nFAILURES:\n  " + "\n  ".join(failed))
+        if args.save_baseline:
+            print("baseline not written: the run had failures")
+        return 1
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"baseline written to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path}; run with --save-baseline to record one")
+        return 0
+    baseline = json.loads(baseline_path.read_text())
+    regressions = compare(result, baseline, args.tolerance)
+    if baseline.get("config") != result["config"]:
+        print("\nbaseline was recorded with a different configuration: shown for reference only, not gated on")
+        return 0
+    if regressions:
+        print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+        return 1
+    print(f"\nwithin {args.tolerance:.0%} of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
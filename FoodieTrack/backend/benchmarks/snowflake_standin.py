@@ -0,0 +1,43 @@
+"""
+Stand-in for the Snowflake menu query (`db.query_day`).
+
+Serves the seed menu (menu_db_setup.sql) re-dated to whatever day is asked
+for, in Snowflake's shape (upper-case keys, ARRAY columns as JSON strings),
+after a blocking injected latency like a real cursor round trip.
+"""
+
+import json
+import random
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+from services.menu_snapshot import ARRAY_COLUMNS, MENU_SEED_SQL, parse_seed_sql
+
+
+def make_query_day(latency_ms: float = 0.0, jitter: float = 0.0, fail_rate: float = 0.0, seed: int | None = None):
+    """A drop-in for `db.query_day`; `.calls` counts invocations."""
+    rows = parse_seed_sql(Path(MENU_SEED_SQL).read_text(encoding="utf-8"))
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def query_day(day: date) -> list[dict]:
+        with lock:
+            query_day.calls += 1
+            delay = latency_ms * (rng.lognormvariate(0, jitter) if jitter else 1) / 1000
+            failed = bool(fail_rate) and rng.random() < fail_rate
+        time.sleep(delay)
+        if failed:
+            raise RuntimeError("injected Snowflake failure")
+        return [
+            {
+                **{k.upper(): v for k, v in row.items() if k not in ARRAY_COLUMNS},
+                **{k.upper(): json.dumps(row[k]) for k in ARRAY_COLUMNS},
+                "DAY": day.isoformat(),
+            }
+            for row in rows
+        ]
+
+    query_day.calls = 0
+    return query_day
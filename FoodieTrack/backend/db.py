@@ -1,10 +1,134 @@
 import snowflake.connector
+import logging
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from datetime import date
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from metrics import SNOWFLAKE_POOL_WAIT_SECONDS, SNOWFLAKE_POOL_IN_USE, SNOWFLAKE_POOL_SIZE
+from utils.instrumentation import track
 
 load_dotenv()  # loads your .env variables
 
+logger = logging.getLogger(__name__)
+
+# Pool sizing / lifecycle – override via env
+SNOWFLAKE_POOL_MIN_SIZE = int(os.getenv("SNOWFLAKE_POOL_MIN_SIZE", "1"))
+SNOWFLAKE_POOL_MAX_SIZE = int(os.getenv("SNOWFLAKE_POOL_MAX_SIZE", "5"))
+SNOWFLAKE_POOL_TIMEOUT = float(os.getenv("SNOWFLAKE_POOL_TIMEOUT", "10"))  # seconds to wait for a free connection
+SNOWFLAKE_POOL_MAX_IDLE = float(os.getenv("SNOWFLAKE_POOL_MAX_IDLE", "600"))  # recycle sessions idle longer than this
+SNOWFLAKE_POOL_MAX_LIFETIME = float(os.getenv("SNOWFLAKE_POOL_MAX_LIFETIME", "3600"))  # recycle sessions older than this
+SNOWFLAKE_POOL_PING_AFTER = float(os.getenv("SNOWFLAKE_POOL_PING_AFTER", "60"))  # ping sessions idle longer than this
+
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./foodietrack.db")
+
+engine = create_async_engine(DATABASE_URL)
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _dedupe_preferences(sync_conn) -> None:
+    """
+    Collapse duplicates left over from before the uniqueness key. The most
+    recently updated row of each (user, type, lower(value)) group is kept,
+    with `meta` merged from the whole group (newer keys win) and the group's
+    earliest `created_at`; the other rows are deleted.
+    """
+    from models.preference import Preference
+
+    table = Preference.__table__
+    lowered = func.lower(table.c.value)
+    groups = (
+        select(table.c.user_id, table.c.preference_type, lowered.label("lvalue"))
+        .group_by(table.c.user_id, table.c.preference_type, lowered)
+        .having(func.count() > 1)
+        .subquery()
+    )
+    rows = sync_conn.execute(
+        select(table, groups.c.lvalue).join(
+            groups,
+            and_(
+                table.c.user_id == groups.c.user_id,
+                table.c.preference_type == groups.c.preference_type,
+                lowered == groups.c.lvalue,
+            ),
+        )
+    ).all()
+    by_key: dict[tuple, list] = {}
+    for row in rows:
+        by_key.setdefault((row.user_id, row.preference_type, row.lvalue), []).append(row)
+
+    merged: dict[int, list[int]] = {}
+    for group in by_key.values():
+        group.sort(key=lambda r: (r.updated_at, r.id))
+        keeper, older = group[-1], group[:-1]
+        meta: dict = {}
+        for row in group:
+            meta.update(row._mapping["metadata"] or {})
+        sync_conn.execute(
+            update(table)
+            .where(table.c.id == keeper.id)
+            .values(metadata=meta or None, created_at=min(r.created_at for r in group))
+        )
+        sync_conn.execute(delete(table).where(table.c.id.in_([r.id for r in older])))
+        merged[keeper.id] = [r.id for r in older]
+    if merged:
+        logger.warning(
+            "Deleted %d duplicate preferences before adding the unique key (kept id: deleted ids): %s",
+            sum(len(ids) for ids in merged.values()),
+            merged,
+        )
+
+
+def _upgrade_schema(sync_conn) -> None:
+    """
+    create_all() skips tables that already exist, so indexes added since a
+    table was created are built here. (IF NOT EXISTS rather than reflection:
+    SQLite reflection skips expression indexes.)
+    """
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            ddl = CreateIndex(index, if_not_exists=True)
+            try:
+                with sync_conn.begin_nested():
+                    sync_conn.execute(ddl)
+            except IntegrityError:
+                if index.name != "uq_preference_user_type_value":
+                    raise
+                _dedupe_preferences(sync_conn)
+                sync_conn.execute(ddl)
+
+
+async def init_db() -> None:
+    """Create missing tables and indexes for the application database."""
+    import models.preference  # noqa: F401  (registers the table on SQLModel.metadata)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+
+
+async def get_session():
+    """FastAPI dependency yielding an AsyncSession."""
+    async with async_session() as session:
+        yield session
+
+
+class PoolTimeoutError(Exception):
+    """No Snowflake connection became available within the checkout timeout."""
+
+    pass
+
+
 def get_connection():
     return snowflake.connector.connect(
         user=os.getenv("SNOWFLAKE_USER"),
@@ -14,29 +138,264 @@ def get_connection():
         database=os.getenv("SNOWFLAKE_DATABASE"),
         schema=os.getenv("SNOWFLAKE_SCHEMA"),
         role=os.getenv("SNOWFLAKE_ROLE"),
+        client_session_keep_alive=True,
     )
 
-def query_today():
+
+class _PooledConnection:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used = now
+
+
+class SnowflakePool:
     """
-    Queries the given table and returns rows where day_column equals today.
+    Thread-safe pool of logged-in Snowflake sessions.
+
+    Connections are checked out with `connection()`; idle sessions are
+    recycled after `max_idle`, sessions older than `max_lifetime` are
+    replaced, and sessions idle longer than `ping_after` are health-checked
+    with `SELECT 1` before being handed out.
     """
-    today_str = date.today().isoformat()  # 'YYYY-MM-DD'
 
-    sql = f"""
+    def __init__(
+        self,
+        min_size: int = SNOWFLAKE_POOL_MIN_SIZE,
+        max_size: int = SNOWFLAKE_POOL_MAX_SIZE,
+        timeout: float = SNOWFLAKE_POOL_TIMEOUT,
+        max_idle: float = SNOWFLAKE_POOL_MAX_IDLE,
+        max_lifetime: float = SNOWFLAKE_POOL_MAX_LIFETIME,
+        ping_after: float = SNOWFLAKE_POOL_PING_AFTER,
+        connect=get_connection,
+    ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError("Invalid pool size: require 0 <= min_size <= max_size and max_size >= 1")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self._connect = connect
+        self._idle: deque[_PooledConnection] = deque()
+        self._cond = threading.Condition()
+        self._size = 0  # open connections (idle + in use)
+        self._in_use = 0
+        self._closed = False
+
+    # --- Stats ---
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def _publish(self) -> None:
+        SNOWFLAKE_POOL_SIZE.set(self._size)
+        SNOWFLAKE_POOL_IN_USE.set(self._in_use)
+
+    # --- Lifecycle ---
+
+    def warm_up(self) -> None:
+        """Open connections until `min_size` sessions are idle and ready."""
+        while True:
+            with self._cond:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                entry = _PooledConnection(self._connect())
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._publish()
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._publish()
+                self._cond.notify()
+
+    def close(self) -> None:
+        """Close idle connections; in-use ones are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._publish()
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    # --- Checkout / return ---
+
+    def _is_expired(self, entry: _PooledConnection, now: float) -> bool:
+        return (now - entry.last_used) > self.max_idle or (now - entry.created_at) > self.max_lifetime
+
+    def _is_healthy(self, entry: _PooledConnection, now: float) -> bool:
+        try:
+            if entry.conn.is_closed():
+                return False
+            if (now - entry.last_used) > self.ping_after:
+                cur = entry.conn.cursor()
+                try:
+                    cur.execute("SELECT 1")
+                    cur.fetchone()
+                finally:
+                    cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, entry: _PooledConnection) -> None:
+        try:
+            entry.conn.close()
+        except Exception:
+            logger.debug("Error closing Snowflake connection", exc_info=True)
+
+    def acquire(self, timeout: float | None = None):
+        """Check out a healthy connection, opening a new one if below `max_size`."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            entry = None
+            open_new = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Snowflake pool is closed")
+                    if self._idle:
+                        entry = self._idle.pop()  # LIFO keeps hot sessions hot
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        open_new = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        SNOWFLAKE_POOL_WAIT_SECONDS.observe(time.monotonic() - started)
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout:.1f}s waiting for a Snowflake connection"
+                        )
+                    self._cond.wait(remaining)
+                self._in_use += 1
+                self._publish()
+
+            if open_new:
+                try:
+                    entry = _PooledConnection(self._connect())
+                except Exception:
+                    self._forget()
+                    raise
+            else:
+                now = time.monotonic()
+                if self._is_expired(entry, now) or not self._is_healthy(entry, now):
+                    self._discard(entry)
+                    self._forget()
+                    continue
+
+            SNOWFLAKE_POOL_WAIT_SECONDS.observe(time.monotonic() - started)
+            return entry
+
+    def _forget(self) -> None:
+        """Drop the bookkeeping for a checked-out connection that no longer exists."""
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._publish()
+            self._cond.notify()
+
+    def release(self, entry: _PooledConnection, broken: bool = False) -> None:
+        """Return a connection; broken ones are closed instead of reused."""
+        if broken or self._closed:
+            self._discard(entry)
+            self._forget()
+            return
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(entry)
+            self._publish()
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        entry = self.acquire(timeout)
+        try:
+            yield entry.conn
+        except snowflake.connector.errors.DatabaseError:
+            # The session may be unusable after a driver-level failure
+            self.release(entry, broken=True)
+            raise
+        except BaseException:
+            self.release(entry)
+            raise
+        else:
+            self.release(entry)
+
+
+_pool: SnowflakePool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> SnowflakePool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SnowflakePool()
+    return _pool
+
+
+def warm_up_pool() -> None:
+    """Open the minimum number of Snowflake sessions (call once at startup)."""
+    if not os.getenv("SNOWFLAKE_ACCOUNT"):
+        logger.info("SNOWFLAKE_ACCOUNT not set; skipping Snowflake pool warm-up")
+        return
+    get_pool().warm_up()
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def query_day(day: date) -> list[dict]:
+    """
+    Returns the menu_items rows for the given day.
+    """
+    sql = """
         SELECT *
         FROM menu_items
-        WHERE day = '{today_str}'
+        WHERE day = %s
     """
 
-    conn = get_connection()
-    cur = conn.cursor()
+    with get_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            with track("snowflake", "query_day"):
+                cur.execute(sql, (day.isoformat(),))  # 'YYYY-MM-DD'
+                rows = cur.fetchall()
+            columns = [c[0] for c in cur.description]
+            results = [dict(zip(columns, row)) for row in rows]
+            return results
+        finally:
+            cur.close()
+
 
-    try:
-        cur.execute(sql)
-        rows = cur.fetchall()
-        columns = [c[0] for c in cur.description]
-        results = [dict(zip(columns, row)) for row in rows]
-        return results
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+def query_today():
+    """
+    Queries the given table and returns rows where day_column equals today.
+    """
+    return query_day(date.today())
@@ -1,16 +1,30 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Annotated
+import asyncio
 import logging
 import os
 
 # Import the Auth0 JWT dependencies & helpers
-from autho import get_current_user_id
+from autho import get_current_user_id, start_jwks_refresh, stop_jwks_refresh
 from routes.voice import router as voice_router
 from routes.preferences import router as preferences_router
 from routes.recommendations import router as recommendations_router
-from db import init_db
+from db import init_db, warm_up_pool, close_pool
 from metrics import metrics_app
+from utils.instrumentation import RequestMetricsMiddleware
+from utils.request_limits import BodySizeLimitMiddleware
+from utils.tracing import TracingMiddleware
+from services.menu_cache import start_menu_refresh, stop_menu_refresh
+from services.gemini_client import start_gateway, close_gateway
+from services.gemini_context_cache import stop_context_cache
+from services.voice_service import MAX_FILE_SIZE_BYTES, start_http_client, close_http_client
+from services.preference_writer import start_preference_writer, stop_preference_writer
+from services.preference_service import start_invalidation_bus, stop_invalidation_bus
+from backboard import close_backboard_client
+from services.transcript_archive import start_transcript_archive, stop_transcript_archive
+from services.memory_index import stop_memory_index
+from services.transcription_cache import stop_transcription_cache
 
 app = FastAPI()
 
@@ -18,6 +32,8 @@ app = FastAPI()
 # Update allowed_origins in production with actual domain
 allowed_origins = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://localhost:3000").split(",")
 
+# Reject oversized uploads before Starlette spools them (allowance for multipart framing and form fields)
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_FILE_SIZE_BYTES + 64 * 1024, paths=("/voice/",))
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -25,6 +41,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-route latency, in-flight requests and body sizes
+app.add_middleware(RequestMetricsMiddleware)
+# Request-scoped spans -> Server-Timing header, trace log line, sampled trace file
+app.add_middleware(TracingMiddleware)
 
 app.include_router(voice_router)
 app.include_router(preferences_router)
@@ -39,9 +59,38 @@ async def on_startup():
     logging.basicConfig(level=logging.INFO)
     logging.getLogger("uvicorn.access").setLevel(logging.INFO)
     await init_db()
+    # Open the Snowflake sessions up front so the first menu read skips the login handshake
+    try:
+        await asyncio.to_thread(warm_up_pool)
+    except Exception:
+        logging.getLogger(__name__).exception("Snowflake pool warm-up failed; connections will open lazily")
+    await start_menu_refresh()
+    await start_gateway()
+    await start_http_client()
+    await start_preference_writer()
+    await start_invalidation_bus()
+    await start_jwks_refresh()
+    await start_transcript_archive()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Drain queued preference saves before the database goes away
+    await stop_preference_writer()
+    await stop_transcript_archive()
+    await stop_memory_index()
+    await stop_transcription_cache()
+    await stop_menu_refresh()
+    await stop_context_cache()
+    await close_gateway()
+    await close_http_client()
+    await stop_invalidation_bus()
+    await stop_jwks_refresh()
+    await close_backboard_client()
+    await asyncio.to_thread(close_pool)
 
 # Example dependency for requiring an authenticated user and extracting their user_id
-def require_user(
+async def require_user(
     user_id: Annotated[str, Depends(get_current_user_id)],
 ) -> str:
     return user_id
@@ -1,17 +1,33 @@
 try:
-    from prometheus_client import Counter, make_asgi_app
+    from prometheus_client import Counter, Gauge, Histogram, make_asgi_app
 
     # Counters for preference extraction and saving
     PREFERENCES_EXTRACTED = Counter(
         "preferences_extracted_total", "Number of preferences extracted from voice"
     )
     PREFERENCE_SAVED = Counter(
-        "preference_saved_total", "Number of preferences successfully saved"
+        "preference_saved_total", "Number of preferences successfully saved", ["outcome"]
     )
     PREFERENCE_SAVE_FAILURES = Counter(
         "preference_save_failures_total", "Number of preference save failures"
     )
 
+    # Per-user preference read cache
+    PREFERENCE_CACHE_HITS = Counter(
+        "preference_cache_hits_total", "Preference reads served from memory"
+    )
+    PREFERENCE_CACHE_MISSES = Counter(
+        "preference_cache_misses_total", "Preference reads that queried the database"
+    )
+
+    # Write-behind preference queue
+    PREFERENCE_QUEUE_DEPTH = Gauge(
+        "preference_queue_depth", "Preferences waiting to be written"
+    )
+    PREFERENCE_QUEUE_LAG_SECONDS = Histogram(
+        "preference_queue_lag_seconds", "Time from enqueue to commit for the oldest preference in a batch"
+    )
+
     # Counters for recommendation service
     RECOMMENDATION_REQUESTS = Counter(
         "recommendation_requests_total", "Recommendation requests received"
@@ -20,6 +36,113 @@ try:
         "recommendation_errors_total", "Recommendation errors"
     )
 
+    RECOMMENDATION_CACHE_HITS = Counter(
+        "recommendation_cache_hits_total", "Recommendation results served from cache"
+    )
+    RECOMMENDATION_CACHE_MISSES = Counter(
+        "recommendation_cache_misses_total", "Recommendation results computed (cache miss)"
+    )
+
+    # Snowflake connection pool
+    SNOWFLAKE_POOL_WAIT_SECONDS = Histogram(
+        "snowflake_pool_wait_seconds", "Time spent waiting to check out a Snowflake connection"
+    )
+    SNOWFLAKE_POOL_IN_USE = Gauge(
+        "snowflake_pool_in_use", "Snowflake connections currently checked out"
+    )
+    SNOWFLAKE_POOL_SIZE = Gauge(
+        "snowflake_pool_size", "Open Snowflake connections (idle + in use)"
+    )
+
+    # Shared ElevenLabs HTTP client
+    ELEVENLABS_POOL_CONNECTIONS = Gauge(
+        "elevenlabs_pool_connections", "Open connections in the shared ElevenLabs client"
+    )
+    ELEVENLABS_POOL_IDLE = Gauge(
+        "elevenlabs_pool_idle_connections", "Idle keep-alive connections in the shared ElevenLabs client"
+    )
+
+    # Content-addressed transcription cache
+    TRANSCRIPTION_CACHE_HITS = Counter(
+        "transcription_cache_hits_total", "Transcriptions served from cache"
+    )
+    TRANSCRIPTION_CACHE_MISSES = Counter(
+        "transcription_cache_misses_total", "Transcriptions that required an ElevenLabs request"
+    )
+    TRANSCRIPTION_CACHE_BYTES_SAVED = Counter(
+        "transcription_cache_bytes_saved_total", "Audio bytes not uploaded thanks to cache hits"
+    )
+    TRANSCRIPTION_CACHE_HIT_RATIO = Gauge(
+        "transcription_cache_hit_ratio", "Transcription cache hit ratio since process start"
+    )
+
+    # Gemini voice insights cache
+    INSIGHTS_CACHE_HITS = Counter(
+        "insights_cache_hits_total", "Voice insights served from cache"
+    )
+    INSIGHTS_CACHE_MISSES = Counter(
+        "insights_cache_misses_total", "Voice insights that required a Gemini call"
+    )
+
+    # Transcript archival to Backboard
+    TRANSCRIPT_ARCHIVE_BACKLOG = Gauge(
+        "transcript_archive_backlog", "Transcripts queued or journaled but not yet in Backboard"
+    )
+    TRANSCRIPT_ARCHIVE_STORED = Counter(
+        "transcript_archive_stored_total", "Transcripts written to Backboard"
+    )
+    TRANSCRIPT_ARCHIVE_JOURNALED = Counter(
+        "transcript_archive_journaled_total", "Transcripts spilled to the local journal"
+    )
+    TRANSCRIPT_ARCHIVE_DROPPED = Counter(
+        "transcript_archive_dropped_total", "Transcripts lost because the journal was full or unwritable"
+    )
+
+    # Gemini prompt assembly
+    PROMPT_ESTIMATED_TOKENS = Histogram(
+        "prompt_estimated_tokens", "Estimated token count of assembled recommendation prompts",
+        buckets=(250, 500, 1000, 2000, 4000, 6000, 8000, 16000, 32000),
+    )
+    PROMPT_ITEMS_TRUNCATED = Counter(
+        "prompt_items_truncated_total", "Menu items / history entries dropped to fit the prompt token budget", ["section"]
+    )
+
+    # Gemini server-side context cache (event: created, extended, create_failed, hit, inline, rejected)
+    GEMINI_CONTEXT_CACHE_EVENTS = Counter(
+        "gemini_context_cache_events_total", "Gemini cached-content lifecycle events and per-call usage", ["event"]
+    )
+
+    # External dependency calls (see utils/instrumentation.track)
+    DEPENDENCY_LATENCY_SECONDS = Histogram(
+        "dependency_latency_seconds", "Latency of calls to external dependencies",
+        ["dependency", "operation", "outcome"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    DEPENDENCY_IN_FLIGHT = Gauge(
+        "dependency_in_flight", "Calls to an external dependency currently in progress", ["dependency"]
+    )
+
+    # HTTP routes (see utils/instrumentation.RequestMetricsMiddleware)
+    HTTP_REQUEST_LATENCY_SECONDS = Histogram(
+        "http_request_latency_seconds", "Request latency by route template", ["method", "route", "status"],
+        buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    HTTP_REQUESTS_IN_FLIGHT = Gauge(
+        "http_requests_in_flight", "Requests currently being served"
+    )
+    HTTP_REQUEST_SIZE_BYTES = Histogram(
+        "http_request_size_bytes", "Request body size by route template", ["route"],
+        buckets=(0, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+    )
+    HTTP_RESPONSE_SIZE_BYTES = Histogram(
+        "http_response_size_bytes", "Response body size by route template", ["route"],
+        buckets=(0, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+    )
+
+    # Day-scoped menu cache
+    MENU_CACHE_HITS = Counter("menu_cache_hits_total", "Menu reads served from memory")
+    MENU_CACHE_MISSES = Counter("menu_cache_misses_total", "Menu reads that required a fetch")
+
 
     def metrics_app():
         """Return an ASGI app that serves Prometheus metrics at /metrics when mounted."""
@@ -30,11 +153,66 @@ except Exception:
         def inc(self, amount: int = 1):
             return None
 
+        def labels(self, *args, **kwargs):
+            return self
+
+    class _NoopGauge:
+        def inc(self, amount: float = 1):
+            return None
+
+        def dec(self, amount: float = 1):
+            return None
+
+        def set(self, value: float):
+            return None
+
+        def labels(self, *args, **kwargs):
+            return self
+
+    class _NoopHistogram:
+        def observe(self, amount: float):
+            return None
+
+        def labels(self, *args, **kwargs):
+            return self
+
     PREFERENCES_EXTRACTED = _NoopCounter()
     PREFERENCE_SAVED = _NoopCounter()
     PREFERENCE_SAVE_FAILURES = _NoopCounter()
+    PREFERENCE_CACHE_HITS = _NoopCounter()
+    PREFERENCE_CACHE_MISSES = _NoopCounter()
+    PREFERENCE_QUEUE_DEPTH = _NoopGauge()
+    PREFERENCE_QUEUE_LAG_SECONDS = _NoopHistogram()
     RECOMMENDATION_REQUESTS = _NoopCounter()
     RECOMMENDATION_ERRORS = _NoopCounter()
+    RECOMMENDATION_CACHE_HITS = _NoopCounter()
+    RECOMMENDATION_CACHE_MISSES = _NoopCounter()
+    SNOWFLAKE_POOL_WAIT_SECONDS = _NoopHistogram()
+    SNOWFLAKE_POOL_IN_USE = _NoopGauge()
+    SNOWFLAKE_POOL_SIZE = _NoopGauge()
+    ELEVENLABS_POOL_CONNECTIONS = _NoopGauge()
+    ELEVENLABS_POOL_IDLE = _NoopGauge()
+    TRANSCRIPTION_CACHE_HITS = _NoopCounter()
+    TRANSCRIPTION_CACHE_MISSES = _NoopCounter()
+    TRANSCRIPTION_CACHE_BYTES_SAVED = _NoopCounter()
+    TRANSCRIPTION_CACHE_HIT_RATIO = _NoopGauge()
+    INSIGHTS_CACHE_HITS = _NoopCounter()
+    INSIGHTS_CACHE_MISSES = _NoopCounter()
+    TRANSCRIPT_ARCHIVE_BACKLOG = _NoopGauge()
+    TRANSCRIPT_ARCHIVE_STORED = _NoopCounter()
+    TRANSCRIPT_ARCHIVE_JOURNALED = _NoopCounter()
+    TRANSCRIPT_ARCHIVE_DROPPED = _NoopCounter()
+    PROMPT_ESTIMATED_TOKENS = _NoopHistogram()
+    PROMPT_ITEMS_TRUNCATED = _NoopCounter()
+    GEMINI_CONTEXT_CACHE_EVENTS = _NoopCounter()
+    DEPENDENCY_LATENCY_SECONDS = _NoopHistogram()
+    DEPENDENCY_IN_FLIGHT = _NoopGauge()
+    HTTP_REQUEST_LATENCY_SECONDS = _NoopHistogram()
+    HTTP_REQUESTS_IN_FLIGHT = _NoopGauge()
+    HTTP_REQUEST_SIZE_BYTES = _NoopHistogram()
+    HTTP_RESPONSE_SIZE_BYTES = _NoopHistogram()
+    MENU_CACHE_HITS = _NoopCounter()
+    MENU_CACHE_MISSES = _NoopCounter()
 
     async def _simple_metrics_app(scope, receive, send):
         if scope.get("type") != "http":
@@ -1,10 +1,23 @@
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import JSON
+from sqlalchemy import JSON, Index, func, text
 
 
 class Preference(SQLModel, table=True):
+    # One row per (user, type, case-insensitive value); repeats are upserts
+    __table_args__ = (
+        Index(
+            "uq_preference_user_type_value",
+            "user_id",
+            "preference_type",
+            func.lower(text("value")),
+            unique=True,
+        ),
+        # Keyset pagination / streaming export: newest first (by id) within a user
+        Index("ix_preference_user_pk", "user_id", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: str = Field(index=True)
     category: Optional[str] = Field(default="food")
@@ -12,5 +25,6 @@ class Preference(SQLModel, table=True):
     value: str
     # use attribute name `meta` to avoid colliding with SQLAlchemy `metadata` attr
     meta: Optional[dict] = Field(sa_column=Column(JSON, name="metadata"), default=None)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Timezone-aware UTC: current SQLModel rejects naive datetimes on write
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -1,13 +1,18 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from autho import get_current_user_id
 from db import get_session
 from schemas.preference import PreferenceCreate, PreferenceRead
 from services.preference_service import (
+    PreferenceConflictError,
     create_preference,
     get_user_preferences,
+    get_user_preferences_page,
+    stream_user_preferences,
     get_preference,
     delete_preference,
     update_preference,
@@ -29,19 +34,43 @@ async def add_preference(
 @router.get("/", response_model=List[PreferenceRead])
 @router.get("", response_model=List[PreferenceRead], include_in_schema=False)
 async def list_preferences(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; omit for all preferences"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     user_id: str = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session),
 ):
-    prefs = await get_user_preferences(session=session, user_id=user_id)
+    if limit is None and cursor is None:
+        prefs = await get_user_preferences(session=session, user_id=user_id)
+    else:
+        try:
+            prefs, next_cursor = await get_user_preferences_page(
+                session=session, user_id=user_id, limit=limit or 100, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
     return [PreferenceRead(**p.model_dump()) for p in prefs]
 
 
 @router.get("/export")
 async def export_preferences_for_llm(
+    format: Literal["json", "ndjson"] = "json",
     user_id: str = Depends(get_current_user_id),
     session: AsyncSession = Depends(get_session),
 ):
-    """Return preferences formatted for LLM ingestion (JSON)."""
+    """
+    Return preferences formatted for LLM ingestion. `format=ndjson` streams
+    one JSON object per line as rows come off the database cursor.
+    """
+    if format == "ndjson":
+        async def lines():
+            async for p in stream_user_preferences(user_id):
+                yield json.dumps(_export_row(p), default=str) + "\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
     prefs = await get_user_preferences(session=session, user_id=user_id)
     # Transform preferences into a concise structure for LLMs
     export = {
@@ -49,17 +78,19 @@ async def export_preferences_for_llm(
         "preferences": [],
     }
     for p in prefs:
-        export["preferences"].append(
-            {
-                "type": p.preference_type,
-                "value": p.value,
-                "category": p.category,
-                "metadata": p.meta or {},
-            }
-        )
+        export["preferences"].append(_export_row(p))
     return export
 
 
+def _export_row(p) -> dict:
+    return {
+        "type": p.preference_type,
+        "value": p.value,
+        "category": p.category,
+        "metadata": p.meta or {},
+    }
+
+
 @router.put("/{pref_id}", response_model=PreferenceRead)
 async def edit_preference(
     pref_id: int,
@@ -70,7 +101,10 @@ async def edit_preference(
     pref = await get_preference(session=session, pref_id=pref_id, user_id=user_id)
     if not pref:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Preference not found")
-    updated = await update_preference(session=session, pref=pref, data=data.model_dump())
+    try:
+        updated = await update_preference(session=session, pref=pref, data=data.model_dump())
+    except PreferenceConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
     return PreferenceRead(**updated.model_dump())
 
 
@@ -26,7 +26,7 @@ async def get_recommendations(
         candidates = req.candidates or []
         if not candidates:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Candidates list required")
-        resp = await recommend(prefs, candidates, top_k=req.top_k)
+        resp = await recommend(prefs, candidates, top_k=req.top_k or 3, mode=req.mode, keywords=req.keywords, user_id=user_id)
         return resp
     except Exception as e:
         RECOMMENDATION_ERRORS.inc()
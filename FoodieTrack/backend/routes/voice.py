@@ -13,15 +13,22 @@ from services.voice_service import (
     TranscriptionError,
     AnalysisError,
     VoiceServiceError,
+    MAX_FILE_SIZE_BYTES,
     process_voice,
     validate_audio_input,
+    validate_audio_type,
 )
+from services.audio_stream import inspect_upload
 from db import get_session
 from sqlalchemy.ext.asyncio import AsyncSession
-from services.preference_service import create_preference
-import re
+from services.preference_service import bulk_upsert_preferences
+from services.preference_writer import preference_writer
+from services.transcript_archive import transcript_archive
+from services.preference_extractor import extract_preferences
+from services.recommendation_service import record_voice_keywords
 import logging
-from metrics import PREFERENCES_EXTRACTED, PREFERENCE_SAVED, PREFERENCE_SAVE_FAILURES
+from metrics import PREFERENCES_EXTRACTED, PREFERENCE_SAVE_FAILURES
+from utils.tracing import span
 
 router = APIRouter(prefix="/voice", tags=["voice"])
 
@@ -44,87 +51,54 @@ async def analyze_voice(
     """
     content_type = audio.content_type or ""
     try:
-        body = await audio.read()
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Failed to read audio file: {e}",
-        ) from e
-
-    file_size = len(body)
-
-    try:
-        validate_audio_input(content_type, file_size)
+        # Cheap checks first: declared type and (when known) declared size
+        validate_audio_type(content_type)
+        if audio.size is not None:
+            validate_audio_input(content_type, audio.size)
+        # Scan in chunks: magic bytes + size limit, without buffering the file
+        with span("upload_scan"):
+            file_size, digest = await inspect_upload(audio, MAX_FILE_SIZE_BYTES)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             detail=str(e),
         ) from e
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to read audio file: {e}",
+        ) from e
 
     try:
         result = await process_voice(
-            audio_bytes=body,
+            audio=audio,
             content_type=content_type,
             use_gemini=use_gemini,
+            size=file_size,
+            digest=digest,
         )
-        # Attempt to extract preferences from transcript/keywords and save them
+        # Archive the transcript to Backboard memory in the background (journaled if upstream is down)
+        if result.get("transcript"):
+            transcript_archive.submit(
+                user_id,
+                result["transcript"],
+                {"source": "voice", "intent": result.get("intent"), "sentiment": result.get("sentiment")},
+            )
+        if result.get("keywords"):
+            record_voice_keywords(user_id, result["keywords"])
+        # Extract preferences from transcript/keywords; they are saved after the response
+        # by the write-behind queue, or inline if the queue is full or not running
         try:
-            def extract_preferences(transcript: str, intent: str, keywords: list[str]) -> list[dict]:
-                prefs: list[dict] = []
-                t = (transcript or "").lower()
-
-                # Map explicit dietary tags
-                dietary_tags = ["vegan", "vegetarian", "kosher", "halal", "gluten-free", "gluten free", "lactose intolerant"]
-                for tag in dietary_tags:
-                    if tag in t:
-                        val = tag.replace(" ", "-")
-                        prefs.append({"preference_type": "restriction", "value": val, "category": "food", "metadata": {"source": "voice"}})
-
-                # Use keywords as candidate food items; look for negative context in transcript
-                neg_triggers = ["no ", "don't ", "dont ", "do not ", "avoid ", "allerg", "can't ", "cannot "]
-                for kw in keywords:
-                    kw_l = kw.lower()
-                    # exact negative patterns
-                    negative = any(trig + kw_l in t for trig in neg_triggers)
-                    # or presence of 'allerg' anywhere plus keyword
-                    if ("allerg" in t or "allergy" in t or "allergic" in t) and kw_l in t:
-                        prefs.append({"preference_type": "allergy", "value": kw, "category": "food", "meta": {"source": "voice"}})
-                        continue
-                    if negative:
-                        prefs.append({"preference_type": "dislike", "value": kw, "category": "food", "meta": {"source": "voice"}})
-
-                # Try simple pattern: "i don't like X" or "i hate X"
-                patterns = [r"i (?:don't|do not|dont) like ([a-zA-Z \-']+)", r"i hate ([a-zA-Z \-']+)", r"i'm allergic to ([a-zA-Z \-']+)", r"i am allergic to ([a-zA-Z \-']+)"]
-                for pat in patterns:
-                    for m in re.finditer(pat, t):
-                        item = m.group(1).strip()
-                        if item:
-                            ptype = "allergy" if "allerg" in pat or "allergic" in pat else "dislike"
-                            prefs.append({"preference_type": ptype, "value": item, "category": "food", "meta": {"source": "voice"}})
-
-                # Deduplicate by (type,value)
-                seen = set()
-                deduped = []
-                for p in prefs:
-                    key = (p["preference_type"], p["value"].lower())
-                    if key in seen:
-                        continue
-                    seen.add(key)
-                    deduped.append(p)
-                return deduped
-
             prefs = extract_preferences(result.get("transcript", ""), result.get("intent", ""), result.get("keywords", []))
             if prefs:
                 PREFERENCES_EXTRACTED.inc(len(prefs))
-            logger = logging.getLogger(__name__)
-            for p in prefs:
+                items = [PreferenceCreate(**p) for p in prefs]
                 try:
-                    pref_in = PreferenceCreate(**p)
-                    await create_preference(session=session, user_id=user_id, data=pref_in)
-                    PREFERENCE_SAVED.inc()
+                    if not preference_writer.submit(user_id, items):
+                        await bulk_upsert_preferences(session=session, user_id=user_id, items=items)
                 except Exception as exc:
-                    PREFERENCE_SAVE_FAILURES.inc()
-                    logger.exception("Failed to save preference: %s", exc)
+                    PREFERENCE_SAVE_FAILURES.inc(len(prefs))
+                    logging.getLogger(__name__).exception("Failed to save preferences: %s", exc)
         except Exception:
             # Don't fail the whole request if preference saving fails; log could be added
             pass
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional
 
@@ -12,6 +13,6 @@ class PreferenceCreate(BaseModel):
 class PreferenceRead(PreferenceCreate):
     id: int
     user_id: str
-    created_at: str
-    updated_at: str
+    created_at: datetime
+    updated_at: datetime
     meta: Optional[dict] = None
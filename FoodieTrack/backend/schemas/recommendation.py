@@ -1,10 +1,15 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 
 class RecommendationRequest(BaseModel):
     candidates: Optional[List[str]] = None
-    top_k: Optional[int] = 3
+    # null means the default
+    top_k: Optional[int] = Field(3, ge=1)
+    # "fast" ranks locally without calling Gemini
+    mode: Literal["gemini", "fast"] = "gemini"
+    # Extra ranking keywords; the user's recent voice-insight keywords are added server-side
+    keywords: Optional[List[str]] = None
 
 
 class RecommendationItem(BaseModel):
@@ -0,0 +1,136 @@
+"""
+Bounded-memory audio ingest and streaming multipart upload.
+
+Uploads are scanned chunk by chunk (size limit + magic-byte sniffing) and
+then streamed to the upstream multipart request straight from the spooled
+upload, so peak memory per request scales with the chunk size rather than
+the file size.
+"""
+
+import hashlib
+import os
+import uuid
+from typing import AsyncIterator, Protocol
+
+AUDIO_CHUNK_SIZE = int(os.getenv("AUDIO_CHUNK_SIZE", str(64 * 1024)))
+
+
+class AsyncReadable(Protocol):
+    async def read(self, size: int = -1) -> bytes: ...
+
+    async def seek(self, offset: int) -> None: ...
+
+
+def sniff_audio(header: bytes) -> bool:
+    """True if the leading bytes look like a supported audio container."""
+    if header.startswith(b"\x1a\x45\xdf\xa3"):  # WebM / Matroska (EBML)
+        return True
+    if header.startswith(b"OggS"):
+        return True
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return True
+    if header.startswith(b"ID3"):  # MP3 with ID3 tag
+        return True
+    if len(header) >= 2 and header[0] == 0xFF and (header[1] & 0xE0) == 0xE0:  # MPEG audio frame sync
+        return True
+    if header[4:8] == b"ftyp":  # MP4 / M4A
+        return True
+    return False
+
+
+async def inspect_upload(
+    upload: AsyncReadable, max_bytes: int, chunk_size: int = AUDIO_CHUNK_SIZE
+) -> tuple[int, str]:
+    """
+    Read the upload once in `chunk_size` pieces, rejecting it as soon as it
+    exceeds `max_bytes` or if its header isn't a known audio format. Rewinds
+    the upload and returns (size, sha256 hex digest of the content).
+    Raises ValueError on invalid input.
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    first = True
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        if first:
+            if not sniff_audio(chunk[:16]):
+                raise ValueError("File content is not a recognised audio format")
+            first = False
+        size += len(chunk)
+        hasher.update(chunk)
+        if size > max_bytes:
+            raise ValueError(f"Audio file too large (max {max_bytes // (1024 * 1024)} MB)")
+    if size == 0:
+        raise ValueError("Audio file is empty")
+    await upload.seek(0)
+    return size, hasher.hexdigest()
+
+
+class StreamingMultipart:
+    """
+    multipart/form-data body whose file part is streamed from an async
+    readable. Content-Length is computed up front so no chunked encoding is
+    needed upstream.
+    """
+
+    def __init__(
+        self,
+        fields: dict[str, str],
+        file_field: str,
+        filename: str,
+        content_type: str,
+        source: AsyncReadable,
+        size: int,
+        chunk_size: int = AUDIO_CHUNK_SIZE,
+    ):
+        self.boundary = uuid.uuid4().hex
+        self._source = source
+        self._chunk_size = chunk_size
+        b = self.boundary
+        head = b"".join(
+            f'--{b}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+            for k, v in fields.items()
+        )
+        head += (
+            f'--{b}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        self._head = head
+        self._tail = f"\r\n--{b}--\r\n".encode()
+        self.content_length = len(head) + size + len(self._tail)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(self.content_length),
+        }
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        await self._source.seek(0)
+        yield self._head
+        while True:
+            chunk = await self._source.read(self._chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield self._tail
+
+
+class BytesSource:
+    """AsyncReadable over an in-memory bytes object (for callers that already hold the audio)."""
+
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size < 0 else self._pos + size
+        chunk = self._data[self._pos:end]
+        self._pos += len(chunk)
+        return chunk
+
+    async def seek(self, offset: int) -> None:
+        self._pos = offset
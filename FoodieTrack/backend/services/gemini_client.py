@@ -1,8 +1,113 @@
+"""
+Shared Gemini gateway.
+
+One long-lived `genai.Client` is created at startup and every service calls
+Gemini through its native async API, so connection setup is paid once and
+in-flight LLM calls don't occupy thread-pool slots. Calls are capped by a
+concurrency semaphore and bounded by a per-call deadline.
+"""
+
+import asyncio
+import logging
 import os
-import google.generativeai as genai
 
-genai.configure(
-    api_key=os.getenv("GEMINI_API_KEY")
-)
+from google import genai
+from google.genai import types
+
+from utils.instrumentation import track
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))  # per-call deadline, seconds
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+
+
+class GeminiError(RuntimeError):
+    """Gemini call failed, timed out or returned nothing."""
+
+    pass
+
+
+class GeminiNotConfiguredError(GeminiError):
+    """GEMINI_API_KEY is missing."""
+
+    pass
+
+
+class GeminiGateway:
+    """Pooled async Gemini client with a concurrency cap and per-call deadlines."""
+
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+        timeout: float = GEMINI_TIMEOUT,
+        client: genai.Client | None = None,
+    ):
+        self.timeout = timeout
+        self._client = client or genai.Client(api_key=api_key)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def client(self) -> genai.Client:
+        return self._client
+
+    async def generate(
+        self,
+        contents,
+        config: types.GenerateContentConfig | None = None,
+        model: str = GEMINI_MODEL,
+        timeout: float | None = None,
+    ) -> str:
+        """Run `generate_content` and return the response text."""
+        deadline = self.timeout if timeout is None else timeout
+
+        async def _call():
+            async with self._semaphore:
+                async with track("gemini", "generate_content"):
+                    return await self._client.aio.models.generate_content(
+                        model=model, contents=contents, config=config
+                    )
+
+        try:
+            response = await asyncio.wait_for(_call(), timeout=deadline)
+        except asyncio.TimeoutError as e:
+            raise GeminiError(f"Gemini call exceeded {deadline:g}s deadline") from e
+        if not response or not response.text:
+            raise GeminiError("Gemini returned empty response")
+        return response.text
+
+    async def aclose(self) -> None:
+        try:
+            await self._client.aio.aclose()
+        except Exception:
+            logger.debug("Error closing Gemini client", exc_info=True)
+
+
+_gateway: GeminiGateway | None = None
+
+
+def get_gateway() -> GeminiGateway:
+    """The process-wide gateway, created on first use if startup didn't."""
+    global _gateway
+    if _gateway is None:
+        key = os.getenv("GEMINI_API_KEY", "").strip()
+        if not key:
+            raise GeminiNotConfiguredError("GEMINI_API_KEY is not configured")
+        _gateway = GeminiGateway(api_key=key)
+    return _gateway
+
+
+async def start_gateway() -> None:
+    try:
+        get_gateway()
+    except GeminiNotConfiguredError:
+        logger.info("GEMINI_API_KEY not set; Gemini gateway not started")
+
 
-model = genai.GenerativeModel("gemini-1.5-flash")
\ No newline at end of file
+async def close_gateway() -> None:
+    global _gateway
+    if _gateway is not None:
+        await _gateway.aclose()
+        _gateway = None
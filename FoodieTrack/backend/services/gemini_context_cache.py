@@ -0,0 +1,200 @@
+"""
+Server-side Gemini context caching for static prompt prefixes.
+
+A prompt is split into a static prefix (instructions, the day's menu) and a
+per-request suffix (transcript, preferences, history). The prefix is uploaded
+once as cached content and later requests reference it by handle, so only
+the suffix is sent and processed per call.
+
+Handles are kept per slot (e.g. "recommendation", "voice-insights") together
+with a fingerprint of the prefix: a changed prefix (new day, menu refresh,
+prompt edit) creates a new handle and deletes the old one. Handles are
+extended when they are close to expiry and still in use, and deleted at
+shutdown. Prefixes below GEMINI_CACHE_MIN_TOKENS (the API minimum), or any
+cache failure, fall back to sending the prefix inline.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+
+from google.genai import errors, types
+
+from metrics import GEMINI_CONTEXT_CACHE_EVENTS
+from services.gemini_client import GEMINI_MODEL, GeminiGateway, get_gateway
+from utils.instrumentation import track
+from utils.prompt_builder import estimate_tokens
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+GEMINI_CACHE_ENABLED = os.getenv("GEMINI_CACHE_ENABLED", "1") == "1"
+GEMINI_CACHE_TTL = int(os.getenv("GEMINI_CACHE_TTL", "3600"))  # seconds per create/extend
+GEMINI_CACHE_REFRESH_MARGIN = int(os.getenv("GEMINI_CACHE_REFRESH_MARGIN", "300"))  # extend when this close to expiry
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "1024"))
+GEMINI_CACHE_RETRY_AFTER = float(os.getenv("GEMINI_CACHE_RETRY_AFTER", "300"))  # after a failed create
+
+
+def _cached_content_rejected(error: errors.ClientError) -> bool:
+    """A 404 for the handle, or a 400/403 that names the cached content (expired, wrong model)."""
+    if error.code == 404:
+        return True
+    message = f"{error.status or ''} {error.message or ''}".lower()
+    return error.code in (400, 403) and ("cached content" in message or "cachedcontent" in message)
+
+
+class ContextCache:
+    """Per-slot cached-content handles on top of the shared Gemini gateway."""
+
+    def __init__(
+        self,
+        gateway_factory=get_gateway,
+        model: str = GEMINI_MODEL,
+        enabled: bool = GEMINI_CACHE_ENABLED,
+        ttl: int = GEMINI_CACHE_TTL,
+        refresh_margin: int = GEMINI_CACHE_REFRESH_MARGIN,
+        min_tokens: int = GEMINI_CACHE_MIN_TOKENS,
+        retry_after: float = GEMINI_CACHE_RETRY_AFTER,
+    ):
+        self._gateway_factory = gateway_factory
+        self.model = model
+        self.enabled = enabled
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_tokens = min_tokens
+        self.retry_after = retry_after
+        # slot -> (fingerprint, handle name, expires_at monotonic)
+        self._handles: dict[str, tuple[str, str, float]] = {}
+        # fingerprint -> monotonic time before which creation is not retried
+        self._failed: dict[str, float] = {}
+        self._flights = SingleFlight()
+
+    @staticmethod
+    def fingerprint(static_text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\x00{static_text}".encode()).hexdigest()
+
+    def _gateway(self) -> GeminiGateway:
+        return self._gateway_factory()
+
+    async def _delete(self, name: str) -> None:
+        try:
+            async with track("gemini", "cache_delete"):
+                await self._gateway().client.aio.caches.delete(name=name)
+        except Exception:
+            logger.debug("Deleting cached content %s failed", name, exc_info=True)
+
+    async def _create(self, slot: str, fingerprint: str, static_text: str) -> str | None:
+        try:
+            async with track("gemini", "cache_create"):
+                cached = await self._gateway().client.aio.caches.create(
+                    model=self.model,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=static_text,
+                        ttl=f"{self.ttl}s",
+                        display_name=f"foodietrack-{slot}-{fingerprint[:12]}",
+                    ),
+                )
+        except Exception:
+            logger.warning("Creating Gemini cached content for %s failed; sending prompt inline", slot, exc_info=True)
+            self._failed[fingerprint] = time.monotonic() + self.retry_after
+            GEMINI_CONTEXT_CACHE_EVENTS.labels(event="create_failed").inc()
+            return None
+        previous = self._handles.get(slot)
+        self._handles[slot] = (fingerprint, cached.name, time.monotonic() + self.ttl)
+        GEMINI_CONTEXT_CACHE_EVENTS.labels(event="created").inc()
+        if previous is not None:
+            await self._delete(previous[1])
+        logger.info("Cached %s prompt prefix as %s (~%d tokens)", slot, cached.name, estimate_tokens(static_text))
+        return cached.name
+
+    async def _extend(self, slot: str, fingerprint: str, name: str) -> None:
+        try:
+            async with track("gemini", "cache_update"):
+                await self._gateway().client.aio.caches.update(
+                    name=name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s")
+                )
+        except Exception:
+            logger.info("Extending cached content %s failed; it will be recreated", name, exc_info=True)
+            self._handles.pop(slot, None)
+            return
+        if self._handles.get(slot, (None, None))[1] == name:
+            self._handles[slot] = (fingerprint, name, time.monotonic() + self.ttl)
+            GEMINI_CONTEXT_CACHE_EVENTS.labels(event="extended").inc()
+
+    async def handle(self, slot: str, static_text: str) -> str | None:
+        """Cached-content name for this slot's prefix, creating or extending it as needed."""
+        if not self.enabled or estimate_tokens(static_text) < self.min_tokens:
+            return None
+        fingerprint = self.fingerprint(static_text, self.model)
+        if self._failed.get(fingerprint, 0) > time.monotonic():
+            return None
+
+        current = self._handles.get(slot)
+        now = time.monotonic()
+        if current is not None and current[0] == fingerprint:
+            _, name, expires_at = current
+            if expires_at - now > self.refresh_margin:
+                return name
+            if expires_at > now + 1:
+                await self._flights.do(("extend", slot, name), lambda: self._extend(slot, fingerprint, name))
+                current = self._handles.get(slot)
+                if current is not None and current[1] == name:
+                    return name
+        return await self._flights.do(("create", slot, fingerprint), lambda: self._create(slot, fingerprint, static_text))
+
+    async def invalidate(self, slot: str, name: str | None = None) -> None:
+        """Drop a slot's handle (only if it is still `name`, when given) and delete it server-side."""
+        current = self._handles.get(slot)
+        if current is not None and (name is None or current[1] == name):
+            del self._handles[slot]
+            await self._delete(current[1])
+
+    async def generate(
+        self,
+        slot: str,
+        static_text: str,
+        contents,
+        config: types.GenerateContentConfig | None = None,
+        **kwargs,
+    ) -> str:
+        """
+        `gateway.generate` with `static_text` served from cached content when
+        possible. The request is retried inline once if the handle itself was
+        rejected (expired or deleted server-side); other client errors, such
+        as rate limits or a bad request, propagate.
+        """
+        gateway = self._gateway()
+        name = await self.handle(slot, static_text)
+        if name is not None:
+            cached_config = (config or types.GenerateContentConfig()).model_copy(update={"cached_content": name})
+            try:
+                text = await gateway.generate(contents, config=cached_config, model=self.model, **kwargs)
+                GEMINI_CONTEXT_CACHE_EVENTS.labels(event="hit").inc()
+                return text
+            except errors.ClientError as e:
+                if not _cached_content_rejected(e):
+                    raise
+                logger.info("Gemini rejected cached content %s; retrying inline", name, exc_info=True)
+                await self.invalidate(slot, name)
+                GEMINI_CONTEXT_CACHE_EVENTS.labels(event="rejected").inc()
+        else:
+            GEMINI_CONTEXT_CACHE_EVENTS.labels(event="inline").inc()
+        inline_config = (config or types.GenerateContentConfig()).model_copy(update={"system_instruction": static_text})
+        return await gateway.generate(contents, config=inline_config, model=self.model, **kwargs)
+
+    async def close(self) -> None:
+        """Delete all handles (cached content is billed per hour while it exists)."""
+        handles, self._handles = self._handles, {}
+        await asyncio.gather(*(self._delete(name) for _, name, _ in handles.values()))
+
+
+context_cache = ContextCache()
+
+
+async def stop_context_cache() -> None:
+    try:
+        await context_cache.close()
+    except Exception:
+        logger.debug("Error releasing Gemini cached content", exc_info=True)
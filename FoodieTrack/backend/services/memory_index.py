@@ -0,0 +1,343 @@
+"""
+Local per-user vector memory over stored transcripts.
+
+Texts are embedded with hashed word and character n-gram features (no model,
+no network) into L2-normalised float32 vectors. Each user's vectors sit in
+one contiguous NumPy array, so retrieval is a single matrix-vector product
+plus a top-k partition. With MEMORY_INDEX_DIR set, vectors are appended to a
+raw float32 file per user and searched through a memory map, and document
+text/metadata goes to a JSONL sidecar. All file I/O (loading a user, appends,
+compaction) runs in a worker thread; `add` only queues the transcript.
+
+Backboard stays the durable store: the local index only holds what was said
+since it was enabled (and Backboard has no way to list a user's full history
+to import), so `retrieve_messages` always merges local hits with a Backboard
+search.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from backboard import get_backboard_client
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+MEMORY_INDEX_DIM = int(os.getenv("MEMORY_INDEX_DIM", "512"))
+MEMORY_INDEX_MAX_PER_USER = int(os.getenv("MEMORY_INDEX_MAX_PER_USER", "2000"))  # newest documents kept
+MEMORY_INDEX_MAX_USERS = int(os.getenv("MEMORY_INDEX_MAX_USERS", "5000"))  # users held in memory
+MEMORY_INDEX_DIR = os.getenv("MEMORY_INDEX_DIR", "")  # empty keeps the index in memory only
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_CHAR_NGRAMS = (3, 4)
+
+
+def _features(text: str) -> list[str]:
+    words = _WORD_RE.findall(text.lower())
+    feats = [f"w:{w}" for w in words]
+    feats += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f" {w} "
+        for n in _CHAR_NGRAMS:
+            feats += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+    return feats
+
+
+def embed(text: str, dim: int = MEMORY_INDEX_DIM) -> np.ndarray:
+    """Signed feature-hashing embedding (crc32, stable across processes), L2-normalised."""
+    vec = np.zeros(dim, dtype=np.float32)
+    feats = _features(text)
+    if not feats:
+        return vec
+    hashes = np.fromiter((zlib.crc32(f.encode()) for f in feats), dtype=np.uint32, count=len(feats))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    np.add.at(vec, hashes % dim, signs)
+    norm = np.linalg.norm(vec)
+    if norm:
+        vec /= norm
+    return vec
+
+
+class UserMemory:
+    """One user's documents and their vectors (row i of `vectors` belongs to docs[i])."""
+
+    def __init__(self, dim: int, max_docs: int, directory: Path | None = None, name: str = ""):
+        self.dim = dim
+        self.max_docs = max_docs
+        self.docs: list[dict] = []
+        self._dir = directory
+        self._vec_path = directory / f"{name}.f32" if directory else None
+        self._doc_path = directory / f"{name}.jsonl" if directory else None
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        # Changes not yet on disk: rows to append, or a full rewrite after compaction
+        self._unsaved: list[tuple[np.ndarray, dict]] = []
+        self._rewrite = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[: self._size]
+
+    def load(self) -> bool:
+        """Read the user's files (blocking: call from a worker thread); False if there are none."""
+        try:
+            with open(self._doc_path, encoding="utf-8") as f:
+                self.docs = [json.loads(line) for line in f]
+            rows = self._vec_path.stat().st_size // (4 * self.dim)
+        except FileNotFoundError:
+            return False
+        n = min(rows, len(self.docs))  # tolerate a torn final append
+        self.docs = self.docs[:n]
+        self._size = n
+        if n:
+            self._vectors = np.memmap(self._vec_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return True
+
+    def _append(self, vectors: np.ndarray, docs: list[dict]) -> None:
+        n = len(docs)
+        if self._size + n > len(self._vectors) or isinstance(self._vectors, np.memmap):
+            grown = np.zeros((max(16, (self._size + n) * 2), self.dim), dtype=np.float32)
+            grown[: self._size] = self._vectors[: self._size]
+            self._vectors = grown
+        self._vectors[self._size : self._size + n] = vectors
+        self._size += n
+        self.docs.extend(docs)
+
+    def add(self, vector: np.ndarray, doc: dict) -> None:
+        self._append(vector[None, :], [doc])
+        if self._dir is not None and not self._rewrite:
+            self._unsaved.append((vector, doc))
+        if self._size > self.max_docs * 1.5:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Keep the newest `max_docs` documents (amortised; runs once per max_docs/2 adds)."""
+        self._vectors = self._vectors[self._size - self.max_docs : self._size].copy()
+        self.docs = self.docs[-self.max_docs :]
+        self._size = len(self._vectors)
+        self._mark_rewrite()
+
+    def _mark_rewrite(self) -> None:
+        if self._dir is not None:
+            self._rewrite = True
+            self._unsaved = []
+
+    def take_unsaved(self):
+        """Snapshot pending changes for `save` (call on the event loop, then save in a thread)."""
+        if self._rewrite:
+            change = ("rewrite", self.vectors.copy(), list(self.docs))
+        elif self._unsaved:
+            change = ("append", self._unsaved, None)
+        else:
+            return None
+        self._unsaved, self._rewrite = [], False
+        return change
+
+    def save(self, change) -> None:
+        """Write a `take_unsaved` snapshot to disk (blocking: call from a worker thread)."""
+        kind, rows, docs = change
+        if kind == "rewrite":
+            tmp_vec = self._vec_path.with_suffix(".f32.tmp")
+            tmp_doc = self._doc_path.with_suffix(".jsonl.tmp")
+            rows.tofile(tmp_vec)
+            with open(tmp_doc, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(d, separators=(",", ":")) + "\n" for d in docs)
+            os.replace(tmp_vec, self._vec_path)
+            os.replace(tmp_doc, self._doc_path)
+        else:
+            with open(self._vec_path, "ab") as f:
+                f.writelines(v.astype(np.float32).tobytes() for v, _ in rows)
+            with open(self._doc_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(d, separators=(",", ":")) + "\n" for _, d in rows)
+
+    def search(self, query: np.ndarray, top_k: int) -> list[tuple[float, dict]]:
+        if not self._size:
+            return []
+        scores = self.vectors @ query
+        k = min(top_k, self._size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.docs[i]) for i in top]
+
+
+class MemoryIndex:
+    """
+    Per-user `UserMemory` instances, LRU-bounded by user count. With a
+    directory, `add` queues the transcript for a background task that loads
+    the user (in a thread, once), indexes it and appends it to disk in a
+    thread; outside an event loop (scripts, benchmarks) it does this inline.
+    """
+
+    def __init__(
+        self,
+        dim: int = MEMORY_INDEX_DIM,
+        max_per_user: int = MEMORY_INDEX_MAX_PER_USER,
+        max_users: int = MEMORY_INDEX_MAX_USERS,
+        directory: str = MEMORY_INDEX_DIR,
+    ):
+        self.dim = dim
+        self.max_per_user = max_per_user
+        self.max_users = max_users
+        self._dir = Path(directory) if directory else None
+        if self._dir is not None:
+            self._dir.mkdir(parents=True, exist_ok=True)
+        self._users: dict[str, UserMemory] = {}
+        self._loads = SingleFlight()
+        # (user_id, vector, doc) waiting for the writer task
+        self._pending: list[tuple[str, np.ndarray, dict]] = []
+        self._writer: asyncio.Task | None = None
+        self._save_lock = asyncio.Lock()  # keeps snapshots reaching disk in the order they were taken
+
+    def _name(self, user_id: str) -> str:
+        return hashlib.sha256(user_id.encode()).hexdigest()[:32]
+
+    def _remember(self, user_id: str, mem: UserMemory) -> UserMemory:
+        self._users.pop(user_id, None)
+        self._users[user_id] = mem  # most recently used last
+        while len(self._users) > self.max_users:
+            self._users.pop(next(iter(self._users)))
+        return mem
+
+    def _load_sync(self, user_id: str, create: bool) -> UserMemory | None:
+        mem = UserMemory(self.dim, self.max_per_user, self._dir, self._name(user_id))
+        if self._dir is not None and mem.load():
+            return mem
+        return mem if create else None
+
+    def _user_sync(self, user_id: str) -> UserMemory:
+        return self._remember(user_id, self._users.get(user_id) or self._load_sync(user_id, True))
+
+    async def _user(self, user_id: str, create: bool = True) -> UserMemory | None:
+        """The user's memory, loading it from disk in a thread if it isn't resident."""
+        mem = self._users.get(user_id)
+        if mem is None:
+            if self._dir is None:
+                if not create:
+                    return None
+                mem = UserMemory(self.dim, self.max_per_user)
+            else:
+                # One load per user at a time, so concurrent callers share one instance
+                loaded = await self._loads.do(user_id, lambda: asyncio.to_thread(self._load_sync, user_id, True))
+                mem = self._users.get(user_id, loaded)
+        self._remember(user_id, mem)
+        if not create and not len(mem):
+            return None
+        return mem
+
+    def add(self, user_id: str, text: str, metadata: dict | None = None) -> None:
+        """Index one transcript for a user (O(dim) amortised; never blocks on disk inside the loop)."""
+        if not text or not text.strip():
+            return
+        vector, doc = embed(text, self.dim), {"text": text, "metadata": metadata or {}}
+        if self._dir is None:
+            self._user_sync(user_id).add(vector, doc)
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            mem = self._user_sync(user_id)
+            mem.add(vector, doc)
+            change = mem.take_unsaved()
+            if change is not None:
+                mem.save(change)
+            return
+        self._pending.append((user_id, vector, doc))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self) -> None:
+        while self._pending:
+            batch, self._pending = self._pending, []
+            touched: dict[str, UserMemory] = {}
+            for user_id, vector, doc in batch:
+                try:
+                    mem = touched.get(user_id) or await self._user(user_id)
+                except Exception:
+                    logger.exception("Could not load memory index for a user; transcript not indexed locally")
+                    continue
+                mem.add(vector, doc)
+                touched[user_id] = mem
+            for mem in touched.values():
+                await self._save(mem)
+
+    async def _save(self, mem: UserMemory) -> None:
+        async with self._save_lock:
+            change = mem.take_unsaved()
+            if change is None:
+                return
+            try:
+                await asyncio.to_thread(mem.save, change)
+            except OSError:
+                logger.exception("Could not persist memory index")
+
+    async def flush(self) -> None:
+        """Wait until queued transcripts are indexed and on disk."""
+        while self._writer is not None and not self._writer.done():
+            await self._writer
+
+    async def search(self, user_id: str, query: str, top_k: int = 10) -> list[dict]:
+        """Cosine top-k over the user's documents, shaped like Backboard search results."""
+        mem = await self._user(user_id, create=False)
+        if mem is None:
+            return []
+        return [
+            {"text": doc["text"], "metadata": {"user_id": user_id, **doc["metadata"]}, "score": score}
+            for score, doc in mem.search(embed(query, self.dim), top_k)
+        ]
+
+    async def close(self) -> None:
+        await self.flush()
+
+
+memory_index = MemoryIndex()
+
+
+async def stop_memory_index() -> None:
+    await memory_index.close()
+
+
+def _normalize(text: str | None) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+def _merge(local: list[dict], remote: list[dict], top_k: int) -> list[dict]:
+    """
+    Interleave two ranked result lists (scores aren't comparable), dropping
+    documents already taken by `archive_id` or by normalised text.
+    """
+    merged, seen_ids, seen_texts = [], set(), set()
+    for i in range(max(len(local), len(remote))):
+        for results in (local, remote):
+            if i < len(results):
+                doc = results[i]
+                archive_id = (doc.get("metadata") or {}).get("archive_id")
+                text = _normalize(doc.get("text"))
+                if archive_id in seen_ids or text in seen_texts:
+                    continue
+                if archive_id:
+                    seen_ids.add(archive_id)
+                seen_texts.add(text)
+                merged.append(doc)
+    return merged[:top_k]
+
+
+async def retrieve_messages(query: str, user_id: str, top_k: int = 10) -> list[dict]:
+    """History for a user: local cosine hits merged with a Backboard search."""
+    local = await memory_index.search(user_id, query, top_k)
+    try:
+        remote = await get_backboard_client().retrieve_messages(query, user_id, top_k)
+    except Exception:
+        logger.warning("Backboard history lookup failed; using the local index only", exc_info=True)
+        return local
+    return _merge(local, remote, top_k)
@@ -0,0 +1,128 @@
+"""
+Day-scoped in-process menu cache.
+
+The menu only changes once per day, so decoded `menu_items` rows are held in
+memory keyed by day. Entries for past days are dropped at local midnight, a
+background task prefetches the next day's menu shortly before then, and
+concurrent misses for the same day share a single upstream fetch. Rows are
+loaded from the local menu snapshot (see `services.menu_snapshot`).
+"""
+
+import asyncio
+import logging
+import os
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+from services.menu_snapshot import read_menu_day
+from metrics import MENU_CACHE_HITS, MENU_CACHE_MISSES
+from utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Seconds before local midnight at which the next day's menu is prefetched
+MENU_REFRESH_AHEAD = float(os.getenv("MENU_REFRESH_AHEAD", "300"))
+# Back-off between prefetch retries when the upstream is unavailable
+MENU_REFRESH_RETRY = float(os.getenv("MENU_REFRESH_RETRY", "60"))
+
+
+def _seconds_until_midnight(now: datetime | None = None) -> float:
+    now = now or datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
+
+class MenuCache:
+    """In-memory menu rows keyed by day with single-flight loading."""
+
+    def __init__(self, fetch: Callable[[date], list[dict]] = read_menu_day):
+        self._fetch = fetch
+        self._entries: dict[date, list[dict]] = {}
+        self._flights = SingleFlight()
+
+    def _evict_expired(self) -> None:
+        today = date.today()
+        for day in [d for d in self._entries if d < today]:
+            del self._entries[day]
+
+    async def _load(self, day: date) -> list[dict]:
+        rows = await asyncio.to_thread(self._fetch, day)
+        if rows:
+            self._entries[day] = rows
+        else:
+            # Not loaded upstream yet: ask again next time (the snapshot rate-limits re-syncs)
+            self._entries.pop(day, None)
+        return rows
+
+    async def get(self, day: date | None = None) -> list[dict]:
+        """Return the menu rows for `day` (default: today), fetching at most once."""
+        day = day or date.today()
+        self._evict_expired()
+        rows = self._entries.get(day)
+        if rows is not None:
+            MENU_CACHE_HITS.inc()
+            return rows
+
+        MENU_CACHE_MISSES.inc()
+        return await self._flights.do(day, lambda: self._load(day))
+
+    async def refresh(self, day: date | None = None) -> list[dict]:
+        """Fetch `day` from upstream and replace the cached rows."""
+        day = day or date.today()
+        return await self._flights.do(day, lambda: self._load(day))
+
+    def invalidate(self, day: date | None = None) -> None:
+        if day is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(day, None)
+
+    async def run_refresher(self) -> None:
+        """Prefetch tomorrow's menu before midnight, forever."""
+        while True:
+            wait = _seconds_until_midnight() - MENU_REFRESH_AHEAD
+            if wait > 0:
+                await asyncio.sleep(wait)
+            tomorrow = date.today() + timedelta(days=1)
+            try:
+                await self.refresh(tomorrow)
+                logger.info("Prefetched menu for %s", tomorrow.isoformat())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Menu prefetch for %s failed; retrying", tomorrow.isoformat())
+                await asyncio.sleep(MENU_REFRESH_RETRY)
+                continue
+            # Sleep past midnight so the next iteration targets the following day
+            await asyncio.sleep(_seconds_until_midnight() + 1)
+            self._evict_expired()
+
+
+menu_cache = MenuCache()
+_refresh_task: asyncio.Task | None = None
+
+
+async def get_today_menu() -> list[dict]:
+    return await menu_cache.get()
+
+
+async def start_menu_refresh() -> None:
+    """Warm today's menu and start the background prefetch task."""
+    global _refresh_task
+    try:
+        await menu_cache.get()
+    except Exception:
+        logger.exception("Initial menu load failed; will load on first request")
+    if _refresh_task is None:
+        _refresh_task = asyncio.create_task(menu_cache.run_refresher())
+
+
+async def stop_menu_refresh() -> None:
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        try:
+            await _refresh_task
+        except asyncio.CancelledError:
+            pass
+        _refresh_task = None
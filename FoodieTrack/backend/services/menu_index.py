@@ -0,0 +1,214 @@
+"""
+Inverted index over menu item tags, ingredients and allergens.
+
+Each term maps to an integer bitset of the items that mention it, so a user's
+allergy / restriction / dislike preferences resolve to one exclusion mask with
+a handful of dict lookups and bitwise ORs. Used to drop unsafe candidates
+deterministically before anything is sent to Gemini.
+"""
+
+import re
+from datetime import date
+from functools import lru_cache
+from typing import Iterable
+
+from services.menu_cache import menu_cache
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Allergy values that name a family of allergens on the menu
+ALLERGEN_SYNONYMS: dict[str, set[str]] = {
+    "dairy": {"milk", "dairy"},
+    "lactose": {"milk"},
+    "milk": {"milk"},
+    "gluten": {"gluten", "wheat"},
+    "wheat": {"wheat", "gluten"},
+    "nut": {"peanuts", "tree nuts"},
+    "nuts": {"peanuts", "tree nuts"},
+    "peanut": {"peanuts"},
+    "tree nut": {"tree nuts"},
+    "egg": {"egg", "eggs"},
+    "sulfite": {"sulphites", "sulphite"},
+    "sulphite": {"sulphites", "sulphite"},
+}
+
+# Restriction value -> (item must carry one of these tags, allergens it must not contain)
+RESTRICTION_RULES: dict[str, tuple[set[str], set[str]]] = {
+    "vegan": ({"vegan"}, set()),
+    "vegetarian": ({"vegetarian", "vegan"}, set()),
+    "halal": ({"halal"}, set()),
+    "kosher": ({"kosher"}, set()),
+    "gluten-free": ({"no-gluten"}, {"gluten", "wheat"}),
+    "no-gluten": ({"no-gluten"}, {"gluten", "wheat"}),
+    "dairy-free": ({"no-dairy", "vegan"}, {"milk"}),
+    "no-dairy": ({"no-dairy", "vegan"}, {"milk"}),
+    "lactose-intolerant": ({"no-dairy", "vegan"}, {"milk"}),
+}
+
+
+@lru_cache(maxsize=65536)
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-case, singularised word tokens."""
+    return [_stem(w) for w in _WORD_RE.findall(text.lower())]
+
+
+def _phrase(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def _normalize_restriction(value: str) -> str:
+    return re.sub(r"[\s_]+", "-", value.strip().lower())
+
+
+class MenuIndex:
+    """Bitset index over a fixed list of menu rows (see `menu_snapshot.normalize_row`)."""
+
+    def __init__(self, rows: Iterable[dict]):
+        self.rows = list(rows)
+        self.all_mask = (1 << len(self.rows)) - 1
+        self._tags: dict[str, int] = {}
+        self._allergens: dict[str, int] = {}
+        # ingredient + item name phrases and individual words
+        self._content_phrases: dict[str, int] = {}
+        self._content_words: dict[str, int] = {}
+        self._by_name: dict[str, int] = {}
+        self._row_by_name: dict[str, dict] = {}
+
+        for i, row in enumerate(self.rows):
+            bit = 1 << i
+            for tag in row.get("tags") or []:
+                key = _normalize_restriction(tag)
+                self._tags[key] = self._tags.get(key, 0) | bit
+            for allergen in row.get("allergies") or []:
+                key = _phrase(allergen)
+                self._allergens[key] = self._allergens.get(key, 0) | bit
+            name = row.get("item_name") or ""
+            self._by_name[name.strip().lower()] = self._by_name.get(name.strip().lower(), 0) | bit
+            self._row_by_name.setdefault(name.strip().lower(), row)
+            for text in [name, *(row.get("ingredients") or [])]:
+                key = _phrase(text)
+                self._content_phrases[key] = self._content_phrases.get(key, 0) | bit
+                for w in key.split():
+                    self._content_words[w] = self._content_words.get(w, 0) | bit
+
+    # --- Lookups ---
+
+    def row_for(self, name: str) -> dict | None:
+        """First menu row with this item name, if it is on the menu."""
+        return self._row_by_name.get(name.strip().lower())
+
+    def _mentions(self, term: str) -> int:
+        """Items whose name/ingredients contain `term` (phrase or all of its words)."""
+        key = _phrase(term)
+        if not key:
+            return 0
+        mask = self._content_phrases.get(key, 0)
+        words = key.split()
+        word_mask = self.all_mask
+        for w in words:
+            word_mask &= self._content_words.get(w, 0)
+            if not word_mask:
+                break
+        return mask | word_mask
+
+    def _contains_allergen(self, value: str) -> int:
+        key = _phrase(value)
+        names = ALLERGEN_SYNONYMS.get(key, set()) | {key}
+        mask = 0
+        for name in names:
+            mask |= self._allergens.get(_phrase(name), 0)
+        return mask | self._mentions(value)
+
+    def _violates_restriction(self, value: str) -> int:
+        key = _normalize_restriction(value)
+        rule = RESTRICTION_RULES.get(key)
+        if rule is None:
+            # Free-form restriction such as "pork": treat as something to avoid
+            return self._mentions(value)
+        required_tags, banned_allergens = rule
+        allowed = 0
+        for tag in required_tags:
+            allowed |= self._tags.get(tag, 0)
+        mask = self.all_mask & ~allowed
+        for allergen in banned_allergens:
+            mask |= self._allergens.get(_phrase(allergen), 0)
+        return mask
+
+    def exclusion_mask(self, preferences: Iterable) -> int:
+        """Bitset of items that conflict with any allergy, restriction or dislike."""
+        mask = 0
+        for p in preferences:
+            ptype = (p.preference_type or "").lower()
+            value = p.value or ""
+            if ptype == "allergy":
+                mask |= self._contains_allergen(value)
+            elif ptype == "restriction":
+                mask |= self._violates_restriction(value)
+            elif ptype == "dislike":
+                mask |= self._mentions(value)
+        return mask
+
+    def safe_items(self, preferences: Iterable) -> list[dict]:
+        """Menu rows that do not conflict with the given preferences."""
+        excluded = self.exclusion_mask(preferences)
+        return [row for i, row in enumerate(self.rows) if not (excluded >> i) & 1]
+
+    def filter_candidates(self, candidates: list[str], preferences: Iterable) -> list[str]:
+        """
+        Drop candidate names that conflict with the preferences. Names found on
+        the menu are checked against their tags/ingredients/allergens; unknown
+        names are checked against the words in the name itself, and dropped
+        outright under a dietary rule (vegetarian, halal, ...) since their
+        tags can't be verified.
+        """
+        preferences = list(preferences)
+        excluded = self.exclusion_mask(preferences)
+        unknown_terms = []
+        strict = False
+        for p in preferences:
+            ptype = (p.preference_type or "").lower()
+            value = (p.value or "").strip()
+            if not value:
+                continue
+            if ptype == "restriction" and _normalize_restriction(value) in RESTRICTION_RULES:
+                strict = True
+            elif ptype in ("allergy", "dislike", "restriction"):
+                unknown_terms.append(set(tokenize(value)))
+
+        kept = []
+        for cand in candidates:
+            bits = self._by_name.get(cand.strip().lower())
+            if bits is not None:
+                if not bits & excluded:
+                    kept.append(cand)
+                continue
+            if strict:
+                continue
+            name_words = set(tokenize(cand))
+            if any(t and t <= name_words for t in unknown_terms):
+                continue
+            kept.append(cand)
+        return kept
+
+
+_today_index: tuple[date, list[dict], MenuIndex] | None = None
+
+
+async def get_today_index() -> MenuIndex:
+    """Index over today's menu, rebuilt only when the cached menu rows change."""
+    global _today_index
+    today = date.today()
+    rows = await menu_cache.get(today)
+    if _today_index is None or _today_index[0] != today or _today_index[1] is not rows:
+        _today_index = (today, rows, MenuIndex(rows))
+    return _today_index[2]
@@ -0,0 +1,271 @@
+"""
+Local SQLite snapshot of Snowflake `menu_items`.
+
+Menus are materialised per day into a local SQLite file so the request path
+reads them with zero network I/O. Days are synced incrementally from
+Snowflake (only days not yet in the snapshot are fetched) and the snapshot
+can be seeded entirely offline from `menu_db_setup.sql`. A day Snowflake
+returned no rows for (e.g. prefetched before it was loaded) counts as
+missing again after MENU_SNAPSHOT_EMPTY_RETRY seconds.
+
+CLI:
+    python -m services.menu_snapshot --seed ../menu_db_setup.sql
+    python -m services.menu_snapshot --sync 2026-02-09 2026-02-10
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterable
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+MENU_SNAPSHOT_PATH = os.getenv("MENU_SNAPSHOT_PATH", str(_BACKEND_DIR / "menu_snapshot.db"))
+MENU_SEED_SQL = os.getenv("MENU_SEED_SQL", str(_BACKEND_DIR.parent / "menu_db_setup.sql"))
+MENU_SNAPSHOT_EMPTY_RETRY = float(os.getenv("MENU_SNAPSHOT_EMPTY_RETRY", "300"))  # seconds
+
+ARRAY_COLUMNS = ("tags", "ingredients", "allergies")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS menu_items (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    residence TEXT,
+    meal_type TEXT,
+    item_name TEXT NOT NULL,
+    tags TEXT NOT NULL DEFAULT '[]',
+    ingredients TEXT NOT NULL DEFAULT '[]',
+    allergies TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS ix_menu_items_day ON menu_items (day, residence, meal_type);
+CREATE TABLE IF NOT EXISTS snapshot_days (
+    day TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    synced_at TEXT NOT NULL
+);
+"""
+
+
+def normalize_row(row: dict) -> dict:
+    """
+    Normalise a menu row from Snowflake (upper-case keys, ARRAY columns as
+    JSON strings) or the seed file into lower-case keys with list values.
+    """
+    out = {str(k).lower(): v for k, v in row.items()}
+    day = out.get("day")
+    if isinstance(day, (date, datetime)):
+        out["day"] = day.isoformat()[:10]
+    for col in ARRAY_COLUMNS:
+        val = out.get(col)
+        if val is None:
+            out[col] = []
+        elif isinstance(val, str):
+            out[col] = json.loads(val) if val.strip() else []
+        else:
+            out[col] = list(val)
+    return out
+
+
+# --- Seed file parsing ---
+
+_STRING = r"'(?:[^']|'')*'"
+_ARRAY = r"ARRAY_CONSTRUCT\(\s*((?:" + _STRING + r"\s*,?\s*)*)\)"
+_SEED_ROW = re.compile(
+    r"SELECT\s+"
+    + r"\s*,\s*".join([f"({_STRING})"] * 4)
+    + r"\s*,\s*" + r"\s*,\s*".join([_ARRAY] * 3),
+    re.IGNORECASE,
+)
+_STRING_RE = re.compile(_STRING)
+
+
+def _unquote(literal: str) -> str:
+    return literal[1:-1].replace("''", "'")
+
+
+def parse_seed_sql(text: str) -> list[dict]:
+    """Extract `menu_items` rows from the INSERT ... SELECT ... UNION ALL seed script."""
+    rows = []
+    for m in _SEED_ROW.finditer(text):
+        day, residence, meal_type, item_name = (_unquote(g) for g in m.groups()[:4])
+        arrays = [[_unquote(s) for s in _STRING_RE.findall(g or "")] for g in m.groups()[4:]]
+        rows.append(
+            {
+                "day": day,
+                "residence": residence,
+                "meal_type": meal_type,
+                "item_name": item_name,
+                "tags": arrays[0],
+                "ingredients": arrays[1],
+                "allergies": arrays[2],
+            }
+        )
+    return rows
+
+
+# --- Snapshot store ---
+
+
+class MenuSnapshot:
+    """Day-partitioned menu rows in a local SQLite file."""
+
+    def __init__(self, path: str = MENU_SNAPSHOT_PATH, empty_retry: float = MENU_SNAPSHOT_EMPTY_RETRY):
+        self.path = path
+        self.empty_retry = empty_retry
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def days(self) -> list[str]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT day FROM snapshot_days ORDER BY day")]
+
+    def has_day(self, day: date | str) -> bool:
+        """
+        Whether `day` is synced. An empty Snowflake result only counts for
+        `empty_retry` seconds, so a menu loaded upstream later is picked up.
+        """
+        day = day if isinstance(day, str) else day.isoformat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source, row_count, synced_at FROM snapshot_days WHERE day = ?", (day,)
+            ).fetchone()
+        if row is None:
+            return False
+        source, row_count, synced_at = row
+        if source == "snowflake" and row_count == 0:
+            return datetime.fromisoformat(synced_at) > datetime.utcnow() - timedelta(seconds=self.empty_retry)
+        return True
+
+    def read_day(self, day: date | str) -> list[dict]:
+        day = day if isinstance(day, str) else day.isoformat()
+        with self._lock:
+            cur = self._conn.execute(
+                "SELECT id, day, residence, meal_type, item_name, tags, ingredients, allergies "
+                "FROM menu_items WHERE day = ? ORDER BY id",
+                (day,),
+            )
+            rows = cur.fetchall()
+        return [
+            {
+                "id": r[0],
+                "day": r[1],
+                "residence": r[2],
+                "meal_type": r[3],
+                "item_name": r[4],
+                "tags": json.loads(r[5]),
+                "ingredients": json.loads(r[6]),
+                "allergies": json.loads(r[7]),
+            }
+            for r in rows
+        ]
+
+    def write_day(self, day: date | str, rows: Iterable[dict], source: str) -> int:
+        """Replace all rows for `day` atomically; returns the number of rows written."""
+        day = day if isinstance(day, str) else day.isoformat()
+        rows = [normalize_row(r) for r in rows]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM menu_items WHERE day = ?", (day,))
+            self._conn.executemany(
+                "INSERT INTO menu_items (day, residence, meal_type, item_name, tags, ingredients, allergies) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        day,
+                        r.get("residence"),
+                        r.get("meal_type"),
+                        r.get("item_name"),
+                        json.dumps(r["tags"]),
+                        json.dumps(r["ingredients"]),
+                        json.dumps(r["allergies"]),
+                    )
+                    for r in rows
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO snapshot_days (day, source, row_count, synced_at) VALUES (?, ?, ?, ?)",
+                (day, source, len(rows), datetime.utcnow().isoformat()),
+            )
+        return len(rows)
+
+    def load_seed(self, sql_path: str = MENU_SEED_SQL) -> int:
+        """Load every day found in the SQL seed script; returns rows written."""
+        with open(sql_path, encoding="utf-8") as f:
+            rows = parse_seed_sql(f.read())
+        by_day: dict[str, list[dict]] = {}
+        for r in rows:
+            by_day.setdefault(r["day"], []).append(r)
+        return sum(self.write_day(day, day_rows, source="seed") for day, day_rows in by_day.items())
+
+    def sync(self, days: Iterable[date], fetch: Callable[[date], list[dict]], force: bool = False) -> int:
+        """Fetch and store only the days missing from the snapshot (all of them if `force`)."""
+        written = 0
+        for day in days:
+            if not force and self.has_day(day):
+                continue
+            written += self.write_day(day, fetch(day), source="snowflake")
+        return written
+
+
+_snapshot: MenuSnapshot | None = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> MenuSnapshot:
+    global _snapshot
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = MenuSnapshot()
+                if not _snapshot.days() and os.path.exists(MENU_SEED_SQL):
+                    count = _snapshot.load_seed(MENU_SEED_SQL)
+                    logger.info("Seeded menu snapshot with %d rows from %s", count, MENU_SEED_SQL)
+    return _snapshot
+
+
+def read_menu_day(day: date) -> list[dict]:
+    """
+    Menu rows for `day`, served from the local snapshot. A day that is not in
+    the snapshot yet is synced once from Snowflake (when configured).
+    """
+    snapshot = get_snapshot()
+    if not snapshot.has_day(day) and os.getenv("SNOWFLAKE_ACCOUNT"):
+        from db import query_day
+
+        snapshot.sync([day], fetch=query_day)
+    return snapshot.read_day(day)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Manage the local menu snapshot")
+    parser.add_argument("--seed", metavar="SQL", help="load rows from a menu_db_setup.sql style script")
+    parser.add_argument("--sync", nargs="+", metavar="YYYY-MM-DD", help="sync these days from Snowflake")
+    parser.add_argument("--force", action="store_true", help="re-fetch days already in the snapshot")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    snap = MenuSnapshot()
+    if args.seed:
+        print(f"Loaded {snap.load_seed(args.seed)} rows from {args.seed}")
+    if args.sync:
+        from db import query_day
+
+        n = snap.sync([date.fromisoformat(d) for d in args.sync], fetch=query_day, force=args.force)
+        print(f"Synced {n} rows from Snowflake")
+    print("Days in snapshot:", ", ".join(snap.days()) or "(none)")
@@ -0,0 +1,201 @@
+"""
+Extract food preferences from a voice transcript.
+
+Dietary tags go through a multi-pattern matcher: a handful of tags are
+plain substring checks, and past SCAN_MIN_LITERALS they are compiled into
+one trie regex so the transcript is scanned once however many are added.
+Each "i don't like ..." style phrase type is one regex over all of its
+openers with the item captured in the same pass. Negation triggers are
+checked the other way round: each keyword's occurrences are found with
+`str.find` and the text just before them is tested against all triggers
+with one `str.endswith(tuple)`, so the cost follows how often the keywords
+occur rather than how often short, frequent triggers like "no " do.
+
+benchmarks/bench_preference_extractor.py compares this against the original
+implementation across transcript lengths and vocabulary sizes;
+tests/test_preference_extractor.py pins the output to the golden cases.
+"""
+
+import re
+from typing import Iterable
+
+# Dietary tags recorded as restrictions (order defines output order)
+DIETARY_TAGS = ["vegan", "vegetarian", "kosher", "halal", "gluten-free", "gluten free", "lactose intolerant"]
+
+# A trigger immediately followed by a keyword marks that keyword as disliked
+NEG_TRIGGERS = ["no ", "don't ", "dont ", "do not ", "avoid ", "allerg", "can't ", "cannot "]
+
+ALLERGY_MARKER = "allerg"
+
+# Phrase openers whose following words name the item; one pattern may have several openers
+PHRASE_PATTERNS: list[tuple[str, list[str]]] = [
+    ("dislike", ["i don't like ", "i do not like ", "i dont like "]),
+    ("dislike", ["i hate "]),
+    ("allergy", ["i'm allergic to "]),
+    ("allergy", ["i am allergic to "]),
+]
+
+# What a phrase capture may contain (same character class as the original regexes)
+_CAPTURE_RE = re.compile(r"[a-zA-Z \-']+")
+
+# Below this many literals, one C substring search per literal beats a regex scan (~20 ns/char)
+SCAN_MIN_LITERALS = 64
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Regex source for a set of literals, factored into a character trie so the
+    engine dispatches on one character per step instead of trying every
+    literal at every position. Greedy optionals make it prefer the longest
+    literal at a given start.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        is_end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if is_end else group
+
+    return build(trie)
+
+
+class MultiPatternMatcher:
+    """
+    Aho-Corasick style multi-pattern substring matcher. All literals are
+    compiled into one trie-shaped regex; each search reports the longest
+    literal starting at the next matching position and the following search
+    resumes one character later, so overlapping occurrences are found too.
+    Literals that are prefixes of the match (same start) come from a
+    precomputed table. Together this yields every (start, end, payload)
+    occurrence.
+    """
+
+    def __init__(self, patterns: Iterable[tuple[str, object]]):
+        self._payloads: dict[str, list[object]] = {}
+        for word, payload in patterns:
+            self._payloads.setdefault(word, []).append(payload)
+        words = sorted(self._payloads, key=len, reverse=True)
+        # No lookahead wrapper: a bare alternation lets the engine skip ahead to candidate first characters
+        self._regex = re.compile("(" + _trie_pattern(words) + ")")
+        # longest literal at a start -> (length, payload) for it and every literal that prefixes it
+        self._hits: dict[str, tuple[tuple[int, object], ...]] = {
+            w: tuple((len(p), payload) for p in words if w.startswith(p) for payload in self._payloads[p])
+            for w in words
+        }
+
+    def scan(self, text: str) -> list[tuple[int, tuple[tuple[int, object], ...]]]:
+        """(start, ((length, payload), ...)) for each position where any literal starts."""
+        hits = self._hits
+        search = self._regex.search
+        out = []
+        m = search(text)
+        while m is not None:
+            start = m.start()
+            out.append((start, hits[m.group(1)]))
+            m = search(text, start + 1)
+        return out
+
+    def present(self, text: str) -> set:
+        """Payloads of every literal that occurs in `text`."""
+        if len(self._payloads) < SCAN_MIN_LITERALS:
+            return {payload for word, payloads in self._payloads.items() if word in text for payload in payloads}
+        return {payload for _start, hits in self.scan(text) for _length, payload in hits}
+
+    def iter_matches(self, text: str):
+        """Every (start, end, payload) occurrence, overlapping ones included."""
+        for start, hits in self.scan(text):
+            for length, payload in hits:
+                yield start, start + length, payload
+
+
+class PreferenceExtractor:
+    """Reusable extractor; build once at import time and share across requests."""
+
+    def __init__(
+        self,
+        dietary_tags: list[str] = DIETARY_TAGS,
+        neg_triggers: list[str] = NEG_TRIGGERS,
+        phrase_patterns: list[tuple[str, list[str]]] = PHRASE_PATTERNS,
+    ):
+        self._dietary_tags = list(dietary_tags)
+        self._neg_triggers = tuple(neg_triggers)
+        self._phrase_patterns = list(phrase_patterns)
+        self._matcher = MultiPatternMatcher((tag, i) for i, tag in enumerate(self._dietary_tags))
+        self._phrase_regexes = [
+            (ptype, re.compile("(?:" + _trie_pattern(openers) + ")(" + _CAPTURE_RE.pattern + ")"))
+            for ptype, openers in self._phrase_patterns
+        ]
+
+    def extract(self, transcript: str, intent: str, keywords: list[str]) -> list[dict]:
+        t = (transcript or "").lower()
+
+        tags_found = self._matcher.present(t)
+        has_allergy_marker = ALLERGY_MARKER in t
+
+        prefs: list[dict] = []
+
+        # Map explicit dietary tags
+        for i, tag in enumerate(self._dietary_tags):
+            if i in tags_found:
+                prefs.append(self._pref("restriction", tag.replace(" ", "-")))
+
+        # Use keywords as candidate food items; look for negative context in transcript:
+        # a keyword occurrence directly preceded by any trigger.
+        triggers = self._neg_triggers
+        for kw in keywords:
+            kw_l = kw.lower()
+            if has_allergy_marker and kw_l in t:
+                prefs.append(self._pref("allergy", kw))
+                continue
+            if not kw_l:
+                negative = any(trig in t for trig in triggers)
+            else:
+                negative = False
+                pos = t.find(kw_l)
+                while pos != -1:
+                    if t.endswith(triggers, 0, pos):
+                        negative = True
+                        break
+                    pos = t.find(kw_l, pos + 1)
+            if negative:
+                prefs.append(self._pref("dislike", kw))
+
+        # "i don't like X", "i hate X", "i'm allergic to X" ... (non-overlapping, left to right)
+        for ptype, regex in self._phrase_regexes:
+            for m in regex.finditer(t):
+                item = m.group(1).strip()
+                if item:
+                    prefs.append(self._pref(ptype, item))
+
+        # Deduplicate by (type,value)
+        seen = set()
+        deduped = []
+        for p in prefs:
+            key = (p["preference_type"], p["value"].lower())
+            if key in seen:
+                continue
+            seen.add(key)
+            deduped.append(p)
+        return deduped
+
+    @staticmethod
+    def _pref(ptype: str, value: str) -> dict:
+        return {"preference_type": ptype, "value": value, "category": "food", "meta": {"source": "voice"}}
+
+
+_extractor = PreferenceExtractor()
+
+
+def extract_preferences(transcript: str, intent: str, keywords: list[str]) -> list[dict]:
+    """Preference dicts (PreferenceCreate fields) found in a transcript and its keywords."""
+    return _extractor.extract(transcript, intent, keywords)
@@ -1,38 +1,279 @@
-from typing import List
+import base64
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, List
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
+from db import async_session
 from models.preference import Preference
 from schemas.preference import PreferenceCreate
+from services.recommendation_service import invalidate_user_recommendations
+from metrics import PREFERENCE_SAVED, PREFERENCE_CACHE_HITS, PREFERENCE_CACHE_MISSES
+from utils.instrumentation import track
+from utils.invalidation_bus import InvalidationBus
+from utils.ttl_cache import TTLCache
 
+logger = logging.getLogger(__name__)
 
+PREFERENCE_CACHE_MAX_USERS = int(os.getenv("PREFERENCE_CACHE_MAX_USERS", "10000"))
+PREFERENCE_CACHE_MAX_BYTES = int(os.getenv("PREFERENCE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PREFERENCE_CACHE_TTL = float(os.getenv("PREFERENCE_CACHE_TTL", "600"))
+# Shared directory for cross-worker invalidation sockets; empty disables broadcasting
+PREFERENCE_CACHE_BUS_DIR = os.getenv("PREFERENCE_CACHE_BUS_DIR", "")
+
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class PreferenceConflictError(Exception):
+    """An edit would duplicate another of the user's (preference_type, value) pairs."""
+
+    pass
+
+
+def _prefs_size(prefs: List[Preference]) -> int:
+    """Rough footprint of a cached preference list in bytes."""
+    size = 64
+    for p in prefs:
+        size += 400 + len(p.value) + len(p.preference_type) + len(p.category or "")
+        if p.meta:
+            size += len(json.dumps(p.meta, default=str))
+    return size
+
+
+# user_id -> decoded Preference rows (treat as read-only)
+_read_cache = TTLCache(
+    max_entries=PREFERENCE_CACHE_MAX_USERS,
+    ttl=PREFERENCE_CACHE_TTL,
+    max_bytes=PREFERENCE_CACHE_MAX_BYTES,
+    sizeof=_prefs_size,
+)
+# Bumped on every invalidation so a read that raced a write doesn't cache stale rows
+_write_generation = 0
+_bus: InvalidationBus | None = None
+
+
+def _invalidate_local(user_id: str) -> None:
+    global _write_generation
+    _write_generation += 1
+    _read_cache.pop(user_id)
+    invalidate_user_recommendations(user_id)
+
+
+def invalidate_user_preferences(user_id: str) -> None:
+    """Drop cached preferences and recommendations for a user, here and in sibling workers."""
+    _invalidate_local(user_id)
+    if _bus is not None:
+        _bus.publish(user_id)
+
+
+async def start_invalidation_bus() -> None:
+    global _bus
+    if PREFERENCE_CACHE_BUS_DIR and _bus is None:
+        try:
+            bus = InvalidationBus(PREFERENCE_CACHE_BUS_DIR, _invalidate_local)
+            bus.start()
+            _bus = bus
+        except Exception:
+            logger.exception("Preference invalidation bus unavailable; caches stay per-process")
+
+
+async def stop_invalidation_bus() -> None:
+    global _bus
+    if _bus is not None:
+        _bus.stop()
+        _bus = None
+
+
+def _upsert(session: AsyncSession, rows: list[dict]):
+    """INSERT ... ON CONFLICT on the (user, type, lower(value)) key that only bumps `updated_at`."""
+    insert = _INSERTS[session.bind.dialect.name]
+    stmt = insert(Preference).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[Preference.user_id, Preference.preference_type, func.lower(Preference.value)],
+        set_={"updated_at": stmt.excluded.updated_at},
+    )
+
+
+@track("preference_db", "create")
 async def create_preference(session: AsyncSession, user_id: str, data: PreferenceCreate) -> Preference:
-    pref = Preference(user_id=user_id, **data.model_dump())
-    session.add(pref)
+    """
+    Insert a preference. If the user already has the same type and
+    (case-insensitive) value, that row is returned with `updated_at` bumped
+    instead, the same upsert the voice write path uses.
+    """
+    now = datetime.now(timezone.utc)
+    row = {"user_id": user_id, **data.model_dump(), "created_at": now, "updated_at": now}
+    await session.execute(_upsert(session, [row]))
     await session.commit()
-    await session.refresh(pref)
+    q = (
+        select(Preference)
+        .where(
+            Preference.user_id == user_id,
+            Preference.preference_type == data.preference_type,
+            func.lower(Preference.value) == func.lower(data.value),
+        )
+        .execution_options(populate_existing=True)
+    )
+    pref = (await session.execute(q)).scalars().one()
+    invalidate_user_preferences(user_id)
     return pref
 
 
+async def bulk_upsert_preferences(
+    session: AsyncSession, user_id: str, items: Iterable[PreferenceCreate]
+) -> dict[str, int]:
+    """
+    Save many preferences in one transaction. Rows whose (preference_type,
+    lower(value)) already exist for the user only get `updated_at` bumped;
+    blank values and repeats within `items` are skipped. Returns
+    {"inserted", "updated", "skipped"} counts.
+    """
+    return await bulk_upsert_many(session, ((user_id, item) for item in items))
+
+
+@track("preference_db", "bulk_upsert")
+async def bulk_upsert_many(
+    session: AsyncSession, items: Iterable[tuple[str, PreferenceCreate]]
+) -> dict[str, int]:
+    """`bulk_upsert_preferences` for (user_id, preference) pairs spanning several users."""
+    rows: dict[tuple[str, str, str], dict] = {}
+    skipped = 0
+    now = datetime.now(timezone.utc)
+    for user_id, item in items:
+        value = item.value.strip()
+        key = (user_id, item.preference_type, value.lower())
+        if not value or key in rows:
+            skipped += 1
+            continue
+        rows[key] = {
+            "user_id": user_id,
+            "category": item.category,
+            "preference_type": item.preference_type,
+            "value": value,
+            "meta": item.meta,
+            "created_at": now,
+            "updated_at": now,
+        }
+    counts = {"inserted": 0, "updated": 0, "skipped": skipped}
+    if rows:
+        users = {k[0] for k in rows}
+        q = select(Preference.user_id, Preference.preference_type, func.lower(Preference.value)).where(
+            Preference.user_id.in_(users),
+            Preference.preference_type.in_({k[1] for k in rows}),
+            func.lower(Preference.value).in_({k[2] for k in rows}),
+        )
+        existing = {tuple(r) for r in (await session.execute(q)).all()}
+
+        await session.execute(_upsert(session, list(rows.values())))
+        await session.commit()
+        counts["updated"] = len(existing & rows.keys())
+        counts["inserted"] = len(rows) - counts["updated"]
+        for user_id in users:
+            invalidate_user_preferences(user_id)
+    for outcome, n in counts.items():
+        if n:
+            PREFERENCE_SAVED.labels(outcome=outcome).inc(n)
+    return counts
+
+
 async def get_user_preferences(session: AsyncSession, user_id: str) -> List[Preference]:
+    """All of a user's preferences, served from the per-user read cache when possible."""
+    cached = _read_cache.get(user_id)
+    if cached is not None:
+        PREFERENCE_CACHE_HITS.inc()
+        return cached
+    PREFERENCE_CACHE_MISSES.inc()
+    generation = _write_generation
     q = select(Preference).where(Preference.user_id == user_id)
-    results = await session.execute(q)
-    return results.scalars().all()
+    with track("preference_db", "list"):
+        results = await session.execute(q)
+        prefs = results.scalars().all()
+    if generation == _write_generation:
+        _read_cache.set(user_id, prefs)
+    return prefs
+
+
+def encode_cursor(pref: Preference) -> str:
+    """Opaque keyset cursor pointing just past `pref` in id DESC order."""
+    return base64.urlsafe_b64encode(str(pref.id).encode()).decode().rstrip("=")
 
 
+def decode_cursor(cursor: str) -> int:
+    """Inverse of `encode_cursor`; raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        # Cursors issued before the switch to id-only keys were "updated_at|id"
+        return int(raw.rsplit("|", 1)[-1])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def _newest_first(user_id: str):
+    # Keyed on the immutable id (creation order): upserts bump updated_at, which
+    # would move rows across pages while a client is paging
+    return select(Preference).where(Preference.user_id == user_id).order_by(Preference.id.desc())
+
+
+@track("preference_db", "list_page")
+async def get_user_preferences_page(
+    session: AsyncSession, user_id: str, limit: int, cursor: str | None = None
+) -> tuple[List[Preference], str | None]:
+    """
+    One page of a user's preferences, newest first, plus the cursor for the
+    next page (None on the last page). Seeks on id so every page costs the
+    same regardless of depth.
+    """
+    q = _newest_first(user_id)
+    if cursor:
+        q = q.where(Preference.id < decode_cursor(cursor))
+    results = await session.execute(q.limit(limit + 1))
+    rows = results.scalars().all()
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(rows[limit - 1])
+    return rows, None
+
+
+async def stream_user_preferences(user_id: str, batch_size: int = 500) -> AsyncIterator[Preference]:
+    """
+    Yield a user's preferences, newest first, from a server-side cursor
+    fetched `batch_size` rows at a time. Opens its own session so it can
+    outlive the request's dependency-scoped one while a response streams.
+    """
+    async with async_session() as session:
+        result = await session.stream(_newest_first(user_id).execution_options(yield_per=batch_size))
+        async for pref in result.scalars():
+            yield pref
+
+
+@track("preference_db", "get")
 async def get_preference(session: AsyncSession, pref_id: int, user_id: str) -> Preference | None:
     q = select(Preference).where(Preference.id == pref_id, Preference.user_id == user_id)
     result = await session.execute(q)
     return result.scalars().first()
 
 
+@track("preference_db", "delete")
 async def delete_preference(session: AsyncSession, pref: Preference) -> None:
     await session.delete(pref)
     await session.commit()
+    invalidate_user_preferences(pref.user_id)
 
 
+@track("preference_db", "update")
 async def update_preference(session: AsyncSession, pref: Preference, data: dict) -> Preference:
+    """Apply `data` to `pref`; raises PreferenceConflictError if that duplicates another preference."""
     for k, v in data.items():
         setattr(pref, k, v)
-    await session.commit()
+    try:
+        await session.commit()
+    except IntegrityError as e:
+        await session.rollback()
+        raise PreferenceConflictError("The user already has a preference with this type and value") from e
     await session.refresh(pref)
+    invalidate_user_preferences(pref.user_id)
     return pref
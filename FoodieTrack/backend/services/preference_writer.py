@@ -0,0 +1,148 @@
+"""
+Write-behind persistence for voice-extracted preferences.
+
+/voice/analyze hands its extracted preferences to a bounded in-process queue
+and returns immediately; a single worker collects items across requests and
+saves them with one bulk upsert per batch. A batch is flushed once it
+reaches `PREFERENCE_BATCH_SIZE` items or `PREFERENCE_FLUSH_INTERVAL` seconds
+after its first item arrived, whichever comes first. Upserts are idempotent,
+so a batch interrupted by shutdown is simply written again while draining.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Iterable
+
+from db import async_session
+from metrics import PREFERENCE_QUEUE_DEPTH, PREFERENCE_QUEUE_LAG_SECONDS, PREFERENCE_SAVE_FAILURES
+from schemas.preference import PreferenceCreate
+from services.preference_service import bulk_upsert_many
+
+logger = logging.getLogger(__name__)
+
+PREFERENCE_QUEUE_MAX = int(os.getenv("PREFERENCE_QUEUE_MAX", "10000"))  # pending preferences
+PREFERENCE_BATCH_SIZE = int(os.getenv("PREFERENCE_BATCH_SIZE", "500"))
+PREFERENCE_FLUSH_INTERVAL = float(os.getenv("PREFERENCE_FLUSH_INTERVAL", "0.5"))  # seconds
+PREFERENCE_DRAIN_TIMEOUT = float(os.getenv("PREFERENCE_DRAIN_TIMEOUT", "10"))  # seconds allowed at shutdown
+
+# (enqueued_at, user_id, preference)
+_Item = tuple[float, str, PreferenceCreate]
+
+
+class PreferenceWriteBehind:
+    """Bounded queue + batching worker in front of `bulk_upsert_many`."""
+
+    def __init__(
+        self,
+        session_factory: Callable = async_session,
+        max_pending: int = PREFERENCE_QUEUE_MAX,
+        batch_size: int = PREFERENCE_BATCH_SIZE,
+        flush_interval: float = PREFERENCE_FLUSH_INTERVAL,
+    ):
+        self._session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[_Item] = asyncio.Queue(maxsize=max_pending)
+        self._batch_ready = asyncio.Event()
+        self._batch: list[_Item] = []  # items taken off the queue but not yet committed
+        self._task: asyncio.Task | None = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() + len(self._batch)
+
+    def submit(self, user_id: str, items: Iterable[PreferenceCreate]) -> bool:
+        """
+        Queue preferences for saving without waiting on the database. Returns
+        False (queuing nothing) if the worker isn't running or the queue
+        can't take all of them; the caller should then save inline.
+        """
+        items = list(items)
+        if self._task is None or self._queue.maxsize - self._queue.qsize() < len(items):
+            return False
+        now = time.monotonic()
+        for item in items:
+            self._queue.put_nowait((now, user_id, item))
+        if self._queue.qsize() + 1 >= self.batch_size:
+            self._batch_ready.set()
+        PREFERENCE_QUEUE_DEPTH.set(self.depth)
+        return True
+
+    async def _collect(self) -> None:
+        """Fill `self._batch` from the queue by the size or time threshold."""
+        self._batch.append(await self._queue.get())
+        if self._queue.qsize() + 1 < self.batch_size:
+            self._batch_ready.clear()
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+        while len(self._batch) < self.batch_size:
+            try:
+                self._batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+    async def _flush(self, batch: list[_Item]) -> None:
+        try:
+            async with self._session_factory() as session:
+                counts = await bulk_upsert_many(session, ((user_id, pref) for _, user_id, pref in batch))
+            PREFERENCE_QUEUE_LAG_SECONDS.observe(time.monotonic() - min(t for t, _, _ in batch))
+            logger.debug("Saved preference batch of %d: %s", len(batch), counts)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            PREFERENCE_SAVE_FAILURES.inc(len(batch))
+            logger.exception("Failed to save batch of %d preferences", len(batch))
+
+    async def run(self) -> None:
+        while True:
+            await self._collect()
+            PREFERENCE_QUEUE_DEPTH.set(self.depth)
+            await self._flush(self._batch)
+            self._batch = []
+            PREFERENCE_QUEUE_DEPTH.set(self.depth)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self, timeout: float = PREFERENCE_DRAIN_TIMEOUT) -> None:
+        """Stop accepting work and write out everything still pending."""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        pending, self._batch = self._batch, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        PREFERENCE_QUEUE_DEPTH.set(0)
+        if not pending:
+            return
+
+        async def _drain():
+            for i in range(0, len(pending), self.batch_size):
+                await self._flush(pending[i:i + self.batch_size])
+
+        try:
+            await asyncio.wait_for(_drain(), timeout)
+            logger.info("Drained %d queued preferences", len(pending))
+        except asyncio.TimeoutError:
+            logger.error("Timed out draining preference queue after %.0fs", timeout)
+
+
+preference_writer = PreferenceWriteBehind()
+
+
+async def start_preference_writer() -> None:
+    preference_writer.start()
+
+
+async def stop_preference_writer() -> None:
+    await preference_writer.stop()
@@ -0,0 +1,177 @@
+"""
+Local vectorized ranking of recommendation candidates.
+
+Candidates and the user's preference terms are turned into a binary
+candidates x terms match matrix in one pass; a terms x features projection
+then yields per-candidate feature rows (tag matches, keyword overlap,
+dislike and allergy hits) that are scored with a single matrix product.
+Serves both as the `fast` recommendation mode and as a pre-ranker that
+limits how many candidates are sent to Gemini.
+"""
+
+from functools import lru_cache
+from typing import Iterable, List, Sequence
+
+import numpy as np
+
+from schemas.recommendation import RecommendationItem
+from services.menu_index import tokenize
+
+# Feature columns
+TAG_MATCH, KEYWORD_OVERLAP, DISLIKE_HIT, ALLERGY_HIT = range(4)
+
+# Preference type -> feature column
+_TYPE_FEATURE = {
+    "like": TAG_MATCH,
+    "favorite": TAG_MATCH,
+    "favourite": TAG_MATCH,
+    "restriction": TAG_MATCH,
+    "goal": TAG_MATCH,
+    "dislike": DISLIKE_HIT,
+    "allergy": ALLERGY_HIT,
+}
+
+# Linear weights applied to the feature matrix
+FEATURE_WEIGHTS = np.array([1.0, 0.6, -1.5, -5.0], dtype=np.float32)
+
+_REASON_TEMPLATES = {
+    TAG_MATCH: "Matches your preference for {terms}",
+    KEYWORD_OVERLAP: "Mentions {terms}, which you talked about recently",
+    DISLIKE_HIT: "Contains {terms}, which you said you dislike",
+    ALLERGY_HIT: "Warning: may contain {terms}",
+}
+_DEFAULT_REASON = "A balanced option from today's menu"
+
+
+def _candidate_text(name: str, row: dict | None) -> str:
+    if not row:
+        return name
+    parts = [name, *(row.get("tags") or []), *(row.get("ingredients") or [])]
+    return " ".join(parts)
+
+
+@lru_cache(maxsize=32768)
+def _candidate_tokens(text: str) -> frozenset[str]:
+    # Menus repeat all day, so each candidate is tokenized once
+    return frozenset(tokenize(text))
+
+
+def _build_terms(preferences: Iterable, keywords: Sequence[str]) -> tuple[list[str], list[tuple[str, ...]], np.ndarray]:
+    """Deduplicated (label, tokens, feature) triples for every preference term and keyword."""
+    labels: list[str] = []
+    tokens: list[tuple[str, ...]] = []
+    features: list[int] = []
+    seen: set[tuple[tuple[str, ...], int]] = set()
+
+    def add(label: str, feature: int) -> None:
+        toks = tuple(tokenize(label))
+        if not toks or (toks, feature) in seen:
+            return
+        seen.add((toks, feature))
+        labels.append(label)
+        tokens.append(toks)
+        features.append(feature)
+
+    for p in preferences:
+        feature = _TYPE_FEATURE.get((p.preference_type or "").lower())
+        if feature is not None:
+            add(p.value or "", feature)
+    for kw in keywords:
+        add(kw, KEYWORD_OVERLAP)
+    return labels, tokens, np.asarray(features, dtype=np.int64)
+
+
+def match_matrix(candidate_tokens: Sequence[frozenset[str]], term_tokens: Sequence[tuple[str, ...]]) -> np.ndarray:
+    """
+    Boolean (n_candidates, n_terms) matrix: True where every word of the term
+    appears in the candidate's token set. Word hits are scattered with one `np.add.at`.
+    """
+    n, t = len(candidate_tokens), len(term_tokens)
+    if n == 0 or t == 0:
+        return np.zeros((n, t), dtype=bool)
+
+    word_to_terms: dict[str, list[int]] = {}
+    for j, toks in enumerate(term_tokens):
+        for w in set(toks):
+            word_to_terms.setdefault(w, []).append(j)
+    term_len = np.fromiter((len(set(toks)) for toks in term_tokens), dtype=np.int32, count=t)
+    vocab = frozenset(word_to_terms)
+
+    rows: list[int] = []
+    cols: list[int] = []
+    for i, toks in enumerate(candidate_tokens):
+        for w in toks & vocab:
+            hit = word_to_terms[w]
+            rows.extend([i] * len(hit))
+            cols.extend(hit)
+
+    counts = np.zeros((n, t), dtype=np.int32)
+    if rows:
+        np.add.at(counts, (np.asarray(rows), np.asarray(cols)), 1)
+    return counts >= term_len[None, :]
+
+
+def score_candidates(
+    candidates: Sequence[str],
+    preferences: Iterable,
+    keywords: Sequence[str] = (),
+    menu_rows: dict[str, dict] | None = None,
+) -> tuple[np.ndarray, np.ndarray, list[str], np.ndarray]:
+    """
+    Score every candidate in one vectorized pass.
+    Returns (scores in 0-1, match matrix, term labels, term feature ids).
+    """
+    menu_rows = menu_rows or {}
+    labels, term_tokens, term_features = _build_terms(preferences, keywords)
+    cand_tokens = [_candidate_tokens(_candidate_text(c, menu_rows.get(c.strip().lower()))) for c in candidates]
+    matches = match_matrix(cand_tokens, term_tokens)
+
+    # terms x features one-hot projection -> candidates x features
+    projection = np.zeros((len(term_tokens), len(FEATURE_WEIGHTS)), dtype=np.float32)
+    if len(term_tokens):
+        projection[np.arange(len(term_tokens)), term_features] = 1.0
+    features = matches.astype(np.float32) @ projection
+    # Diminishing returns for many positive matches
+    features[:, TAG_MATCH] = np.log1p(features[:, TAG_MATCH])
+    features[:, KEYWORD_OVERLAP] = np.log1p(features[:, KEYWORD_OVERLAP])
+
+    raw = features @ FEATURE_WEIGHTS
+    scores = 1.0 / (1.0 + np.exp(-raw))  # 0.5 == neutral
+    return scores, matches, labels, term_features
+
+
+def _reason(match_row: np.ndarray, labels: list[str], term_features: np.ndarray) -> str:
+    hit = np.flatnonzero(match_row)
+    if hit.size == 0:
+        return _DEFAULT_REASON
+    parts = []
+    for feature in (ALLERGY_HIT, DISLIKE_HIT, TAG_MATCH, KEYWORD_OVERLAP):
+        terms = [labels[j] for j in hit if term_features[j] == feature]
+        if terms:
+            parts.append(_REASON_TEMPLATES[feature].format(terms=", ".join(terms[:3])))
+    return "; ".join(parts) + "."
+
+
+def rank_candidates(
+    candidates: Sequence[str],
+    preferences: Iterable,
+    top_k: int = 3,
+    keywords: Sequence[str] = (),
+    menu_rows: dict[str, dict] | None = None,
+) -> List[RecommendationItem]:
+    """Top-k candidates by local score, each with a templated reason."""
+    if not candidates or top_k <= 0:
+        return []
+    scores, matches, labels, term_features = score_candidates(candidates, list(preferences), keywords, menu_rows)
+    k = min(top_k, len(candidates))
+    top = np.argpartition(-scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+    # stable order: score desc, then original position
+    top = top[np.lexsort((top, -scores[top]))]
+    return [
+        RecommendationItem(
+            item=candidates[i],
+            score=round(float(scores[i]), 4),
+            reason=_reason(matches[i], labels, term_features),
+        )
+        for i in top
+    ]
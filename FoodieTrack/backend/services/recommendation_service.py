@@ -1,19 +1,60 @@
-import asyncio
+import hashlib
+import json
+import logging
 import os
-from typing import List
+from datetime import date
+from typing import List, Optional
 
-from google import genai
 from google.genai import types
 
 from schemas.recommendation import RecommendationResponse, RecommendationItem
 from schemas.preference import PreferenceRead
+from services.gemini_context_cache import context_cache
+from services.menu_index import MenuIndex, get_today_index
+from services.ranking_engine import rank_candidates
+from utils.prompt_builder import build_menu_context
+from utils.tracing import span
+from utils.ttl_cache import TTLCache
+from metrics import RECOMMENDATION_CACHE_HITS, RECOMMENDATION_CACHE_MISSES
 
+logger = logging.getLogger(__name__)
 
-def _get_gemini_key() -> str:
-    key = os.getenv("GEMINI_API_KEY", "").strip()
-    if not key:
-        raise RuntimeError("GEMINI_API_KEY is not configured")
-    return key
+# Max candidates forwarded to Gemini after local pre-ranking
+RECOMMENDATION_PRERANK_N = int(os.getenv("RECOMMENDATION_PRERANK_N", "20"))
+
+# Result cache: identical (preferences, candidates, top_k) requests skip ranking entirely
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "300"))
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "2048"))
+RECOMMENDATION_CACHE_MAX_BYTES = int(os.getenv("RECOMMENDATION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# Keywords from each user's recent voice insights, used as a ranking signal
+VOICE_KEYWORDS_PER_USER = int(os.getenv("VOICE_KEYWORDS_PER_USER", "20"))
+VOICE_KEYWORDS_TTL = float(os.getenv("VOICE_KEYWORDS_TTL", str(7 * 24 * 3600)))
+VOICE_KEYWORDS_MAX_USERS = int(os.getenv("VOICE_KEYWORDS_MAX_USERS", "10000"))
+
+_result_cache = TTLCache(
+    max_entries=RECOMMENDATION_CACHE_MAX_ENTRIES,
+    ttl=RECOMMENDATION_CACHE_TTL,
+    max_bytes=RECOMMENDATION_CACHE_MAX_BYTES,
+    sizeof=lambda resp: len(resp.model_dump_json()),
+)
+_voice_keywords = TTLCache(max_entries=VOICE_KEYWORDS_MAX_USERS, ttl=VOICE_KEYWORDS_TTL)
+
+
+_RANKING_INSTRUCTIONS = """You are a food recommendation assistant. Given the user's preferences and a set of candidate dishes from today's menu (below), rank the best choices for this user and explain briefly why. Use the menu rows for ingredients, allergens and calories; never recommend a dish that is not a candidate.
+
+Return a JSON array of objects with 'item', 'score' (0-1), and 'reason'."""
+
+# (index, prefix): the static prompt prefix is rebuilt only when today's menu index changes
+_menu_context: tuple[MenuIndex, str] | None = None
+
+
+def _static_prefix(index: MenuIndex) -> str:
+    """Ranking instructions plus today's whole menu: identical for every request, so Gemini can cache it."""
+    global _menu_context
+    if _menu_context is None or _menu_context[0] is not index:
+        _menu_context = (index, build_menu_context(index.rows, instructions=_RANKING_INSTRUCTIONS))
+    return _menu_context[1]
 
 
 def _build_prompt(preferences: List[PreferenceRead], candidates: List[str], top_k: int) -> str:
@@ -24,40 +65,138 @@ def _build_prompt(preferences: List[PreferenceRead], candidates: List[str], top_
     cand_text = "\n".join(f"- {c}" for c in candidates)
 
     prompt = f"""
-You are a food recommendation assistant. Given the user's preferences and a set of candidate dishes, rank the top {top_k} best choices for this user and explain briefly why.
+Rank the top {top_k} best choices for this user.
 
 User preferences:
 {chr(10).join(prefs_text)}
 
 Candidates:
 {cand_text}
-
-Return a JSON array of objects with 'item', 'score' (0-1), and 'reason'.
 """
     return prompt
 
 
-def _call_gemini_sync(prompt: str) -> RecommendationResponse:
-    api_key = _get_gemini_key()
-    client = genai.Client(api_key=api_key)
-    # Use a simple schema -- we'll parse JSON in response.text
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
+async def _call_gemini(prompt: str, static_text: str) -> RecommendationResponse:
+    # Use a simple schema -- we'll parse JSON in response text
+    text = await context_cache.generate(
+        "recommendation",
+        static_text,
+        prompt,
         config=types.GenerateContentConfig(response_mime_type="application/json"),
     )
-    if not response or not response.text:
-        raise RuntimeError("Gemini returned empty response")
     # Try to parse JSON array
-    import json
-
-    data = json.loads(response.text)
+    data = json.loads(text)
     items = []
     for entry in data:
         items.append(RecommendationItem(item=entry.get("item"), score=float(entry.get("score", 0)), reason=entry.get("reason")))
     return RecommendationResponse(recommendations=items)
 
 
-async def recommend(preferences: List[PreferenceRead], candidates: List[str], top_k: int = 3) -> RecommendationResponse:
-    prompt = _build_prompt(preferences, candidates, top_k)
-    return await asyncio.to_thread(_call_gemini_sync, prompt)
+def _cache_key(
+    preferences: List[PreferenceRead],
+    candidates: List[str],
+    top_k: int,
+    mode: str,
+    keywords: Optional[List[str]],
+) -> str:
+    """Stable hash of everything that determines the ranking result."""
+    prefs = sorted(
+        {((p.preference_type or "").lower(), (p.value or "").strip().lower(), (p.category or "").lower()) for p in preferences}
+    )
+    payload = {
+        "p": prefs,
+        "c": sorted({c.strip().casefold() for c in candidates}),
+        "k": top_k,
+        "m": mode,
+        "w": sorted({k.strip().casefold() for k in keywords or []}),
+        "d": date.today().isoformat(),  # the menu (and so the safe set) changes daily
+    }
+    return hashlib.sha256(json.dumps(payload, separators=(",", ":")).encode()).hexdigest()
+
+
+def record_voice_keywords(user_id: str, keywords: List[str]) -> None:
+    """Remember keywords from a user's latest voice insights (most recent first)."""
+    fresh = [k.strip() for k in keywords if k and k.strip()]
+    if not fresh:
+        return
+    seen = set()
+    merged = []
+    for k in fresh + _voice_keywords.get(user_id, []):
+        if k.casefold() not in seen:
+            seen.add(k.casefold())
+            merged.append(k)
+    _voice_keywords.set(user_id, merged[:VOICE_KEYWORDS_PER_USER])
+
+
+def recent_voice_keywords(user_id: Optional[str]) -> List[str]:
+    return list(_voice_keywords.get(user_id, [])) if user_id else []
+
+
+def invalidate_user_recommendations(user_id: str) -> None:
+    """Drop cached results for a user whose preferences changed."""
+    _result_cache.invalidate_group(user_id)
+
+
+async def _menu_index() -> MenuIndex:
+    try:
+        return await get_today_index()
+    except Exception:
+        logger.warning("Menu index unavailable; pre-filtering candidates by name only", exc_info=True)
+        return MenuIndex([])
+
+
+@span("recommend")
+async def recommend(
+    preferences: List[PreferenceRead],
+    candidates: List[str],
+    top_k: int = 3,
+    mode: str = "gemini",
+    keywords: Optional[List[str]] = None,
+    user_id: Optional[str] = None,
+) -> RecommendationResponse:
+    # Client-supplied keywords add to the ones from the user's past voice insights
+    keywords = [*(keywords or []), *recent_voice_keywords(user_id)]
+    key = (user_id, _cache_key(preferences, candidates, top_k, mode, keywords))
+    cached = _result_cache.get(key)
+    if cached is not None:
+        RECOMMENDATION_CACHE_HITS.inc()
+        return cached.model_copy(deep=True)
+    RECOMMENDATION_CACHE_MISSES.inc()
+
+    resp = await _recommend_uncached(preferences, candidates, top_k, mode, keywords)
+    _result_cache.set(key, resp.model_copy(deep=True), group=user_id)
+    return resp
+
+
+async def _recommend_uncached(
+    preferences: List[PreferenceRead],
+    candidates: List[str],
+    top_k: int,
+    mode: str,
+    keywords: Optional[List[str]],
+) -> RecommendationResponse:
+    with span("menu_index"):
+        index = await _menu_index()
+    # Deterministically drop candidates that conflict with allergies, restrictions or dislikes
+    safe = index.filter_candidates(candidates, preferences)
+    if not safe:
+        return RecommendationResponse(recommendations=[])
+
+    menu_rows = {c.strip().lower(): row for c in safe if (row := index.row_for(c)) is not None}
+    if mode == "fast":
+        items = rank_candidates(safe, preferences, top_k=top_k, keywords=keywords or [], menu_rows=menu_rows)
+        return RecommendationResponse(recommendations=items)
+
+    if len(safe) > RECOMMENDATION_PRERANK_N:
+        # Only the locally best-scoring candidates are worth Gemini's time
+        preranked = rank_candidates(
+            safe, preferences, top_k=RECOMMENDATION_PRERANK_N, keywords=keywords or [], menu_rows=menu_rows
+        )
+        safe = [r.item for r in preranked]
+
+    prompt = _build_prompt(preferences, safe, top_k)
+    resp = await _call_gemini(prompt, _static_prefix(index))
+    # Never let the model reintroduce an item the filter removed
+    allowed = {c.strip().lower() for c in safe}
+    resp.recommendations = [r for r in resp.recommendations if (r.item or "").strip().lower() in allowed]
+    return resp
@@ -0,0 +1,318 @@
+"""
+Fire-and-forget archival of voice transcripts to Backboard memory.
+
+/voice/analyze submits each transcript to a bounded in-process queue and
+returns; a worker sends batches through the shared Backboard client (same
+size-or-interval batching as the preference write-behind). When the queue
+is full, or a batch fails or exceeds its deadline, the documents are
+appended to a local JSONL journal instead of being lost; journal writes run
+in a worker thread, never on the event loop. The journal is replayed on
+startup and periodically afterwards, so history in Backboard is eventually
+consistent with what users said.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from backboard import AsyncBackboardClient, get_backboard_client
+from metrics import (
+    TRANSCRIPT_ARCHIVE_BACKLOG,
+    TRANSCRIPT_ARCHIVE_DROPPED,
+    TRANSCRIPT_ARCHIVE_JOURNALED,
+    TRANSCRIPT_ARCHIVE_STORED,
+)
+from services.memory_index import memory_index
+
+logger = logging.getLogger(__name__)
+
+# Defaults to on whenever Backboard is configured
+TRANSCRIPT_ARCHIVE_ENABLED = os.getenv("TRANSCRIPT_ARCHIVE_ENABLED", "1" if os.getenv("BACKBOARD_API_KEY") else "0") == "1"
+TRANSCRIPT_ARCHIVE_QUEUE_MAX = int(os.getenv("TRANSCRIPT_ARCHIVE_QUEUE_MAX", "1000"))
+TRANSCRIPT_ARCHIVE_SPILL_MAX = int(os.getenv("TRANSCRIPT_ARCHIVE_SPILL_MAX", "10000"))  # awaiting a journal write
+TRANSCRIPT_ARCHIVE_BATCH_SIZE = int(os.getenv("TRANSCRIPT_ARCHIVE_BATCH_SIZE", "50"))
+TRANSCRIPT_ARCHIVE_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_ARCHIVE_FLUSH_INTERVAL", "1"))  # seconds
+TRANSCRIPT_ARCHIVE_SEND_TIMEOUT = float(os.getenv("TRANSCRIPT_ARCHIVE_SEND_TIMEOUT", "20"))  # per batch
+TRANSCRIPT_ARCHIVE_REPLAY_INTERVAL = float(os.getenv("TRANSCRIPT_ARCHIVE_REPLAY_INTERVAL", "60"))
+TRANSCRIPT_ARCHIVE_JOURNAL = os.getenv("TRANSCRIPT_ARCHIVE_JOURNAL", "./transcript_journal.jsonl")
+TRANSCRIPT_ARCHIVE_JOURNAL_MAX_BYTES = int(os.getenv("TRANSCRIPT_ARCHIVE_JOURNAL_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+class TranscriptJournal:
+    """Append-only JSONL file of documents that still need to reach Backboard."""
+
+    def __init__(self, path: str, max_bytes: int = TRANSCRIPT_ARCHIVE_JOURNAL_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        # Documents being replayed live here until they've been sent
+        self._replay_path = self.path.with_name(self.path.name + ".replay")
+        self._lock = threading.Lock()  # appends and takes run in worker threads
+        self.entries = sum(self._count(p) for p in (self.path, self._replay_path))
+
+    @staticmethod
+    def _count(path: Path) -> int:
+        try:
+            with open(path, "rb") as f:
+                return sum(1 for _ in f)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, documents: list[dict]) -> int:
+        """Append documents; returns how many fit under `max_bytes` (the rest are dropped)."""
+        with self._lock:
+            return self._append(documents)
+
+    def _append(self, documents: list[dict]) -> int:
+        size = self.path.stat().st_size if self.path.exists() else 0
+        lines = []
+        for doc in documents:
+            line = json.dumps(doc, separators=(",", ":")) + "\n"
+            if size + len(line) > self.max_bytes:
+                break
+            size += len(line)
+            lines.append(line)
+        if lines:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+            self.entries += len(lines)
+        return len(lines)
+
+    def take(self) -> list[dict]:
+        """
+        Move the journal aside and return its documents. They stay on disk in
+        the replay file until `commit_replay` (so a crash mid-replay loses nothing).
+        """
+        with self._lock:
+            if not self._replay_path.exists():
+                if not self.path.exists():
+                    return []
+                os.replace(self.path, self._replay_path)
+        documents = []
+        with open(self._replay_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    documents.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning("Skipping corrupt transcript journal line")
+        return documents
+
+    def commit_replay(self, total: int) -> None:
+        """Drop the replay file once its `total` documents were sent or re-journaled."""
+        self._replay_path.unlink(missing_ok=True)
+        self.entries -= total
+
+
+class TranscriptArchive:
+    """Bounded queue + batching worker that archives transcripts to Backboard."""
+
+    def __init__(
+        self,
+        client_factory=get_backboard_client,
+        journal: TranscriptJournal | None = None,
+        enabled: bool = TRANSCRIPT_ARCHIVE_ENABLED,
+        max_pending: int = TRANSCRIPT_ARCHIVE_QUEUE_MAX,
+        batch_size: int = TRANSCRIPT_ARCHIVE_BATCH_SIZE,
+        flush_interval: float = TRANSCRIPT_ARCHIVE_FLUSH_INTERVAL,
+        send_timeout: float = TRANSCRIPT_ARCHIVE_SEND_TIMEOUT,
+        replay_interval: float = TRANSCRIPT_ARCHIVE_REPLAY_INTERVAL,
+        max_spill: int = TRANSCRIPT_ARCHIVE_SPILL_MAX,
+    ):
+        self._client_factory = client_factory
+        self._journal = journal
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.send_timeout = send_timeout
+        self.replay_interval = replay_interval
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=max_pending)
+        self._batch_ready = asyncio.Event()
+        self._batch: list[dict] = []
+        self._tasks: list[asyncio.Task] = []
+        # Documents waiting for a journal write (submitted while the queue was full or the worker stopped)
+        self._overflow: list[dict] = []
+        self._overflow_max = max_spill
+        self._spill_task: asyncio.Task | None = None
+
+    @property
+    def journal(self) -> TranscriptJournal:
+        if self._journal is None:
+            self._journal = TranscriptJournal(TRANSCRIPT_ARCHIVE_JOURNAL)
+        return self._journal
+
+    @property
+    def backlog(self) -> int:
+        return self._queue.qsize() + len(self._batch) + len(self._overflow) + self.journal.entries
+
+    def _publish(self) -> None:
+        TRANSCRIPT_ARCHIVE_BACKLOG.set(self.backlog)
+
+    def _spill(self, documents: list[dict]) -> None:
+        """Append to the journal (blocking file I/O: call from a worker thread)."""
+        try:
+            written = self.journal.append(documents)
+        except OSError:
+            logger.exception("Could not write transcript journal")
+            written = 0
+        TRANSCRIPT_ARCHIVE_JOURNALED.inc(written)
+        if written < len(documents):
+            TRANSCRIPT_ARCHIVE_DROPPED.inc(len(documents) - written)
+            logger.warning("Dropped %d transcripts (journal full or unwritable)", len(documents) - written)
+
+    async def _spill_async(self, documents: list[dict]) -> None:
+        await asyncio.to_thread(self._spill, documents)
+
+    def _spill_soon(self, doc: dict) -> None:
+        """Hand a document to the background journal writer without blocking the caller."""
+        if len(self._overflow) >= self._overflow_max:
+            TRANSCRIPT_ARCHIVE_DROPPED.inc()
+            logger.warning("Dropped a transcript (journal writer backlog full)")
+            return
+        self._overflow.append(doc)
+        if self._spill_task is None or self._spill_task.done():
+            self._spill_task = asyncio.create_task(self._write_overflow())
+
+    async def _write_overflow(self) -> None:
+        while self._overflow:
+            documents, self._overflow = self._overflow, []
+            await self._spill_async(documents)
+            self._publish()
+
+    def submit(self, user_id: str, transcript: str, metadata: dict | None = None) -> None:
+        """Queue a transcript for archival; never blocks on the network."""
+        doc = {
+            "text": transcript,
+            "metadata": {
+                "user_id": user_id,
+                # Lets Backboard-side consumers drop replayed duplicates, and
+                # retrieve_messages match local hits with Backboard's
+                "archive_id": uuid.uuid4().hex,
+                "recorded_at": time.time(),
+                **(metadata or {}),
+            },
+        }
+        memory_index.add(user_id, transcript, doc["metadata"])
+        if not self.enabled:
+            return
+        if not self._tasks:
+            self._spill_soon(doc)  # not running (startup/shutdown): keep it for the next replay
+        else:
+            try:
+                self._queue.put_nowait(doc)
+            except asyncio.QueueFull:
+                self._spill_soon(doc)
+            else:
+                if self._queue.qsize() + 1 >= self.batch_size:
+                    self._batch_ready.set()
+        self._publish()
+
+    async def _send(self, documents: list[dict]) -> bool:
+        client: AsyncBackboardClient = self._client_factory()
+        try:
+            await asyncio.wait_for(client.store_documents(documents), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Archiving %d transcripts failed; journaling them", len(documents), exc_info=True)
+            return False
+        TRANSCRIPT_ARCHIVE_STORED.inc(len(documents))
+        return True
+
+    async def _collect(self) -> None:
+        """Fill `self._batch` by the size or time threshold (as in PreferenceWriteBehind)."""
+        self._batch.append(await self._queue.get())
+        if self._queue.qsize() + 1 < self.batch_size:
+            self._batch_ready.clear()
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+        while len(self._batch) < self.batch_size:
+            try:
+                self._batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+    async def _run_sender(self) -> None:
+        while True:
+            await self._collect()
+            if not await self._send(self._batch):
+                await self._spill_async(self._batch)
+            self._batch = []
+            self._publish()
+
+    async def replay(self) -> None:
+        """Send journaled transcripts; anything that still fails goes back into the journal."""
+        documents = await asyncio.to_thread(self.journal.take)
+        if not documents:
+            return
+        sent = 0
+        for i in range(0, len(documents), self.batch_size):
+            chunk = documents[i:i + self.batch_size]
+            if not await self._send(chunk):
+                break
+            sent += len(chunk)
+        if sent < len(documents):
+            await self._spill_async(documents[sent:])
+        else:
+            logger.info("Replayed %d journaled transcripts", sent)
+        self.journal.commit_replay(len(documents))
+        self._publish()
+
+    async def _run_replayer(self) -> None:
+        while True:
+            try:
+                await self.replay()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Transcript journal replay failed")
+            await asyncio.sleep(self.replay_interval)
+
+    def start(self) -> None:
+        if self.enabled and not self._tasks:
+            self.journal  # open (and count) the journal here rather than in a spill thread
+            self._tasks = [
+                asyncio.create_task(self._run_sender()),
+                asyncio.create_task(self._run_replayer()),
+            ]
+            self._publish()
+
+    async def stop(self) -> None:
+        """Stop the worker and journal everything not yet sent."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        pending, self._batch = self._batch, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        if self._spill_task is not None:
+            await self._spill_task
+            self._spill_task = None
+        pending.extend(self._overflow)
+        self._overflow = []
+        if pending:
+            await self._spill_async(pending)
+            logger.info("Journaled %d unsent transcripts at shutdown", len(pending))
+        self._publish()
+
+
+transcript_archive = TranscriptArchive()
+
+
+async def start_transcript_archive() -> None:
+    transcript_archive.start()
+
+
+async def stop_transcript_archive() -> None:
+    await transcript_archive.stop()
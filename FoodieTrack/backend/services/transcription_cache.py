@@ -0,0 +1,191 @@
+"""
+Content-addressed cache of ElevenLabs transcriptions.
+
+Keyed by sha256(audio bytes) plus the STT model id, so retries and
+double-submits of identical audio skip the upstream request. A bounded
+in-memory tier sits in front of an optional on-disk tier
+(TRANSCRIPTION_CACHE_DIR) that survives restarts. Disk entries carry their
+write time and expire after the same TTL; the directory is pruned to
+TRANSCRIPTION_CACHE_DISK_MAX_BYTES (oldest first) every few hundred writes,
+in a background task so no request waits on the directory scan.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from metrics import (
+    TRANSCRIPTION_CACHE_HITS,
+    TRANSCRIPTION_CACHE_MISSES,
+    TRANSCRIPTION_CACHE_BYTES_SAVED,
+    TRANSCRIPTION_CACHE_HIT_RATIO,
+)
+from utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSCRIPTION_CACHE_MAX_ENTRIES", "4096"))
+TRANSCRIPTION_CACHE_TTL = float(os.getenv("TRANSCRIPTION_CACHE_TTL", str(7 * 24 * 3600)))
+TRANSCRIPTION_CACHE_DIR = os.getenv("TRANSCRIPTION_CACHE_DIR", "")  # empty disables the disk tier
+TRANSCRIPTION_CACHE_DISK_MAX_BYTES = int(os.getenv("TRANSCRIPTION_CACHE_DISK_MAX_BYTES", str(64 * 1024 * 1024)))
+TRANSCRIPTION_CACHE_PRUNE_EVERY = int(os.getenv("TRANSCRIPTION_CACHE_PRUNE_EVERY", "256"))  # disk writes between prunes
+
+
+def cache_key(audio_digest: str, model_id: str) -> str:
+    return hashlib.sha256(f"{model_id}:{audio_digest}".encode()).hexdigest()
+
+
+class TranscriptionCache:
+    """Memory tier (LRU + TTL) backed by an optional directory of JSON files."""
+
+    def __init__(
+        self,
+        max_entries: int = TRANSCRIPTION_CACHE_MAX_ENTRIES,
+        ttl: float = TRANSCRIPTION_CACHE_TTL,
+        directory: str = TRANSCRIPTION_CACHE_DIR,
+        disk_max_bytes: int = TRANSCRIPTION_CACHE_DISK_MAX_BYTES,
+        prune_every: int = TRANSCRIPTION_CACHE_PRUNE_EVERY,
+    ):
+        self.ttl = ttl
+        self.disk_max_bytes = disk_max_bytes
+        self.prune_every = prune_every
+        self._memory = TTLCache(max_entries=max_entries, ttl=ttl)
+        self._dir = Path(directory) if directory else None
+        if self._dir is not None:
+            self._dir.mkdir(parents=True, exist_ok=True)
+        self._hits = 0
+        self._lookups = 0
+        # First write prunes whatever a previous process left behind
+        self._writes_since_prune = prune_every
+        self._prune_lock = threading.Lock()
+        self._prune_task: asyncio.Task | None = None
+
+    def _path(self, key: str) -> Path:
+        return self._dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> tuple[tuple[str, str | None], float] | None:
+        """(value, seconds left to live), deleting the entry if it has expired."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            remaining = data.get("stored_at", 0) + self.ttl - time.time()
+            if remaining <= 0:
+                path.unlink(missing_ok=True)
+                return None
+            return (data["transcript"], data.get("language_code")), remaining
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.warning("Unreadable transcription cache entry %s", key, exc_info=True)
+            return None
+
+    def _write_disk(self, key: str, value: tuple[str, str | None]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Unique temp name: concurrent writers of the same key don't share a file
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=path.parent, prefix=f".{key[:16]}-", suffix=".tmp", delete=False
+        ) as f:
+            json.dump({"transcript": value[0], "language_code": value[1], "stored_at": time.time()}, f)
+        try:
+            os.replace(f.name, path)  # atomic, so readers never see a partial file
+        except OSError:
+            os.unlink(f.name)
+            raise
+
+    def prune(self) -> int:
+        """Delete expired entries and stale temp files, then the oldest entries over the size cap; returns files removed."""
+        if self._dir is None or not self._prune_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.time()
+            entries = []  # (mtime, size, path)
+            removed = 0
+            for shard in os.scandir(self._dir):
+                if not shard.is_dir():
+                    continue
+                for entry in os.scandir(shard.path):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    stale_tmp = entry.name.endswith(".tmp") and st.st_mtime < now - 3600
+                    if stale_tmp or st.st_mtime + self.ttl < now:
+                        Path(entry.path).unlink(missing_ok=True)
+                        removed += 1
+                    elif entry.name.endswith(".json"):
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            if total > self.disk_max_bytes:
+                entries.sort()
+                target = self.disk_max_bytes * 0.9  # headroom so the next prune isn't immediate
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    Path(path).unlink(missing_ok=True)
+                    total -= size
+                    removed += 1
+            if removed:
+                logger.info("Pruned %d transcription cache files", removed)
+            return removed
+        finally:
+            self._prune_lock.release()
+
+    def _record(self, hit: bool, audio_size: int) -> None:
+        self._lookups += 1
+        if hit:
+            self._hits += 1
+            TRANSCRIPTION_CACHE_HITS.inc()
+            TRANSCRIPTION_CACHE_BYTES_SAVED.inc(audio_size)
+        else:
+            TRANSCRIPTION_CACHE_MISSES.inc()
+        TRANSCRIPTION_CACHE_HIT_RATIO.set(self._hits / self._lookups)
+
+    async def get(self, key: str, audio_size: int = 0) -> tuple[str, str | None] | None:
+        value = self._memory.get(key)
+        if value is None and self._dir is not None:
+            found = await asyncio.to_thread(self._read_disk, key)
+            if found is not None:
+                value, remaining = found
+                self._memory.set(key, value, ttl=remaining)
+        self._record(value is not None, audio_size)
+        return value
+
+    async def set(self, key: str, value: tuple[str, str | None]) -> None:
+        self._memory.set(key, value)
+        if self._dir is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, key, value)
+            except Exception:
+                logger.warning("Failed to persist transcription cache entry", exc_info=True)
+                return
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= self.prune_every and (self._prune_task is None or self._prune_task.done()):
+                self._writes_since_prune = 0
+                self._prune_task = asyncio.create_task(self._prune_in_background())
+
+    async def _prune_in_background(self) -> None:
+        try:
+            await asyncio.to_thread(self.prune)
+        except Exception:
+            logger.warning("Pruning the transcription cache failed", exc_info=True)
+
+    async def close(self) -> None:
+        """Wait for a running prune (it holds no request, but shouldn't be cut off at shutdown)."""
+        if self._prune_task is not None:
+            await self._prune_task
+            self._prune_task = None
+
+
+transcription_cache = TranscriptionCache()
+
+
+async def stop_transcription_cache() -> None:
+    await transcription_cache.close()
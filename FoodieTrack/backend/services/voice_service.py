@@ -4,14 +4,39 @@ Voice analysis service: ElevenLabs Speech-to-Text + Gemini for insights.
 Handles transcription, streaming, and exceptions when calling external APIs.
 """
 
-import asyncio
+import hashlib
+import logging
 import os
+import re
+import unicodedata
 
 import httpx
-from google import genai
 from google.genai import types
 
+from metrics import (
+    ELEVENLABS_POOL_CONNECTIONS,
+    ELEVENLABS_POOL_IDLE,
+    INSIGHTS_CACHE_HITS,
+    INSIGHTS_CACHE_MISSES,
+)
 from schemas.voice import VoiceInsights
+from services.audio_stream import AsyncReadable, BytesSource, StreamingMultipart
+from services.gemini_client import GeminiNotConfiguredError
+from services.gemini_context_cache import context_cache
+from services.transcription_cache import cache_key, transcription_cache
+from utils.instrumentation import track
+from utils.single_flight import SingleFlight
+from utils.tracing import span
+from utils.ttl_cache import TTLCache
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
 
 
 # --- Custom Exceptions ---
@@ -51,6 +76,76 @@ ALLOWED_AUDIO_TYPES = {
 }
 MAX_FILE_SIZE_BYTES = 25 * 1024 * 1024  # 25 MB
 
+# Shared ElevenLabs HTTP client – override via env
+ELEVENLABS_MAX_CONNECTIONS = int(os.getenv("ELEVENLABS_MAX_CONNECTIONS", "20"))
+ELEVENLABS_MAX_KEEPALIVE = int(os.getenv("ELEVENLABS_MAX_KEEPALIVE", "10"))
+ELEVENLABS_KEEPALIVE_EXPIRY = float(os.getenv("ELEVENLABS_KEEPALIVE_EXPIRY", "60"))
+ELEVENLABS_CONNECT_TIMEOUT = float(os.getenv("ELEVENLABS_CONNECT_TIMEOUT", "5"))
+ELEVENLABS_READ_TIMEOUT = float(os.getenv("ELEVENLABS_READ_TIMEOUT", "60"))
+ELEVENLABS_WRITE_TIMEOUT = float(os.getenv("ELEVENLABS_WRITE_TIMEOUT", "30"))
+ELEVENLABS_POOL_TIMEOUT = float(os.getenv("ELEVENLABS_POOL_TIMEOUT", "10"))
+
+# Gemini insights cache (keyed on normalized transcript)
+INSIGHTS_CACHE_MAX_ENTRIES = int(os.getenv("INSIGHTS_CACHE_MAX_ENTRIES", "4096"))
+INSIGHTS_CACHE_TTL = float(os.getenv("INSIGHTS_CACHE_TTL", "3600"))
+
+
+# --- Shared HTTP client ---
+
+_http_client: httpx.AsyncClient | None = None
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=_HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=ELEVENLABS_MAX_CONNECTIONS,
+            max_keepalive_connections=ELEVENLABS_MAX_KEEPALIVE,
+            keepalive_expiry=ELEVENLABS_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=ELEVENLABS_CONNECT_TIMEOUT,
+            read=ELEVENLABS_READ_TIMEOUT,
+            write=ELEVENLABS_WRITE_TIMEOUT,
+            pool=ELEVENLABS_POOL_TIMEOUT,
+        ),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Keep-alive client shared by every ElevenLabs request."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+
+async def start_http_client() -> None:
+    get_http_client()
+    if not _HTTP2_AVAILABLE:
+        logger.info("h2 not installed; ElevenLabs client will use HTTP/1.1")
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def http_pool_stats() -> dict:
+    """Best-effort connection pool stats for the shared client."""
+    client = _http_client
+    if client is None or client.is_closed:
+        return {"open": False, "connections": 0, "idle": 0, "http2": _HTTP2_AVAILABLE}
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for c in connections if getattr(c, "is_idle", lambda: False)())
+    stats = {"open": True, "connections": len(connections), "idle": idle, "http2": _HTTP2_AVAILABLE}
+    ELEVENLABS_POOL_CONNECTIONS.set(stats["connections"])
+    ELEVENLABS_POOL_IDLE.set(stats["idle"])
+    return stats
+
 
 # --- Service ---
 
@@ -62,35 +157,58 @@ def _get_elevenlabs_key() -> str:
     return key
 
 
-def _get_gemini_key() -> str:
-    key = os.getenv("GEMINI_API_KEY", "").strip()
-    if not key:
-        raise VoiceServiceError("GEMINI_API_KEY is not configured")
-    return key
-
-
-async def transcribe_audio(audio_bytes: bytes, content_type: str) -> tuple[str, str | None]:
+async def transcribe_audio(
+    audio: bytes | AsyncReadable,
+    content_type: str,
+    size: int | None = None,
+    digest: str | None = None,
+) -> tuple[str, str | None]:
     """
     Send audio to ElevenLabs Speech-to-Text.
+    `audio` is either bytes or an async readable (e.g. an UploadFile) of
+    `size` bytes, which is streamed without being buffered in memory.
+    When the sha256 `digest` of the content is known, identical audio is
+    answered from the transcription cache.
     Returns (transcript, language_code).
     """
     api_key = _get_elevenlabs_key()
 
-    files = {"file": ("audio.webm", audio_bytes, content_type)}
-    data = {"model_id": ELEVENLABS_MODEL}
+    if isinstance(audio, (bytes, bytearray)):
+        size = len(audio)
+        digest = digest or hashlib.sha256(audio).hexdigest()
+        audio = BytesSource(bytes(audio))
+    if size is None:
+        raise ValueError("size is required when streaming audio")
+
+    key = cache_key(digest, ELEVENLABS_MODEL) if digest else None
+    if key is not None:
+        cached = await transcription_cache.get(key, audio_size=size)
+        if cached is not None:
+            return cached
+    body = StreamingMultipart(
+        fields={"model_id": ELEVENLABS_MODEL},
+        file_field="file",
+        filename="audio.webm",
+        content_type=content_type,
+        source=audio,
+        size=size,
+    )
 
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
+        async with track("elevenlabs", "speech_to_text") as call:
+            response = await get_http_client().post(
                 ELEVENLABS_STT_URL,
-                headers={"xi-api-key": api_key, "Accept": "application/json"},
-                files=files,
-                data=data,
+                headers={"xi-api-key": api_key, "Accept": "application/json", **body.headers},
+                content=body,
             )
+            if response.is_error:
+                call.outcome = "error"
     except httpx.TimeoutException as e:
         raise TranscriptionError("ElevenLabs request timed out") from e
     except httpx.RequestError as e:
         raise TranscriptionError(f"ElevenLabs request failed: {e}") from e
+    finally:
+        http_pool_stats()
 
     if response.status_code == 401:
         raise TranscriptionError("Invalid ElevenLabs API key")
@@ -110,11 +228,13 @@ async def transcribe_audio(audio_bytes: bytes, content_type: str) -> tuple[str,
     text = body.get("text", "").strip()
     language_code = body.get("language_code")
 
+    if key is not None:
+        await transcription_cache.set(key, (text, language_code))
     return text, language_code
 
 
-def _build_gemini_prompt(transcript: str) -> str:
-    return f"""Analyze the following transcribed speech from a food/restaurant context.
+# Static part of the insights prompt; sent as a system instruction (cached server-side when large enough)
+_INSIGHTS_INSTRUCTIONS = """Analyze the transcribed speech from a food/restaurant context given by the user.
 Return structured insights:
 - sentiment: overall polarity (positive / neutral / negative).
 - emotion: the primary emotion the user seems to express. Pick exactly one from: happy, sad, neutral, excited, frustrated, anxious, calm, disappointed, satisfied, confused, grateful, stressed, curious.
@@ -122,36 +242,70 @@ Return structured insights:
 - keywords: important terms (dishes, ingredients, dietary restrictions, emotion-related words).
 - summary: optional brief summary if the transcript is long or nuanced.
 
-Transcript:
+Focus on food-related intents and how the user seems to feel (tone, word choice, context). Use the emotion field to capture whether they sound sad, happy, frustrated, calm, etc."""
+
+
+def _build_transcript_prompt(transcript: str) -> str:
+    return f"""Transcript:
 ---
 {transcript}
----
+---"""
 
-Focus on food-related intents and how the user seems to feel (tone, word choice, context). Use the emotion field to capture whether they sound sad, happy, frustrated, calm, etc."""
 
+def _build_gemini_prompt(transcript: str) -> str:
+    return f"{_INSIGHTS_INSTRUCTIONS}\n\n{_build_transcript_prompt(transcript)}"
 
-def _call_gemini_sync(transcript: str) -> VoiceInsights:
-    """Synchronous Gemini call (runs in thread pool)."""
-    api_key = _get_gemini_key()
-    client = genai.Client(api_key=api_key)
-    prompt = _build_gemini_prompt(transcript)
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            response_mime_type="application/json",
-            response_schema=VoiceInsights.model_json_schema(),
-        ),
+
+_INSIGHTS_CONFIG = types.GenerateContentConfig(
+    response_mime_type="application/json",
+    response_schema=VoiceInsights.model_json_schema(),
+)
+
+
+# Changing the prompt template changes this version and so invalidates old entries
+_PROMPT_VERSION = hashlib.sha256(_build_gemini_prompt("\x00").encode()).hexdigest()[:16]
+_WHITESPACE_RE = re.compile(r"\s+")
+
+_insights_cache = TTLCache(max_entries=INSIGHTS_CACHE_MAX_ENTRIES, ttl=INSIGHTS_CACHE_TTL)
+_insights_flights = SingleFlight()
+
+
+def _normalize_transcript(transcript: str) -> str:
+    """Case-fold, strip punctuation and collapse whitespace."""
+    folded = transcript.casefold()
+    stripped = "".join(ch for ch in folded if not unicodedata.category(ch).startswith("P"))
+    return _WHITESPACE_RE.sub(" ", stripped).strip()
+
+
+async def _call_gemini(transcript: str) -> VoiceInsights:
+    """Gemini call through the shared async gateway."""
+    text = await context_cache.generate(
+        "voice-insights", _INSIGHTS_INSTRUCTIONS, _build_transcript_prompt(transcript), config=_INSIGHTS_CONFIG
     )
-    if not response or not response.text:
-        raise AnalysisError("Gemini returned empty response")
-    return VoiceInsights.model_validate_json(response.text)
+    return VoiceInsights.model_validate_json(text)
 
 
 async def analyze_with_gemini(transcript: str) -> VoiceInsights:
     """Send transcript to Gemini for sentiment, intent, and keyword extraction."""
+    key = (_PROMPT_VERSION, _normalize_transcript(transcript))
     try:
-        return await asyncio.to_thread(_call_gemini_sync, transcript)
+        insights = _insights_cache.get(key)
+        if insights is not None:
+            INSIGHTS_CACHE_HITS.inc()
+        else:
+            INSIGHTS_CACHE_MISSES.inc()
+
+            async def _fetch() -> VoiceInsights:
+                result = await _call_gemini(transcript)
+                _insights_cache.set(key, result)
+                return result
+
+            insights = await _insights_flights.do(key, _fetch)
+        # Cached insights may come from someone else's wording of the same utterance
+        return insights.model_copy(update={"transcript": transcript})
+    except GeminiNotConfiguredError as e:
+        # Configuration problem, not an upstream failure: 503 like the other missing keys
+        raise VoiceServiceError(str(e)) from e
     except Exception as e:
         if isinstance(e, AnalysisError):
             raise
@@ -159,15 +313,18 @@ async def analyze_with_gemini(transcript: str) -> VoiceInsights:
 
 
 async def process_voice(
-    audio_bytes: bytes,
+    audio: bytes | AsyncReadable,
     content_type: str,
     use_gemini: bool = True,
+    size: int | None = None,
+    digest: str | None = None,
 ) -> dict:
     """
     Full pipeline: transcribe with ElevenLabs, optionally analyze with Gemini.
     Returns a dict suitable for VoiceAnalysisResponse.
     """
-    transcript, language_code = await transcribe_audio(audio_bytes, content_type)
+    with span("stt"):
+        transcript, language_code = await transcribe_audio(audio, content_type, size=size, digest=digest)
 
     if not transcript:
         return {
@@ -191,7 +348,8 @@ async def process_voice(
             "language_code": language_code,
         }
 
-    insights = await analyze_with_gemini(transcript)
+    with span("insights"):
+        insights = await analyze_with_gemini(transcript)
 
     return {
         "transcript": insights.transcript,
@@ -204,9 +362,9 @@ async def process_voice(
     }
 
 
-def validate_audio_input(content_type: str | None, file_size: int) -> None:
+def validate_audio_type(content_type: str | None) -> None:
     """
-    Validate incoming audio before processing.
+    Validate the declared Content-Type before any bytes are read.
     Raises ValueError with a descriptive message if invalid.
     """
     if not content_type:
@@ -219,6 +377,14 @@ def validate_audio_input(content_type: str | None, file_size: int) -> None:
             f"Allowed: {', '.join(sorted(ALLOWED_AUDIO_TYPES))}"
         )
 
+
+def validate_audio_input(content_type: str | None, file_size: int) -> None:
+    """
+    Validate incoming audio before processing.
+    Raises ValueError with a descriptive message if invalid.
+    """
+    validate_audio_type(content_type)
+
     if file_size <= 0:
         raise ValueError("Audio file is empty")
     if file_size > MAX_FILE_SIZE_BYTES:
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from .backboard import store_message
+from backboard import get_backboard_batcher
+from services.memory_index import memory_index
 
 router = APIRouter()
 
@@ -10,8 +11,10 @@ class TranscriptPayload(BaseModel):
     metadata: dict = {}
 
 @router.post("/store-transcript")
-def store_transcript(payload: TranscriptPayload):
-    return store_message(
+async def store_transcript(payload: TranscriptPayload):
+    memory_index.add(payload.user_id, payload.text, payload.metadata)
+    # Concurrent writes are coalesced into batched /documents calls on the shared client
+    return await get_backboard_batcher().store_message(
         user_id=payload.user_id,
         text=payload.text,
         metadata=payload.metadata
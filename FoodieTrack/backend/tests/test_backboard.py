@@ -0,0 +1,101 @@
+"""
+Tests for batched document writes in backboard.AsyncBackboardClient, against
+the in-process stand-in.
+
+Usage:
+  cd backend
+  python -m pytest tests
+  python tests/test_backboard.py   # without pytest
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+from backboard import AsyncBackboardClient, BackboardBatcher, BackboardError  # noqa: E402
+from backboard_standin import create_app  # noqa: E402
+
+
+def _client(app, batch_path: str = "/documents/batch") -> AsyncBackboardClient:
+    return AsyncBackboardClient(
+        base_url="http://backboard.local", api_key="test", batch_path=batch_path, transport=httpx.ASGITransport(app=app)
+    )
+
+
+def _documents(n: int) -> list[dict]:
+    return [{"text": f"transcript {i}", "metadata": {"user_id": f"user{i}"}} for i in range(n)]
+
+
+def test_batching_is_opt_in():
+    app = create_app()
+    client = _client(app, batch_path="")
+    results = asyncio.run(client.store_documents(_documents(3)))
+    assert len(results) == 3
+    assert app.state.calls["batch"] == 0 and app.state.calls["documents"] == 3
+
+
+def test_any_4xx_from_the_first_batch_call_falls_back_to_single_writes():
+    app = create_app(batch=False)
+
+    @app.post("/v2/documents:batch")
+    async def unknown(request: Request):
+        return JSONResponse({"error": "unknown field documents"}, status_code=422)
+
+    client = _client(app, batch_path="/v2/documents:batch")
+
+    async def scenario():
+        first = await client.store_documents(_documents(2))
+        second = await client.store_documents(_documents(2))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(first) == len(second) == 2
+    assert app.state.calls["documents"] == 4
+    assert len(app.state.documents) == 4
+
+
+def test_mismatched_batch_results_raise_instead_of_leaking():
+    app = FastAPI()
+
+    @app.post("/documents/batch")
+    async def batch(request: Request):
+        body = await request.json()
+        return {"results": [{"id": "doc_1"}], "received": len(body["documents"])}
+
+    batcher = BackboardBatcher(_client(app), window=0.01)
+
+    async def scenario():
+        return await asyncio.gather(
+            *(batcher.store_message(f"user{i}", f"transcript {i}") for i in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(r, BackboardError) for r in results)
+
+
+def test_batch_results_are_returned_per_document():
+    app = create_app()
+    batcher = BackboardBatcher(_client(app), window=0.01)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.store_message(f"user{i}", f"transcript {i}") for i in range(3)))
+
+    results = asyncio.run(scenario())
+    stored = {d["id"]: d["metadata"]["user_id"] for d in app.state.documents}
+    assert [stored[r["id"]] for r in results] == ["user0", "user1", "user2"]
+    assert app.state.calls["batch"] == 1
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
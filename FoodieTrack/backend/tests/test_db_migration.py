@@ -0,0 +1,82 @@
+"""
+Tests for the startup migration that adds the preference uniqueness key
+(db._upgrade_schema / db._dedupe_preferences).
+
+Usage:
+  cd backend
+  python -m pytest tests
+  python tests/test_db_migration.py   # without pytest
+"""
+
+import logging
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, select, text
+from sqlmodel import SQLModel
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+import db  # noqa: E402
+from models.preference import Preference  # noqa: E402
+
+T0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _row(pref_id: int, value: str, updated: int, category: str = "food", meta: dict | None = None) -> dict:
+    return {
+        "id": pref_id,
+        "user_id": "u1",
+        "category": category,
+        "preference_type": "dislike",
+        "value": value,
+        "metadata": meta,
+        "created_at": T0 + timedelta(days=pref_id),
+        "updated_at": T0 + timedelta(days=updated),
+    }
+
+
+def test_dedupe_keeps_the_most_recently_updated_row_and_merges_meta():
+    table = Preference.__table__
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    db.logger.addHandler(handler)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{tmp}/old.db")
+            with engine.begin() as conn:
+                SQLModel.metadata.create_all(conn)
+                # A database from before the uniqueness key existed
+                conn.execute(text("DROP INDEX uq_preference_user_type_value"))
+                conn.execute(insert(table), [
+                    _row(1, "Olives", updated=1, meta={"source": "manual", "note": "old"}),
+                    _row(2, "olives", updated=9, category="snack", meta={"source": "voice"}),
+                    _row(3, "OLIVES", updated=5),
+                    _row(4, "cilantro", updated=2),
+                ])
+            with engine.begin() as conn:
+                db._upgrade_schema(conn)
+            with engine.connect() as conn:
+                rows = conn.execute(select(table).order_by(table.c.id)).all()
+            engine.dispose()
+    finally:
+        db.logger.removeHandler(handler)
+
+    assert [r.id for r in rows] == [2, 4]
+    kept = rows[0]._mapping
+    assert kept["category"] == "snack" and kept["value"] == "olives"
+    assert kept["metadata"] == {"source": "voice", "note": "old"}
+    assert kept["created_at"] == T0 + timedelta(days=1)
+    warnings = [r for r in records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1 and "{2: [1, 3]}" in warnings[0].getMessage()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
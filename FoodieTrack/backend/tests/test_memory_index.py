@@ -0,0 +1,83 @@
+"""
+Tests for services.memory_index retrieval merged with Backboard history.
+
+Usage:
+  cd backend
+  python -m pytest tests
+  python tests/test_memory_index.py   # without pytest
+"""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services import memory_index as memory_module  # noqa: E402
+from services import transcript_archive as archive_module  # noqa: E402
+from services.memory_index import MemoryIndex, _merge, retrieve_messages  # noqa: E402
+from services.transcript_archive import TranscriptArchive, TranscriptJournal  # noqa: E402
+
+
+class FakeBackboard:
+    """Search over the documents the archive sent (or journaled)."""
+
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+
+    async def retrieve_messages(self, query: str, user_id: str, top_k: int = 10) -> list[dict]:
+        words = set(query.lower().split())
+        return [
+            d for d in self.documents
+            if d["metadata"]["user_id"] == user_id and words & set(d["text"].lower().split())
+        ][:top_k]
+
+
+def test_archived_transcript_is_returned_once():
+    index = MemoryIndex()
+    saved = (archive_module.memory_index, memory_module.memory_index, memory_module.get_backboard_client)
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = TranscriptJournal(str(Path(tmp) / "journal.jsonl"))
+        archive = TranscriptArchive(journal=journal, enabled=True)
+        archive_module.memory_index = memory_module.memory_index = index
+
+        async def scenario():
+            archive.submit("u1", "I am vegan and hate mushrooms", {"source": "voice"})
+            await archive.stop()  # not started: the document goes to the journal
+            backboard = FakeBackboard(journal.take())
+            memory_module.get_backboard_client = lambda: backboard
+            return await retrieve_messages("vegan mushrooms", "u1", top_k=5)
+
+        try:
+            results = asyncio.run(scenario())
+        finally:
+            archive_module.memory_index, memory_module.memory_index, memory_module.get_backboard_client = saved
+
+    assert [r["text"] for r in results] == ["I am vegan and hate mushrooms"]
+    assert results[0]["metadata"]["archive_id"]
+    assert results[0]["metadata"]["source"] == "voice"
+
+
+def test_merge_falls_back_to_normalised_text():
+    local = [{"text": "I am vegan  and hate mushrooms", "metadata": {}}]
+    remote = [
+        {"text": "i am vegan and hate mushrooms", "metadata": {"archive_id": "a1"}},
+        {"text": "pad thai was great", "metadata": {"archive_id": "a2"}},
+        {"text": "Pad thai was great", "metadata": {"archive_id": "a2"}},
+    ]
+    assert [r["text"] for r in _merge(local, remote, 10)] == ["I am vegan  and hate mushrooms", "pad thai was great"]
+
+
+def test_merge_keeps_distinct_documents_interleaved():
+    local = [{"text": f"local {i}", "metadata": {}} for i in range(3)]
+    remote = [{"text": f"remote {i}", "metadata": {"archive_id": str(i)}} for i in range(3)]
+    assert [r["text"] for r in _merge(local, remote, 4)] == ["local 0", "remote 0", "local 1", "remote 1"]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,86 @@
+"""
+Tests for re-syncing days Snowflake had no menu for (services.menu_snapshot,
+services.menu_cache).
+
+Usage:
+  cd backend
+  python -m pytest tests
+  python tests/test_menu_snapshot.py   # without pytest
+"""
+
+import asyncio
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.menu_cache import MenuCache  # noqa: E402
+from services.menu_snapshot import MenuSnapshot  # noqa: E402
+
+DAY = date(2026, 2, 10)
+ROW = {"DAY": "2026-02-10", "RESIDENCE": "V1", "MEAL_TYPE": "lunch", "ITEM_NAME": "Tofu bowl", "TAGS": '["vegan"]'}
+
+
+class Upstream:
+    """Snowflake stand-in whose menu for DAY appears after the first fetch."""
+
+    def __init__(self, results: list[list[dict]]):
+        self.results = results
+        self.calls = 0
+
+    def __call__(self, day: date) -> list[dict]:
+        self.calls += 1
+        return self.results[min(self.calls, len(self.results)) - 1]
+
+
+def test_empty_snowflake_day_is_synced_again_after_retry_window():
+    upstream = Upstream([[], [ROW]])
+    snapshot = MenuSnapshot(":memory:", empty_retry=0)
+    assert snapshot.sync([DAY], fetch=upstream) == 0
+    assert not snapshot.has_day(DAY)
+    assert snapshot.sync([DAY], fetch=upstream) == 1
+    assert upstream.calls == 2
+    assert [r["item_name"] for r in snapshot.read_day(DAY)] == ["Tofu bowl"]
+    # A day with rows stays synced
+    snapshot.sync([DAY], fetch=upstream)
+    assert upstream.calls == 2
+
+
+def test_empty_snowflake_day_is_not_refetched_within_retry_window():
+    upstream = Upstream([[], [ROW]])
+    snapshot = MenuSnapshot(":memory:", empty_retry=300)
+    snapshot.sync([DAY], fetch=upstream)
+    snapshot.sync([DAY], fetch=upstream)
+    assert upstream.calls == 1
+    assert snapshot.has_day(DAY)
+
+
+def test_empty_seed_day_counts_as_synced():
+    snapshot = MenuSnapshot(":memory:", empty_retry=0)
+    snapshot.write_day(DAY, [], source="seed")
+    assert snapshot.has_day(DAY)
+
+
+def test_menu_cache_does_not_hold_an_empty_day():
+    upstream = Upstream([[], [ROW]])
+    cache = MenuCache(fetch=upstream)
+    tomorrow = date.today() + timedelta(days=1)  # past days are evicted on every get
+
+    async def scenario():
+        first = await cache.refresh(tomorrow)  # e.g. the 23:55 prefetch, before the menu was loaded
+        second = await cache.get(tomorrow)
+        third = await cache.get(tomorrow)
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first == [] and second == [ROW] and third is second
+    assert upstream.calls == 2
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
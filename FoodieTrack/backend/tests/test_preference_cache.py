@@ -0,0 +1,185 @@
+"""
+Tests for the per-user preference read cache (services.preference_service)
+and cross-worker invalidation (utils.invalidation_bus).
+
+Usage:
+  cd backend
+  python -m pytest tests
+  python tests/test_preference_cache.py   # without pytest
+"""
+
+import asyncio
+import subprocess
+import sys
+import tempfile
+import textwrap
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from models.preference import Preference  # noqa: E402
+from services import preference_service  # noqa: E402
+from services.preference_service import _prefs_size, get_user_preferences, invalidate_user_preferences  # noqa: E402
+from utils.invalidation_bus import InvalidationBus  # noqa: E402
+from utils.ttl_cache import TTLCache  # noqa: E402
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return list(self._rows)
+
+
+class FakeSession:
+    """Session whose SELECT returns `rows`; waits on `release` first when given."""
+
+    def __init__(self, rows, release: asyncio.Event | None = None):
+        self.rows = rows
+        self.release = release
+        self.started = asyncio.Event()
+        self.queries = 0
+
+    async def execute(self, query):
+        self.queries += 1
+        self.started.set()
+        if self.release is not None:
+            await self.release.wait()
+        return _Result(self.rows)
+
+
+def _pref(user_id: str, value: str, pref_id: int = 1) -> Preference:
+    return Preference(id=pref_id, user_id=user_id, preference_type="dislike", value=value)
+
+
+def test_read_is_cached_until_invalidated():
+    preference_service._read_cache.clear()
+
+    async def scenario():
+        session = FakeSession([_pref("cache-u1", "olives")])
+        first = await get_user_preferences(session, "cache-u1")
+        second = await get_user_preferences(session, "cache-u1")
+        invalidate_user_preferences("cache-u1")
+        await get_user_preferences(session, "cache-u1")
+        return first, second, session.queries
+
+    first, second, queries = asyncio.run(scenario())
+    assert second is first
+    assert queries == 2
+
+
+def test_read_racing_a_write_does_not_cache_stale_rows():
+    preference_service._read_cache.clear()
+
+    async def scenario():
+        release = asyncio.Event()
+        slow = FakeSession([_pref("cache-u2", "olives")], release)
+        read = asyncio.create_task(get_user_preferences(slow, "cache-u2"))
+        await slow.started.wait()
+        # A write commits (and invalidates) while the read's SELECT is in flight
+        invalidate_user_preferences("cache-u2")
+        release.set()
+        stale = await read
+        fresh = FakeSession([_pref("cache-u2", "olives"), _pref("cache-u2", "cilantro", 2)])
+        rows = await get_user_preferences(fresh, "cache-u2")
+        return stale, rows, fresh.queries
+
+    stale, rows, queries = asyncio.run(scenario())
+    assert [p.value for p in stale] == ["olives"]  # the racing caller still gets its answer...
+    assert queries == 1  # ...but it wasn't cached, so the next read goes to the database
+    assert [p.value for p in rows] == ["olives", "cilantro"]
+
+
+def test_cache_evicts_least_recently_used_users_by_bytes():
+    prefs = {f"user{i}": [_pref(f"user{i}", "x" * 100, j) for j in range(5)] for i in range(4)}
+    entry = _prefs_size(prefs["user0"])
+    cache = TTLCache(max_entries=100, ttl=60, max_bytes=entry * 3, sizeof=_prefs_size)
+    for user in ("user0", "user1", "user2"):
+        cache.set(user, prefs[user])
+    cache.get("user0")  # most recently used now
+    cache.set("user3", prefs["user3"])
+    assert cache.get("user1") is None
+    assert all(cache.get(u) is not None for u in ("user0", "user2", "user3"))
+    assert cache.total_bytes <= cache.max_bytes
+    # A single list larger than the whole budget is not cached (and evicts nothing)
+    cache.set("huge", [_pref("huge", "y" * entry * 3)])
+    assert cache.get("huge") is None and len(cache) == 3
+
+
+_SIBLING = textwrap.dedent(
+    """
+    import asyncio, sys
+    sys.path.insert(0, sys.argv[1])
+    from services import preference_service as ps
+
+    ps.PREFERENCE_CACHE_BUS_DIR = sys.argv[2]
+
+    async def main():
+        ps._read_cache.set("bus-user", [])
+        ps._read_cache.set("other-user", [])
+        await ps.start_invalidation_bus()
+        print("ready", flush=True)
+        for _ in range(500):
+            if ps._read_cache.get("bus-user") is None:
+                break
+            await asyncio.sleep(0.01)
+        kept = ps._read_cache.get("other-user") is not None
+        print("invalidated" if ps._read_cache.get("bus-user") is None and kept else "stale", flush=True)
+        await ps.stop_invalidation_bus()
+
+    asyncio.run(main())
+    """
+)
+
+
+def test_bus_message_invalidates_a_sibling_process():
+    with tempfile.TemporaryDirectory(prefix="bus-") as bus_dir:
+        sibling = subprocess.Popen(
+            [sys.executable, "-c", _SIBLING, str(BACKEND_DIR), bus_dir],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        try:
+            for line in sibling.stdout:
+                if line.strip() == "ready":
+                    break
+
+            async def publish():
+                bus = InvalidationBus(bus_dir, lambda key: None)
+                bus.start()
+                bus.publish("bus-user")
+                bus.stop()
+
+            asyncio.run(publish())
+            outcome = sibling.stdout.readline().strip()
+        finally:
+            sibling.wait(timeout=10)
+    assert outcome == "invalidated"
+
+
+def test_bus_does_not_deliver_to_itself():
+    received = []
+
+    async def scenario():
+        with tempfile.TemporaryDirectory(prefix="bus-") as bus_dir:
+            bus = InvalidationBus(bus_dir, received.append)
+            bus.start()
+            bus.publish("key")
+            await asyncio.sleep(0.05)
+            bus.stop()
+
+    asyncio.run(scenario())
+    assert received == []
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,57 @@
+"""
+Golden and equivalence tests for services.preference_extractor.
+
+Usage:
+  cd backend
+  python -m pytest tests
+  python tests/test_preference_extractor.py   # without pytest
+"""
+
+import json
+import random
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / "benchmarks"))
+
+from bench_preference_extractor import GOLDEN_PATH, legacy_extract_preferences, make_cases  # noqa: E402
+from services.preference_extractor import DIETARY_TAGS, NEG_TRIGGERS, PreferenceExtractor, extract_preferences  # noqa: E402
+
+
+def test_golden_cases():
+    cases = json.loads(GOLDEN_PATH.read_text())
+    assert len(cases) == 50
+    for i, case in enumerate(cases):
+        got = extract_preferences(case["transcript"], case["intent"], case["keywords"])
+        assert got == case["expected"], f"golden case {i}"
+
+
+def test_matches_original_implementation():
+    for seed in range(20):
+        sentences = random.Random(seed).randint(1, 60)
+        for case in make_cases(10, sentences, seed=seed):
+            # Empty and very short keywords hit the edge cases of the trigger checks
+            for keywords in (case["keywords"], case["keywords"] + ["", "no", "o"]):
+                got = extract_preferences(case["transcript"], case["intent"], keywords)
+                assert got == legacy_extract_preferences(case["transcript"], case["intent"], keywords), (case, keywords)
+
+
+def test_large_vocabulary_uses_same_semantics():
+    # Enough tags to switch the matcher to its regex scan
+    tags = DIETARY_TAGS + [f"diet{i}" for i in range(100)]
+    triggers = NEG_TRIGGERS + [f"skip{i} " for i in range(100)]
+    extractor = PreferenceExtractor(dietary_tags=tags, neg_triggers=triggers)
+    for case in make_cases(30, 5, seed=3):
+        transcript = case["transcript"] + " diet7 and diet70, skip12 tofu"
+        keywords = case["keywords"] + ["tofu"]
+        got = extractor.extract(transcript, case["intent"], keywords)
+        assert got == legacy_extract_preferences(transcript, case["intent"], keywords, tags, triggers)
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
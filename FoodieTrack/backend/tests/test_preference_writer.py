@@ -0,0 +1,177 @@
+"""
+Tests for the preference write-behind queue (services.preference_writer),
+with `bulk_upsert_many` replaced by a stub.
+
+Usage:
+  cd backend
+  python -m pytest tests
+  python tests/test_preference_writer.py   # without pytest
+"""
+
+import asyncio
+import sys
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from schemas.preference import PreferenceCreate  # noqa: E402
+from services import preference_writer as writer_module  # noqa: E402
+from services.preference_writer import PreferenceWriteBehind  # noqa: E402
+
+
+class StubUpsert:
+    """Records each batch as (monotonic time, [(user_id, value)]); optionally slow or failing."""
+
+    def __init__(self, delay: float = 0.0, fail: int = 0):
+        self.delay = delay
+        self.fail = fail
+        self.batches: list[tuple[float, list[tuple[str, str]]]] = []
+
+    async def __call__(self, session, items):
+        items = [(user_id, pref.value) for user_id, pref in items]
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("database unavailable")
+        self.batches.append((time.monotonic(), items))
+        return {"inserted": len(items), "updated": 0, "skipped": 0}
+
+    @property
+    def saved(self) -> list[tuple[str, str]]:
+        return [item for _, batch in self.batches for item in batch]
+
+
+@asynccontextmanager
+async def _session():
+    yield None
+
+
+def _prefs(*values: str) -> list[PreferenceCreate]:
+    return [PreferenceCreate(preference_type="dislike", value=v) for v in values]
+
+
+def _run(stub: StubUpsert, scenario):
+    saved = writer_module.bulk_upsert_many
+    writer_module.bulk_upsert_many = stub
+    try:
+        return asyncio.run(scenario())
+    finally:
+        writer_module.bulk_upsert_many = saved
+
+
+def test_flushes_when_batch_size_is_reached():
+    stub = StubUpsert()
+
+    async def scenario():
+        writer = PreferenceWriteBehind(_session, batch_size=3, flush_interval=5)
+        writer.start()
+        start = time.monotonic()
+        assert writer.submit("u1", _prefs("olives", "cilantro"))
+        assert writer.submit("u2", _prefs("mushrooms"))
+        for _ in range(100):
+            if stub.batches:
+                break
+            await asyncio.sleep(0.01)
+        await writer.stop()
+        return start
+
+    start = _run(stub, scenario)
+    assert [batch for _, batch in stub.batches] == [[("u1", "olives"), ("u1", "cilantro"), ("u2", "mushrooms")]]
+    assert stub.batches[0][0] - start < 1  # well before the 5 s interval
+
+
+def test_flushes_a_partial_batch_after_the_interval():
+    stub = StubUpsert()
+
+    async def scenario():
+        writer = PreferenceWriteBehind(_session, batch_size=100, flush_interval=0.2)
+        writer.start()
+        start = time.monotonic()
+        writer.submit("u1", _prefs("olives"))
+        await asyncio.sleep(0.1)
+        early = list(stub.batches)
+        await asyncio.sleep(0.3)
+        await writer.stop()
+        return start, early
+
+    start, early = _run(stub, scenario)
+    assert early == []
+    assert stub.saved == [("u1", "olives")]
+    assert 0.15 <= stub.batches[0][0] - start < 0.4
+
+
+def test_stop_drains_everything_pending():
+    stub = StubUpsert()
+
+    async def scenario():
+        writer = PreferenceWriteBehind(_session, batch_size=2, flush_interval=5)
+        writer.start()
+        writer.submit("u1", _prefs("a", "b", "c", "d", "e"))
+        await writer.stop()
+        return writer.depth
+
+    depth = _run(stub, scenario)
+    assert sorted(stub.saved) == [("u1", v) for v in "abcde"]
+    assert depth == 0
+
+
+def test_stop_gives_up_after_the_drain_timeout():
+    stub = StubUpsert(delay=5)
+
+    async def scenario():
+        writer = PreferenceWriteBehind(_session, batch_size=10, flush_interval=5)
+        writer.start()
+        writer.submit("u1", _prefs("a"))
+        start = time.monotonic()
+        await writer.stop(timeout=0.2)
+        return time.monotonic() - start
+
+    elapsed = _run(stub, scenario)
+    assert elapsed < 1
+    assert stub.saved == []
+
+
+def test_refuses_work_it_cannot_queue():
+    stub = StubUpsert()
+
+    async def scenario():
+        writer = PreferenceWriteBehind(_session, max_pending=3, batch_size=100, flush_interval=5)
+        before_start = writer.submit("u1", _prefs("a"))
+        writer.start()
+        fits = writer.submit("u1", _prefs("a", "b"))
+        too_many = writer.submit("u2", _prefs("c", "d"))  # only one slot left: all or nothing
+        depth = writer.depth
+        await writer.stop()
+        return before_start, fits, too_many, depth
+
+    before_start, fits, too_many, depth = _run(stub, scenario)
+    assert (before_start, fits, too_many) == (False, True, False)
+    assert depth == 2
+    assert stub.saved == [("u1", "a"), ("u1", "b")]
+
+
+def test_a_failed_batch_does_not_stop_the_worker():
+    stub = StubUpsert(fail=1)
+
+    async def scenario():
+        writer = PreferenceWriteBehind(_session, batch_size=1, flush_interval=5)
+        writer.start()
+        writer.submit("u1", _prefs("lost"))
+        await asyncio.sleep(0.05)
+        writer.submit("u1", _prefs("saved"))
+        await asyncio.sleep(0.05)
+        await writer.stop()
+
+    _run(stub, scenario)
+    assert stub.saved == [("u1", "saved")]
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,75 @@
+"""
+Tests for the disk tier of services.transcription_cache.
+
+Usage:
+  cd backend
+  python -m pytest tests
+  python tests/test_transcription_cache.py   # without pytest
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from services.transcription_cache import TranscriptionCache  # noqa: E402
+
+
+def test_set_does_not_wait_for_pruning():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TranscriptionCache(directory=tmp, prune_every=2)
+        pruned = threading.Event()
+        prune = cache.prune
+
+        def slow_prune() -> int:
+            time.sleep(0.5)  # a large cache directory
+            removed = prune()
+            pruned.set()
+            return removed
+
+        cache.prune = slow_prune
+
+        async def scenario():
+            timings = []
+            for i in range(5):
+                start = time.perf_counter()
+                await cache.set(f"{i:064x}", (f"transcript {i}", "en"))
+                timings.append(time.perf_counter() - start)
+            running = not pruned.is_set()
+            await cache.close()
+            return timings, running
+
+        timings, running_after_sets = asyncio.run(scenario())
+    assert max(timings) < 0.25
+    assert running_after_sets and pruned.is_set()
+
+
+def test_background_prune_enforces_the_size_cap():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TranscriptionCache(directory=tmp, disk_max_bytes=2000, prune_every=10)
+
+        async def scenario():
+            for i in range(30):
+                await cache.set(f"{i:064x}", ("x" * 200, "en"))
+                await asyncio.sleep(0.002)  # distinct mtimes, so "oldest first" is well defined
+            await cache.close()
+
+        asyncio.run(scenario())
+        files = list(Path(tmp).rglob("*.json"))
+        size = sum(f.stat().st_size for f in files)
+        entry = files[0].stat().st_size
+    # Pruned to the cap; at most prune_every writes have landed since the last prune
+    assert size <= 2000 + 10 * entry
+    assert len(files) < 30
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print(f"ok  {name}")
@@ -0,0 +1,139 @@
+"""
+Latency and concurrency instrumentation for external dependencies and routes.
+
+`track(dependency, operation)` times a block or a function (sync or async)
+into DEPENDENCY_LATENCY_SECONDS, keeps DEPENDENCY_IN_FLIGHT up to date and
+records a "<dependency>.<operation>" span in the current request trace
+(utils/tracing):
+
+    @track("gemini", "generate")
+    async def generate(...): ...
+
+    with track("snowflake", "query_day"):
+        cur.execute(...)
+
+`RequestMetricsMiddleware` records per-route latency, in-flight requests and
+request/response body sizes. Both fall back to the no-op metrics in
+`metrics.py` when prometheus_client is not installed.
+"""
+
+import functools
+import inspect
+import time
+
+from metrics import (
+    DEPENDENCY_IN_FLIGHT,
+    DEPENDENCY_LATENCY_SECONDS,
+    HTTP_REQUEST_LATENCY_SECONDS,
+    HTTP_REQUEST_SIZE_BYTES,
+    HTTP_REQUESTS_IN_FLIGHT,
+    HTTP_RESPONSE_SIZE_BYTES,
+)
+from utils.tracing import span
+
+
+class track:
+    """
+    Context manager (sync and async) and decorator timing one dependency call.
+    Use a fresh instance per `with` block; decorated functions get one per call.
+    The outcome label is "error" when the block raises; set `outcome` inside
+    the block to label failures that don't raise (e.g. HTTP 5xx responses).
+    """
+
+    def __init__(self, dependency: str, operation: str):
+        self.dependency = dependency
+        self.operation = operation
+        self.outcome: str | None = None
+        self._started = 0.0
+        self._span = span(f"{dependency}.{operation}")
+
+    def __enter__(self):
+        DEPENDENCY_IN_FLIGHT.labels(dependency=self.dependency).inc()
+        self._span.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        self._span.__exit__(exc_type, exc, tb)
+        DEPENDENCY_IN_FLIGHT.labels(dependency=self.dependency).dec()
+        DEPENDENCY_LATENCY_SECONDS.labels(
+            dependency=self.dependency,
+            operation=self.operation,
+            outcome="error" if exc_type is not None else (self.outcome or "ok"),
+        ).observe(elapsed)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with track(self.dependency, self.operation):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(self.dependency, self.operation):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+def _route_label(scope) -> str:
+    # Path templates ("/preferences/{preference_id}") keep label cardinality bounded
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path else "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware (no body buffering, safe for streaming responses)."""
+
+    def __init__(self, app, exclude_paths: tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = exclude_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path", "").startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_bytes = 0
+        response_bytes = 0
+        status = 500
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal response_bytes, status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = _route_label(scope)
+            HTTP_REQUEST_LATENCY_SECONDS.labels(method=scope["method"], route=route, status=str(status)).observe(
+                time.perf_counter() - started
+            )
+            HTTP_REQUEST_SIZE_BYTES.labels(route=route).observe(request_bytes)
+            HTTP_RESPONSE_SIZE_BYTES.labels(route=route).observe(response_bytes)
@@ -0,0 +1,72 @@
+"""
+Cross-process cache invalidation over Unix datagram sockets.
+
+Every worker process binds one socket inside a shared directory; publishing
+a key sends it to every other socket there. Used so that a write handled by
+one uvicorn worker evicts the matching entries cached by its siblings.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from pathlib import Path
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+_MAX_MESSAGE = 4096
+
+
+class InvalidationBus:
+    """Fan keys out to sibling processes; received keys are passed to `on_message`."""
+
+    def __init__(self, directory: str, on_message: Callable[[str], None]):
+        self._dir = Path(directory)
+        self._on_message = on_message
+        self._path = self._dir / f"{os.getpid()}.sock"
+        self._sock: socket.socket | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def start(self) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._path.unlink(missing_ok=True)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(str(self._path))
+        sock.setblocking(False)
+        self._sock = sock
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._drain)
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                data = self._sock.recv(_MAX_MESSAGE)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                self._on_message(data.decode())
+            except Exception:
+                logger.exception("Invalidation handler failed")
+
+    def publish(self, key: str) -> None:
+        if self._sock is None:
+            return
+        data = key.encode()
+        for peer in self._dir.glob("*.sock"):
+            if peer == self._path:
+                continue
+            try:
+                self._sock.sendto(data, str(peer))
+            except (ConnectionRefusedError, FileNotFoundError):
+                peer.unlink(missing_ok=True)  # left behind by a worker that exited
+            except BlockingIOError:
+                logger.warning("Invalidation to %s dropped; peer is not draining", peer.name)
+
+    def stop(self) -> None:
+        if self._sock is None:
+            return
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        self._path.unlink(missing_ok=True)
@@ -1,5 +1,256 @@
+"""
+Token-budgeted prompt assembly for the Gemini food recommender.
+
+The menu is pruned to the requested day / residence / meal, encoded as a
+pipe-separated table (one line per item, repeated keys only in the header)
+and, together with the user's history, truncated in ranked order so the whole
+prompt stays under PROMPT_TOKEN_BUDGET estimated tokens.
+"""
+
 import json
-from typing import Dict, Any
+import os
+import re
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from metrics import PROMPT_ESTIMATED_TOKENS, PROMPT_ITEMS_TRUNCATED
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+# Share of the space left after the fixed sections that history may use; the menu gets the rest
+PROMPT_HISTORY_SHARE = float(os.getenv("PROMPT_HISTORY_SHARE", "0.25"))
+PROMPT_HISTORY_ENTRY_CHARS = int(os.getenv("PROMPT_HISTORY_ENTRY_CHARS", "300"))
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Column name -> accepted keys in menu rows (snapshot rows use the first spelling)
+_MENU_COLUMNS = {
+    "food": ("item_name", "food", "name"),
+    "residence": ("residence",),
+    "day": ("day",),
+    "meal": ("meal_type", "meal"),
+    "serving": ("serving_size",),
+    "kcal": ("calories", "estimated_calories"),
+    "tags": ("tags",),
+    "allergens": ("allergies", "allergens"),
+    "ingredients": ("ingredients",),
+}
+
+# Preference keys whose values are things to steer towards / away from
+_LIKE_KEYS = ("like", "likes", "favourite", "favorite", "favourite_foods", "favorite_foods", "cuisine")
+_AVOID_KEYS = (
+    "allergy", "allergies", "allergens", "dislike", "dislikes", "avoided_foods", "avoid",
+    "restriction", "restrictions", "dietary_restrictions",
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text and JSON)."""
+    return (len(text) + 3) // 4
+
+
+# --- Menu ---
+
+def _field(row: dict, column: str) -> Any:
+    for key in _MENU_COLUMNS[column]:
+        if row.get(key) not in (None, "", []):
+            return row[key]
+    return None
+
+
+def menu_rows(menu_data: Any) -> List[dict]:
+    """Flatten menu data (a list of rows, or nested dicts/lists of rows) into item rows."""
+    if isinstance(menu_data, list):
+        rows = []
+        for entry in menu_data:
+            rows.extend(menu_rows(entry))
+        return rows
+    if isinstance(menu_data, dict):
+        if _field(menu_data, "food") is not None:
+            return [menu_data]
+        return menu_rows(list(menu_data.values()))
+    return []
+
+
+def _matches(value: Any, wanted: str) -> bool:
+    return value is not None and str(value).strip().lower() == wanted.strip().lower()
+
+
+def prune_menu(
+    rows: List[dict],
+    *,
+    day: Optional[str] = None,
+    residence: Optional[str] = None,
+    meal: Optional[str] = None,
+) -> List[dict]:
+    """
+    Keep rows for the given day (ISO date or weekday name), residence and meal.
+    A filter that would leave nothing is skipped, so a residence or meal with
+    no menu falls back to what is being served.
+    """
+    if day:
+        try:
+            weekday = date.fromisoformat(day).strftime("%A")
+        except ValueError:
+            weekday = day
+        kept = [r for r in rows if _matches(_field(r, "day"), day) or _matches(_field(r, "day"), weekday)]
+        rows = kept or rows
+    for column, wanted in (("residence", residence), ("meal", meal)):
+        if wanted:
+            rows = [r for r in rows if _matches(_field(r, column), wanted)] or rows
+    return rows
+
+
+def _terms(values: Iterable[Any]) -> set:
+    terms = set()
+    for v in values:
+        if isinstance(v, (list, tuple, set)):
+            terms |= _terms(v)
+        elif isinstance(v, dict):
+            terms |= _terms(v.values())
+        elif v not in (None, ""):
+            terms |= set(_WORD_RE.findall(str(v).lower()))
+    return terms
+
+
+def _preference_terms(user_preferences: Dict[str, Any], keys: Iterable[str]) -> set:
+    prefs = {str(k).lower(): v for k, v in (user_preferences or {}).items()}
+    return _terms(prefs[k] for k in keys if k in prefs)
+
+
+def rank_menu(rows: List[dict], user_preferences: Dict[str, Any]) -> List[dict]:
+    """
+    Order rows so truncation drops the least useful items first: items that
+    mention liked foods come first, items that mention an allergy, dislike or
+    restriction term last; ties keep menu order.
+    """
+    likes = _preference_terms(user_preferences, _LIKE_KEYS)
+    avoids = _preference_terms(user_preferences, _AVOID_KEYS)
+    if not likes and not avoids:
+        return list(rows)
+
+    def score(row: dict) -> int:
+        words = _terms([_field(row, "food"), _field(row, "ingredients"), _field(row, "allergens")])
+        return len(words & likes) - 10 * len(words & avoids)
+
+    return sorted(rows, key=score, reverse=True)
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = ",".join(str(v) for v in value)
+    return str(value).replace("|", "/").replace("\n", " ")
+
+
+def menu_table(rows: List[dict]) -> tuple[str, List[str]]:
+    """
+    Encode rows as `header` + one pipe-separated line per row. Columns that are
+    empty for every row are omitted, as are columns with the same value in every
+    row (those are stated once in the header instead).
+    """
+    if not rows:
+        return "food", []
+    columns, constants = [], []
+    for column in _MENU_COLUMNS:
+        values = {_cell(_field(r, column)) for r in rows}
+        if values == {""}:
+            continue
+        if len(values) == 1 and len(rows) > 1 and column != "food":
+            constants.append(f"{column}={values.pop()}")
+            continue
+        columns.append(column)
+    header = "|".join(columns)
+    if constants:
+        header += "  (all items: " + "; ".join(constants) + ")"
+    return header, ["|".join(_cell(_field(r, c)) for c in columns) for r in rows]
+
+
+# --- History ---
+
+def history_entries(user_history: Any) -> List[str]:
+    """
+    Flatten history (Backboard search results, a list of strings, or a dict
+    of lists) into one line per entry, most relevant first.
+    """
+    if not user_history:
+        return []
+    if isinstance(user_history, dict) and "text" not in user_history:
+        entries = []
+        for key, value in user_history.items():
+            entries.extend(f"{key}: {e}" for e in history_entries(value))
+        return entries
+    if not isinstance(user_history, list):
+        user_history = [user_history]
+    entries = []
+    for entry in user_history:
+        text = entry.get("text") if isinstance(entry, dict) else entry
+        if text in (None, ""):
+            continue
+        text = " ".join(str(text).split())
+        if len(text) > PROMPT_HISTORY_ENTRY_CHARS:
+            text = text[: PROMPT_HISTORY_ENTRY_CHARS - 1] + "…"
+        entries.append(text)
+    return entries
+
+
+def _fit(lines: List[str], budget: int) -> List[str]:
+    """Longest prefix of `lines` whose estimated size (one newline each) fits `budget` tokens."""
+    kept, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line + "\n")
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return kept
+
+
+# --- Prompt ---
+
+_INSTRUCTIONS = """You are an AI food recommendation system designed for first-year University of Waterloo students.
+
+Your job is to recommend what the user should eat TODAY using ONLY the provided menu data.
+
+## DECISION RULES
+1. MOOD INFERENCE: infer emotional state from the transcript (e.g., stressed, low energy, happy). The transcript may be emotional, informal, or incomplete; infer cautiously. Do NOT diagnose or provide medical advice.
+2. LOGGED-OUT: ignore history and preferences; recommend popular, broadly safe items; avoid strong assumptions.
+3. LOGGED-IN: strictly respect dietary restrictions and allergens; use past history to influence choices; honor explicit avoidances (e.g., low sugar).
+4. NUTRITION VS MOOD: optimize for both emotional comfort AND nutrition goals. If the user sounds very distressed, prioritize warmth, hydration and simplicity and relax non-critical preferences slightly (never allergens).
+5. COMBINATIONS: you may recommend a meal + side or a meal + dessert, only if it fits goals and constraints.
+
+YOU MUST NOT invent food items, invent restaurants, or ignore allergen or dietary constraints.
+
+## OUTPUT (STRICT)
+Return ONLY valid JSON matching this schema, with no text outside the JSON:
+{"mood":{"label":string,"confidence":number},"recommendations":[{"residence":string,"day":string,"meal":string,"food":string,"serving_size":string,"calories":number,"reason":string,"matched_preferences":string[]}],"nutrition_summary":{"estimated_calories":number,"protein_level":"low | moderate | high","sugar_level":"low | moderate | high","comfort_score":number},"explainability":{"mood_detected_from":string,"dietary_constraints_used":string[],"history_influences":string[],"tradeoffs_made":string}}"""
+
+
+def _compact_json(value: Any) -> str:
+    if isinstance(value, dict):
+        value = {k: v for k, v in value.items() if v not in (None, "", [], {})}
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _context(transcript: str, user_preferences: Dict[str, Any], is_logged_in: bool) -> str:
+    return f"""## CONTEXT
+USER LOGIN STATUS: {"LOGGED IN" if is_logged_in else "NOT LOGGED IN"}
+VOICE TRANSCRIPT (raw, emotional speech):
+\"\"\"{transcript}\"\"\"
+
+USER PROFILE (dietary restrictions, allergens, nutrition goals, favourite/avoided foods, residence; may be empty):
+{_compact_json(user_preferences or {})}
+
+## USER HISTORY (from memory system, most relevant first; may be empty)
+"""
+
+
+def _menu_head(header: str) -> str:
+    return f"\n## AVAILABLE FOOD DATA (one item per line; columns: {header})\n"
+
+
+def _history_block(kept_history: List[str]) -> str:
+    return ("\n".join(kept_history) or "(none)") + "\n"
 
 
 def build_prompt(
@@ -7,145 +258,85 @@ def build_prompt(
     transcript: str,
     user_preferences: Dict[str, Any],
     user_history: Dict[str, Any],
-    menu_data: Dict[str, Any],
+    menu_data: Any,
     is_logged_in: bool,
+    day: Optional[str] = None,
+    residence: Optional[str] = None,
+    meal: Optional[str] = None,
+    token_budget: int = PROMPT_TOKEN_BUDGET,
 ) -> str:
     """
     Builds a constrained, explainable prompt for Gemini to recommend food
     based on mood, nutrition goals, dietary constraints, and residence menus.
+
+    The menu is pruned to `day` (default today), `residence` and `meal`, and
+    menu items and history entries are dropped lowest-rank first until the
+    estimate fits `token_budget`.
     """
+    if not is_logged_in:
+        user_preferences, user_history = {}, {}
+    residence = residence or (user_preferences or {}).get("residence")
 
-    return f"""
-You are an AI food recommendation system designed for first-year University of Waterloo students.
+    rows = prune_menu(menu_rows(menu_data), day=day or date.today().isoformat(), residence=residence, meal=meal)
+    header, menu_lines = menu_table(rank_menu(rows, user_preferences))
+    history = [f"- {h}" for h in history_entries(user_history)]
 
-Your job is to recommend what the user should eat TODAY using ONLY the provided menu data.
+    head = f"{_INSTRUCTIONS}\n\n{_context(transcript, user_preferences, is_logged_in)}"
+    menu_head = _menu_head(header)
+    remaining = max(0, token_budget - estimate_tokens(head + menu_head))
+    kept_history = _fit(history, int(remaining * PROMPT_HISTORY_SHARE))
+    remaining -= estimate_tokens("\n".join(kept_history))
+    kept_menu = _fit(menu_lines, remaining)
+    if len(kept_menu) == len(menu_lines) and len(kept_history) < len(history):
+        # Menu fit with room to spare: give the leftover space back to history
+        spare = remaining - estimate_tokens("\n".join(kept_menu))
+        kept_history += _fit(history[len(kept_history):], spare)
 
-────────────────────
-CONTEXT
-────────────────────
+    PROMPT_ITEMS_TRUNCATED.labels(section="menu").inc(len(menu_lines) - len(kept_menu))
+    PROMPT_ITEMS_TRUNCATED.labels(section="history").inc(len(history) - len(kept_history))
 
-USER LOGIN STATUS:
-{"LOGGED IN" if is_logged_in else "NOT LOGGED IN"}
+    prompt = head + _history_block(kept_history) + menu_head + ("\n".join(kept_menu) or "(no menu items)") + "\n"
+    PROMPT_ESTIMATED_TOKENS.observe(estimate_tokens(prompt))
+    return prompt
 
-VOICE TRANSCRIPT (raw, emotional speech):
-\"\"\"{transcript}\"\"\"
 
-IMPORTANT:
-- The transcript may be emotional, informal, or incomplete.
-- You must infer mood cautiously and non-medically.
-
-────────────────────
-USER PROFILE (if logged in)
-────────────────────
-{json.dumps(user_preferences, indent=2)}
-
-Includes (may be empty):
-- dietary restrictions (e.g., halal, vegetarian, no dairy)
-- allergens to avoid (e.g., soy, fish)
-- nutrition goals (calories, sugar, protein focus)
-- favourite foods
-- avoided foods
-- residence preference (V1 / REV / CMH)
-
-────────────────────
-USER HISTORY (from memory system)
-────────────────────
-{json.dumps(user_history, indent=2)}
-
-Includes patterns such as:
-- foods that improved mood in the past
-- foods avoided after negative experiences
-- previous mood → food outcomes
-
-────────────────────
-AVAILABLE FOOD DATA (7-day demo menu)
-────────────────────
-{json.dumps(menu_data, indent=2)}
-
-Each menu item includes:
-- residence (V1 / REV / CMH)
-- day of week
-- meal (breakfast / lunch / dinner)
-- food name
-- serving size
-- ingredients
-- tags (e.g., halal, made without dairy)
-- allergen tags (e.g., contains soy, contains fish)
-- estimated calories
-
-YOU MUST NOT:
-- invent food items
-- invent restaurants
-- ignore allergen or dietary constraints
-
-────────────────────
-DECISION RULES
-────────────────────
-
-1. MOOD INFERENCE
-- Infer emotional state from transcript (e.g., stressed, low energy, happy).
-- Do NOT diagnose or provide medical advice.
-
-2. LOGGED-OUT BEHAVIOR
-If the user is NOT logged in:
-- Ignore history and preferences.
-- Recommend popular, broadly safe items.
-- Avoid strong assumptions.
-
-3. LOGGED-IN BEHAVIOR
-If the user IS logged in:
-- Strictly respect dietary restrictions and allergens.
-- Use past history to influence choices.
-- Honor explicit avoidances (e.g., low sugar).
-
-4. NUTRITION VS MOOD BALANCE
-- Optimize for both emotional comfort AND nutrition goals.
-- If user sounds very distressed:
-  - prioritize warmth, hydration, and simplicity
-  - relax non-critical preferences slightly (never allergens)
-
-5. COMBINATION RECOMMENDATIONS
-- You may recommend:
-  - a meal + side
-  - a meal + dessert
-- Only if it fits goals and constraints.
-
-────────────────────
-OUTPUT REQUIREMENTS (STRICT)
-────────────────────
-
-Return ONLY valid JSON matching this schema:
-
-{{
-  "mood": {{
-    "label": string,
-    "confidence": number
-  }},
-  "recommendations": [
-    {{
-      "residence": string,
-      "day": string,
-      "meal": string,
-      "food": string,
-      "serving_size": string,
-      "calories": number,
-      "reason": string,
-      "matched_preferences": string[]
-    }}
-  ],
-  "nutrition_summary": {{
-    "estimated_calories": number,
-    "protein_level": "low | moderate | high",
-    "sugar_level": "low | moderate | high",
-    "comfort_score": number
-  }},
-  "explainability": {{
-    "mood_detected_from": string,
-    "dietary_constraints_used": string[],
-    "history_influences": string[],
-    "tradeoffs_made": string
-  }}
-}}
-
-Do NOT include any text outside the JSON.
-"""
\ No newline at end of file
+def build_menu_context(menu_data: Any, day: Optional[str] = None, instructions: str = _INSTRUCTIONS) -> str:
+    """
+    The per-day static prompt prefix: instructions plus the whole day's menu,
+    unranked and untruncated so it is byte-identical for every user that day
+    (see services.gemini_context_cache).
+    """
+    rows = prune_menu(menu_rows(menu_data), day=day or date.today().isoformat())
+    header, menu_lines = menu_table(rows)
+    return instructions + "\n" + _menu_head(header) + ("\n".join(menu_lines) or "(no menu items)") + "\n"
+
+
+def build_request_prompt(
+    *,
+    transcript: str,
+    user_preferences: Dict[str, Any],
+    user_history: Dict[str, Any],
+    is_logged_in: bool,
+    residence: Optional[str] = None,
+    meal: Optional[str] = None,
+    token_budget: int = PROMPT_TOKEN_BUDGET,
+) -> str:
+    """
+    The per-request part sent alongside `build_menu_context`: transcript,
+    profile and as much history as fits `token_budget`, plus which residence
+    and meal to pick from.
+    """
+    if not is_logged_in:
+        user_preferences, user_history = {}, {}
+    residence = residence or (user_preferences or {}).get("residence")
+
+    head = _context(transcript, user_preferences, is_logged_in)
+    scope = [f"{label}: {value}" for label, value in (("RESIDENCE", residence), ("MEAL", meal)) if value]
+    tail = ("\n## SCOPE\nRecommend only items served at " + "; ".join(scope) + " if any are available.\n") if scope else ""
+    history = [f"- {h}" for h in history_entries(user_history)]
+    kept_history = _fit(history, max(0, token_budget - estimate_tokens(head + tail)))
+    PROMPT_ITEMS_TRUNCATED.labels(section="history").inc(len(history) - len(kept_history))
+
+    prompt = head + _history_block(kept_history) + tail
+    PROMPT_ESTIMATED_TOKENS.observe(estimate_tokens(prompt))
+    return prompt
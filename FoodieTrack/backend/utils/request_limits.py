@@ -0,0 +1,77 @@
+"""
+Request body size limits enforced before the body is parsed.
+
+Starlette spools a multipart upload to disk in full before a route sees it,
+so a size check in the route runs only after the whole file has arrived.
+`BodySizeLimitMiddleware` rejects oversized bodies with 413 up front from
+Content-Length, and otherwise counts bytes as they are received and stops
+reading as soon as the limit is crossed.
+"""
+
+import json
+
+
+class RequestBodyTooLarge(Exception):
+    """Raised from `receive` once a body exceeds its limit."""
+
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """Pure ASGI middleware: 413 for bodies over `max_bytes` on paths starting with `paths`."""
+
+    def __init__(self, app, max_bytes: int, paths: tuple[str, ...] = ("/",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = paths
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({"detail": f"Request body too large (max {self.max_bytes // (1024 * 1024)} MB)"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope.get("path", "").startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    exceeded = True
+                    raise RequestBodyTooLarge()
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if exceeded:
+                # The app's error response for the aborted body is replaced by the 413 below
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except RequestBodyTooLarge:
+            pass
+        if exceeded and not response_started:
+            await self._reject(send)
@@ -0,0 +1,27 @@
+"""
+Collapse concurrent identical async calls into one in-flight task.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Callers that ask for the same key while a call is running share its result."""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        # shield so one cancelled caller doesn't cancel the call for everyone else
+        return await asyncio.shield(task)
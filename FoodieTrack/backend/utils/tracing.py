@@ -0,0 +1,233 @@
+"""
+Request-scoped trace spans without an external tracing backend.
+
+`TracingMiddleware` opens a `RequestTrace` per HTTP request and stores it in
+a context variable, so `span("name")` anywhere below the request (route
+code, dependencies, services, `asyncio.to_thread` workers) records into it
+without passing anything around. Outside a request, spans are free no-ops.
+
+Each request emits:
+- a `Server-Timing` response header (per span name: total duration and call
+  count), readable in browser devtools;
+- one structured `request trace` log line with the same breakdown;
+- optionally, for a TRACE_SAMPLE_RATE fraction of requests, the full span
+  tree appended as a JSON line to TRACE_EXPORT_PATH.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))  # fraction of requests exported to the trace file
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "./traces.jsonl")
+TRACE_LOG_LEVEL = logging.getLevelName(os.getenv("TRACE_LOG_LEVEL", "INFO").upper())
+
+_current_trace: contextvars.ContextVar["RequestTrace | None"] = contextvars.ContextVar("request_trace", default=None)
+_current_span: contextvars.ContextVar[int | None] = contextvars.ContextVar("request_span", default=None)
+
+# Server-Timing metric names are HTTP tokens
+_NON_TOKEN_RE = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]+")
+_export_lock = threading.Lock()
+
+
+class RequestTrace:
+    """Spans recorded for one request: (name, parent index, start offset s, duration s)."""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.spans: list[list] = []
+        self.closed = False
+
+    def open(self, name: str, parent: int | None) -> int:
+        self.spans.append([name, parent, time.perf_counter() - self.started, None])
+        return len(self.spans) - 1
+
+    def close(self, index: int) -> None:
+        span = self.spans[index]
+        span[3] = time.perf_counter() - self.started - span[2]
+
+    def add(self, name: str, duration: float) -> None:
+        """Record an already-measured span (e.g. time spent reading the request body)."""
+        self.spans.append([name, None, None, duration])
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> dict[str, tuple[float, int]]:
+        """Span name -> (total duration s, count), in first-seen order. Unfinished spans are skipped."""
+        out: dict[str, tuple[float, int]] = {}
+        for name, _, _, duration in list(self.spans):
+            if duration is None:
+                continue
+            total, count = out.get(name, (0.0, 0))
+            out[name] = (total + duration, count + 1)
+        return out
+
+    def server_timing(self) -> str:
+        parts = []
+        for name, (total, count) in self.summary().items():
+            entry = f"{_NON_TOKEN_RE.sub('_', name)};dur={total * 1000:.1f}"
+            if count > 1:
+                entry += f';desc="{count} calls"'
+            parts.append(entry)
+        parts.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class span:
+    """
+    Time a block or function (sync or async) as a span of the current request
+    trace. Use a fresh instance per `with` block; decorated functions get one
+    per call.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._trace: RequestTrace | None = None
+        self._index = 0
+        self._token = None
+
+    def __enter__(self):
+        trace = _current_trace.get()
+        if trace is not None and not trace.closed:
+            self._trace = trace
+            self._index = trace.open(self.name, _current_span.get())
+            self._token = _current_span.set(self._index)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._trace is not None:
+            self._trace.close(self._index)
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Exited in a different context than entered (e.g. generator finalised elsewhere)
+                pass
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(self.name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(self.name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+def current_trace() -> RequestTrace | None:
+    return _current_trace.get()
+
+
+def _export(record: dict) -> None:
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    try:
+        with _export_lock, open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError:
+        logger.warning("Could not write trace export to %s", TRACE_EXPORT_PATH, exc_info=True)
+
+
+class TracingMiddleware:
+    """Pure ASGI middleware: one `RequestTrace` per HTTP request, reported via header, log and sampled export."""
+
+    def __init__(self, app, exclude_paths: tuple[str, ...] = ("/metrics",), sample_rate: float = TRACE_SAMPLE_RATE):
+        self.app = app
+        self.exclude_paths = exclude_paths
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path", "").startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope["method"], scope.get("path", ""))
+        token = _current_trace.set(trace)
+        upload = 0.0
+        status = 500
+
+        async def timed_receive():
+            # Time spent waiting for the request body (slow uploads show up here)
+            nonlocal upload
+            started = time.perf_counter()
+            message = await receive()
+            if message["type"] == "http.request":
+                upload += time.perf_counter() - started
+            return message
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if upload:
+                    trace.add("upload", upload)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, timed_receive, send_with_timing)
+        finally:
+            trace.closed = True
+            _current_trace.reset(token)
+            record = self._report(scope, trace, status)
+            if record is not None:
+                await asyncio.to_thread(_export, record)
+
+    def _report(self, scope, trace: RequestTrace, status: int) -> dict | None:
+        """Log the breakdown; returns the full record when this request is sampled for export."""
+        route = getattr(scope.get("route"), "path", None) or trace.path
+        total_ms = round(trace.elapsed * 1000, 1)
+        spans = {name: round(total * 1000, 1) for name, (total, _) in trace.summary().items()}
+        if logger.isEnabledFor(TRACE_LOG_LEVEL):
+            logger.log(
+                TRACE_LOG_LEVEL,
+                "request trace %s",
+                json.dumps({"method": trace.method, "route": route, "status": status, "total_ms": total_ms, "spans_ms": spans}),
+            )
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return None
+        return {
+            "ts": time.time(),
+            "method": trace.method,
+            "route": route,
+            "path": trace.path,
+            "status": status,
+            "total_ms": total_ms,
+            "spans": [
+                {
+                    "name": name,
+                    "parent": parent,
+                    "start_ms": None if start is None else round(start * 1000, 2),
+                    "dur_ms": None if duration is None else round(duration * 1000, 2),
+                }
+                for name, parent, start, duration in trace.spans
+            ],
+        }
@@ -0,0 +1,111 @@
+"""
+Small thread-safe LRU cache with per-entry TTL and an optional memory bound.
+
+Entries can be tagged with a group (e.g. a user_id) so every entry belonging
+to that group can be invalidated at once.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size", "group")
+
+    def __init__(self, value: Any, expires_at: float, size: int, group: Hashable | None):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.group = group
+
+
+class TTLCache:
+    """
+    LRU eviction once `max_entries` or `max_bytes` is exceeded; entries older
+    than `ttl` seconds are treated as missing. `sizeof` estimates an entry's
+    footprint in bytes (defaults to `sys.getsizeof`).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 300.0,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._data: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._groups: dict[Hashable, set[Hashable]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+        if entry.group is not None:
+            keys = self._groups.get(entry.group)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._groups[entry.group]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                return default
+            self._data.move_to_end(key)
+            return entry.value
+
+    def set(self, key: Hashable, value: Any, group: Hashable | None = None, ttl: float | None = None) -> None:
+        size = self._sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # never cache something that would evict everything else
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = _Entry(value, expires_at, size, group)
+            self._bytes += size
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                self._remove(next(iter(self._data)))
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def invalidate_group(self, group: Hashable) -> int:
+        """Drop every entry tagged with `group`; returns how many were removed."""
+        with self._lock:
+            keys = list(self._groups.get(group, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._groups.clear()
+            self._bytes = 0